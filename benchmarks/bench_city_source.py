@@ -0,0 +1,96 @@
+"""
+Peak memory and time of iterating a city catalog of every format,
+with and without a region filter, against loading `cities.json`:
+
+    python -m benchmarks.bench_city_source -n 1000000
+"""
+import argparse
+import csv
+import json
+import sqlite3
+import tempfile
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+
+from tasks.city_sources import CityFilter, CitySource
+
+REGIONS = ('europe', 'asia', 'africa', 'america')
+
+
+def city(i: int) -> dict:
+    return {
+        'name': f'CITY{i}',
+        'url': f'https://example.com/city{i}-response.json',
+        'region': REGIONS[i % len(REGIONS)],
+        'tags': ['capital'] if i % 100 == 0 else [],
+    }
+
+
+def write_catalogs(directory: Path, cities: int) -> dict[str, Path]:
+    paths = {
+        'json': directory / 'cities.json',
+        'jsonl': directory / 'cities.jsonl',
+        'csv': directory / 'cities.csv',
+        'sqlite': directory / 'cities.db',
+    }
+    with open(paths['json'], 'w') as file:
+        json.dump({
+            f'CITY{i}': f'https://example.com/city{i}-response.json'
+            for i in range(cities)
+        }, file)
+    with open(paths['jsonl'], 'w') as file:
+        for i in range(cities):
+            file.write(json.dumps(city(i)) + '\n')
+    with open(paths['csv'], 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['name', 'url', 'region', 'tags'])
+        for i in range(cities):
+            c = city(i)
+            writer.writerow([c['name'], c['url'], c['region'],
+                             ';'.join(c['tags'])])
+    db = sqlite3.connect(paths['sqlite'])
+    db.execute('CREATE TABLE cities (name, url, region, tags)')
+    db.executemany('INSERT INTO cities VALUES (?, ?, ?, ?)', (
+        (c['name'], c['url'], c['region'], ';'.join(c['tags']))
+        for c in map(city, range(cities))
+    ))
+    db.commit()
+    db.close()
+    return paths
+
+
+def measure(source: CitySource) -> dict:
+    tracemalloc.start()
+    started = perf_counter()
+    count = sum(1 for _ in source)
+    seconds = perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'cities': count,
+        'seconds': round(seconds, 3),
+        'peak_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--cities', type=int, default=1000000)
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_catalogs(Path(directory), args.cities)
+        for source_format, path in paths.items():
+            report[source_format] = measure(CitySource(path))
+            if source_format != 'json':
+                report[f'{source_format}+region'] = measure(CitySource(
+                    path,
+                    CityFilter(regions=frozenset({'europe'}))
+                ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compare fetch wall time with and without keep-alive connection reuse:
+
+    python -m benchmarks.bench_connection_pool -n 500 --connect-delay 0.02
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from benchmarks.fake_server import FakeForecastServer
+from external.client import ConnectionPool
+
+
+def run(pool: ConnectionPool, urls: list[str], threads: int) -> dict:
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for response in executor.map(pool.request, urls):
+            assert response.status == 200
+    elapsed = perf_counter() - started
+    stats = pool.stats()
+    pool.close()
+
+    return {
+        'seconds': round(elapsed, 4),
+        'requests_per_sec': round(len(urls) / elapsed, 1),
+        'connections_opened': stats.opened,
+        'connections_reused': stats.reused,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('-t', '--threads', type=int, default=16)
+    parser.add_argument('--connect-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    with FakeForecastServer(connect_delay=args.connect_delay) as server:
+        urls = [server.url_for(f'city{i}') for i in range(args.requests)]
+        report = {
+            'requests': args.requests,
+            'threads': args.threads,
+            'connect_delay': args.connect_delay,
+            # max_size=0 never keeps a connection, i.e. the urlopen way
+            'no_pool': run(ConnectionPool(max_size=0), urls, args.threads),
+            'pool': run(ConnectionPool(), urls, args.threads),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
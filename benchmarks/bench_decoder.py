@@ -0,0 +1,66 @@
+"""
+Compare response decoders with and without projection to the fields
+analyzers read: decode time, memory and pickled size of a decoded city,
+the latter is what is sent to analyzing workers:
+
+    python -m benchmarks.bench_decoder -n 200 --days 5 30
+"""
+import argparse
+import json
+import pickle
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.synthetic import make_forecast
+from external.decoder import Decoder, orjson
+
+
+def run(decoder: Decoder, bodies: list[bytes]) -> dict:
+    started = perf_counter()
+    for body in bodies:
+        decoder(body)
+    elapsed = perf_counter() - started
+
+    tracemalloc.start()
+    decoded = [decoder(body) for body in bodies]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled = sum(
+        len(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)) for data in decoded
+    )
+
+    return {
+        'decode_ms_per_city': round(elapsed / len(bodies) * 1e3, 3),
+        'memory_kb_per_city': round(memory / len(bodies) / 1024, 1),
+        'pickled_kb_per_city': round(pickled / len(bodies) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--items', type=int, default=200)
+    parser.add_argument('--days', type=int, nargs='+', default=[5, 30])
+    args = parser.parse_args()
+
+    backends = ['stdlib'] + (['orjson'] if orjson is not None else [])
+    report = []
+    for days in args.days:
+        bodies = [
+            json.dumps(make_forecast(f'city{i}', days, days)).encode()
+            for i in range(args.items)
+        ]
+        results = {}
+        for backend in backends:
+            for projection in (False, True):
+                name = backend + ('+projection' if projection else '')
+                results[name] = run(Decoder(backend, projection), bodies)
+        report.append({
+            'days': days,
+            'payload_bytes': len(bodies[0]),
+            **results,
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
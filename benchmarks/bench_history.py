@@ -0,0 +1,81 @@
+"""
+Ingest time of runs into the history store and latency of its queries,
+a city over its last fetches and a ranking over a window of runs:
+
+    python -m benchmarks.bench_history --cities 10000 --runs 10
+"""
+import argparse
+import json
+import statistics
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import DataAggregationTask, DataAnalyzingTask
+from tasks.data_calculation_task import CitySummary
+from tasks.history_store import HistoryStore
+
+
+def make_run(cities: int, seed: int) -> list:
+    return [
+        DataAggregationTask.aggregate_city_summary(CitySummary(
+            f'CITY{i}',
+            analyze_json(make_forecast(f'CITY{i}-{seed}'))
+        ))
+        for i in range(cities)
+    ]
+
+
+def median_ms(query, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        query()
+        samples.append(perf_counter() - started)
+    return round(statistics.median(samples) * 1e3, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # forecasts change little between fetches, a few distinct runs do
+    runs = [make_run(args.cities, seed) for seed in range(3)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(Path(directory) / 'history.db')
+        started = perf_counter()
+        for run in range(args.runs):
+            for _ in store.record(runs[run % len(runs)], float(run)):
+                pass
+        ingest = perf_counter() - started
+
+        city = f'CITY{args.cities // 2}'
+        report = {
+            'city_fetches': args.cities * args.runs,
+            'ingest_s_per_run': round(ingest / args.runs, 3),
+            'city_history_ms': median_ms(
+                lambda: store.city_history(city, 5),
+                args.repeat
+            ),
+            'city_trend_ms': median_ms(
+                lambda: store.city_trend(city, 5),
+                args.repeat
+            ),
+            'rank_last_run_ms': median_ms(
+                lambda: DataAnalyzingTask.rank_cities(
+                    store.window_totals(last_runs=1), 10
+                ),
+                3
+            ),
+        }
+        store.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Analysis time of forecasts with and without the analysis memo, when
+only some of them are distinct like responses of nearby cities:
+
+    python -m benchmarks.bench_memo --cities 2000 --distinct 200
+"""
+import argparse
+import hashlib
+import json
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from benchmarks.synthetic import make_forecast
+from tasks.analysis_memo import AnalysisMemo
+from tasks.data_calculation_task import DataCalculationTask
+from tasks.data_fetching_task import CityRawData
+
+
+def make_raws(cities: int, distinct: int) -> list[CityRawData]:
+    forecasts = []
+    for i in range(distinct):
+        data = make_forecast(f'CITY{i}')
+        digest = hashlib.sha256(json.dumps(data).encode()).hexdigest()
+        forecasts.append((data, digest))
+    return [
+        CityRawData(f'CITY{i}', *forecasts[i % distinct])
+        for i in range(cities)
+    ]
+
+
+def analyze_s(raws: list[CityRawData], memo) -> float:
+    started = perf_counter()
+    for raw in raws:
+        DataCalculationTask.calculate_summary_by_days(raw, memo=memo)
+    return round(perf_counter() - started, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=2000)
+    parser.add_argument('--distinct', type=int, default=200)
+    args = parser.parse_args()
+
+    raws = make_raws(args.cities, args.distinct)
+    with tempfile.TemporaryDirectory() as directory:
+        memo = AnalysisMemo(Path(directory) / 'memo.db')
+        report = {
+            'no_memo_s': analyze_s(raws, None),
+            'cold_memo_s': analyze_s(raws, memo),
+            'warm_memo_s': analyze_s(raws, memo),
+        }
+        memo.flush()
+        report['hit_rate'] = round(memo.stats().hit_rate, 3)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
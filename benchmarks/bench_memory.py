@@ -0,0 +1,91 @@
+"""
+Memory a city takes while it waits to be ranked, with the previous
+representation (a dataclass holding the `CitySummary` with a dict per
+day) against the packed `TotalSummary`:
+
+    python -m benchmarks.bench_memory -n 100000 --days 7
+"""
+import argparse
+import json
+import pickle
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import DataAggregationTask, TotalSummary
+from tasks.data_calculation_task import CitySummary
+
+# distinct forecasts, larger runs cycle through them
+DISTINCT_FORECASTS = 1000
+
+
+@dataclass
+class DictTotalSummary:
+    """`TotalSummary` as it was before days were packed"""
+    city_summary: CitySummary
+    temp_sum: float
+    shiny_hours: int
+    analyzing_hours: int
+    analyzing_days: int
+
+
+def city_summaries(cities: int, days: int) -> list[bytes]:
+    """Pickled like results coming from workers"""
+    return [
+        pickle.dumps(CitySummary(
+            f'CITY{i}',
+            analyze_json(make_forecast(f'city{i}', days, days))
+        ))
+        for i in range(min(cities, DISTINCT_FORECASTS))
+    ]
+
+
+def measure(
+        cities: int,
+        pickled: list[bytes],
+        convert: Callable[[CitySummary], object]
+) -> float:
+    tracemalloc.start()
+    kept = [
+        convert(pickle.loads(pickled[i % len(pickled)]))
+        for i in range(cities)
+    ]
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return round(memory / cities, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--cities', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=7)
+    args = parser.parse_args()
+
+    pickled = city_summaries(args.cities, args.days)
+
+    def packed(city_summary: CitySummary) -> TotalSummary:
+        return DataAggregationTask.total_summary(city_summary)
+
+    def dicts(city_summary: CitySummary) -> DictTotalSummary:
+        total = packed(city_summary)
+        return DictTotalSummary(
+            city_summary,
+            total.temp_sum,
+            total.shiny_hours,
+            total.analyzing_hours,
+            total.analyzing_days,
+        )
+
+    print(json.dumps({
+        'cities': args.cities,
+        'days': args.days,
+        'before_bytes_per_city': measure(args.cities, pickled, dicts),
+        'after_bytes_per_city': measure(args.cities, pickled, packed),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
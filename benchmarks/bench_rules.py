@@ -0,0 +1,64 @@
+"""
+Time to rate forecasts by many rule sets in one pass over their hours
+against one pass per rule set and against the default analysis alone:
+
+    python -m benchmarks.bench_rules --forecasts 1000 --rule-sets 8
+"""
+import argparse
+import json
+from time import perf_counter
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks.analysis_rules import CompiledRules, RuleSet
+
+CONDITIONS = ('clear', 'partly-cloudy', 'cloudy', 'overcast', 'light-rain')
+
+
+def make_rule_sets(count: int) -> list[RuleSet]:
+    return [
+        RuleSet(
+            f'rules{i}',
+            i % 8,
+            12 + i % 12,
+            tuple(
+                (condition, 1 / (1 + (i + j) % 3))
+                for j, condition in enumerate(CONDITIONS)
+            ),
+            -5 + i % 10,
+            None if i % 2 else 25,
+        )
+        for i in range(count)
+    ]
+
+
+def elapsed_s(rate, forecasts: list) -> float:
+    started = perf_counter()
+    for data in forecasts:
+        rate(data)
+    return round(perf_counter() - started, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--forecasts', type=int, default=1000)
+    parser.add_argument('--rule-sets', type=int, default=8)
+    args = parser.parse_args()
+
+    forecasts = [make_forecast(f'CITY{i}') for i in range(args.forecasts)]
+    rule_sets = make_rule_sets(args.rule_sets)
+    together = CompiledRules(rule_sets)
+    apart = [CompiledRules([rule_set]) for rule_set in rule_sets]
+    report = {
+        'analyze_json_s': elapsed_s(analyze_json, forecasts),
+        'one_pass_s': elapsed_s(together.evaluate, forecasts),
+        'pass_per_rule_set_s': elapsed_s(
+            lambda data: [rules.evaluate(data) for rules in apart],
+            forecasts
+        ),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
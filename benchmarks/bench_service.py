@@ -0,0 +1,97 @@
+"""
+Latency of rating queries served from memory in service mode over kept
+alive TCP and Unix socket connections, with a ranking of synthetic
+cities and no fetching:
+
+    python -m benchmarks.bench_service --cities 100000 --requests 5000
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter
+
+from tasks.data_aggregation_task import TotalSummary
+from tasks.data_calculation_task import PackedDays
+from tasks.rating_service import RatingBoard, make_server
+
+PATHS = ('/best', '/rating?top=10', '/city/CITY42', '/health')
+
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__('localhost')
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.connect(self.socket_path)
+
+
+def make_board(cities: int) -> RatingBoard:
+    rnd = random.Random(0)
+    board = RatingBoard()
+    board.update(
+        TotalSummary(
+            f'CITY{i}',
+            PackedDays.pack([]),
+            rnd.uniform(-100, 300),
+            rnd.randrange(60),
+            10,
+            3,
+        )
+        for i in range(cities)
+    )
+    return board
+
+
+def percentiles(connection: http.client.HTTPConnection, path: str,
+                requests: int) -> dict:
+    samples = []
+    for _ in range(requests):
+        started = perf_counter()
+        connection.request('GET', path)
+        connection.getresponse().read()
+        samples.append(perf_counter() - started)
+    samples.sort()
+    return {
+        'p50_ms': round(samples[len(samples) // 2] * 1e3, 3),
+        'p99_ms': round(samples[len(samples) * 99 // 100] * 1e3, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    started = perf_counter()
+    board = make_board(args.cities)
+    report: dict = {'update_ms': round((perf_counter() - started) * 1e3, 1)}
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = str(Path(directory) / 'ratings.sock')
+        for name, endpoint in (('tcp', ('127.0.0.1', 0)),
+                               ('unix', socket_path)):
+            server = make_server(endpoint, board)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            connection = (
+                UnixConnection(socket_path) if name == 'unix' else
+                http.client.HTTPConnection(*server.server_address)
+            )
+            report[name] = {
+                path: percentiles(connection, path, args.requests)
+                for path in PATHS
+            }
+            connection.close()
+            server.shutdown()
+            server.server_close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup cost of the CLI: import time of `forecasting` from
+`python -X importtime` with its slowest imports, and time from launch
+to the first request reaching the fake server and to exit, per worker
+start method:
+
+    python -m benchmarks.bench_startup --runs 5 --cities 20
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import monotonic
+
+from benchmarks.fake_server import FakeForecastServer
+
+ROOT = Path(__file__).resolve().parent.parent
+START_METHODS = ('forkserver', 'spawn', 'fork')
+
+
+def import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Self and cumulative import time in microseconds by module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def bench_imports(runs: int, slowest: int) -> dict:
+    samples = [import_times('forecasting') for _ in range(runs)]
+    last = samples[-1]
+    return {
+        'import_ms': round(statistics.median(
+            times['forecasting'][1] for times in samples
+        ) / 1e3, 1),
+        'slowest_imports_ms': {
+            name: round(cumulative / 1e3, 1)
+            for name, (_, cumulative) in sorted(
+                last.items(),
+                key=lambda item: item[1][1],
+                reverse=True
+            )[1:slowest + 1]
+        },
+    }
+
+
+def launch(server: FakeForecastServer, cities: Path, start_method: str,
+           workdir: str) -> tuple[float, float]:
+    server.first_request_at = None
+    started = monotonic()
+    subprocess.run(
+        [
+            sys.executable, str(ROOT / 'forecasting.py'),
+            '--cities', str(cities),
+            '-f', '1',
+            '-w', '2',
+            '--start-method', start_method,
+        ],
+        cwd=workdir,
+        capture_output=True,
+        check=True,
+    )
+    finished = monotonic()
+    assert server.first_request_at is not None
+    return server.first_request_at - started, finished - started
+
+
+def bench_launch(runs: int, cities_count: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            FakeForecastServer() as server:
+        cities = Path(workdir) / 'cities.json'
+        cities.write_text(json.dumps({
+            f'CITY{i}': server.url_for(f'city{i}')
+            for i in range(cities_count)
+        }))
+        for start_method in START_METHODS:
+            samples = [
+                launch(server, cities, start_method, workdir)
+                for _ in range(runs)
+            ]
+            results[start_method] = {
+                'first_fetch_ms': round(statistics.median(
+                    first for first, _ in samples
+                ) * 1e3, 1),
+                'total_ms': round(statistics.median(
+                    total for _, total in samples
+                ) * 1e3, 1),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--slowest', type=int, default=10)
+    args = parser.parse_args()
+
+    print(json.dumps({
+        **bench_imports(args.runs, args.slowest),
+        'launch': bench_launch(args.runs, args.cities),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
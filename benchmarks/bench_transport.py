@@ -0,0 +1,78 @@
+"""
+Compare passing parsed forecasts (pickled dicts) against shared memory
+payload handles to analyzing workers, across payload sizes:
+
+    python -m benchmarks.bench_transport -n 200 --days 5 30 120
+"""
+import argparse
+import json
+from multiprocessing import JoinableQueue
+from time import perf_counter
+
+from benchmarks.synthetic import make_forecast
+from my_concurrent.process_pool import ProcessPool
+from my_concurrent.shared_payload import SharedPayload
+from tasks import DataCalculationTask
+from tasks.data_fetching_task import CityRawData, CityRawPayload
+
+
+def make_item(transport: str, city: str, body: bytes):
+    if transport == 'shm':
+        return CityRawPayload(city, SharedPayload.create(body))
+
+    return CityRawData(city, json.loads(body.decode('utf-8')))
+
+
+def run(transport: str, bodies: list[bytes], workers: int) -> dict:
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    pool = ProcessPool.make_pool(
+        DataCalculationTask.calculate_summary_by_days,
+        workers,
+        in_q,
+        out_q
+    )
+    pool.start_all()
+
+    started = perf_counter()
+    for i, body in enumerate(bodies):
+        in_q.put(make_item(transport, f'city{i}', body))
+    producer_seconds = perf_counter() - started
+
+    for _ in bodies:
+        result = out_q.get()
+        assert result.message is None, result.message
+    elapsed = perf_counter() - started
+    pool.stop_all()
+
+    return {
+        'producer_ms_per_item': round(producer_seconds / len(bodies) * 1e3, 3),
+        'seconds': round(elapsed, 4),
+        'items_per_sec': round(len(bodies) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--items', type=int, default=200)
+    parser.add_argument('-w', '--workers', type=int, default=2)
+    parser.add_argument('--days', type=int, nargs='+', default=[5, 30, 120])
+    args = parser.parse_args()
+
+    report = []
+    for days in args.days:
+        bodies = [
+            json.dumps(make_forecast(f'city{i}', days, days)).encode()
+            for i in range(args.items)
+        ]
+        report.append({
+            'days': days,
+            'payload_bytes': len(bodies[0]),
+            'pickle': run('pickle', bodies, args.workers),
+            'shm': run('shm', bodies, args.workers),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from benchmarks.synthetic import make_forecast
+
+
+@lru_cache(maxsize=4096)
+def _forecast_body(path: str, days: int, full_days: int) -> bytes:
+    return json.dumps(make_forecast(path, days, full_days)).encode()
+
+
+class ForecastHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'FakeForecastServer'
+
+    def setup(self):
+        # emulate TCP+TLS handshake cost of a new connection
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+        super().setup()
+
+    def do_GET(self):
+        if self.server.first_request_at is None:
+            self.server.first_request_at = time.monotonic()
+        delay = self.server.delay()
+        if delay:
+            time.sleep(delay)
+        if self.server.should_fail():
+            self.send_error(500, 'Synthetic failure')
+            return
+
+        body = _forecast_body(
+            self.path,
+            self.server.days,
+            self.server.full_days
+        )
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeForecastServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the forecasts host serving synthetic responses.
+    `latency` delays every response, `days` and `full_days` set the
+    payload size and `error_rate` is the share of requests failing with
+    HTTP 500. `tail_rate` of the responses take `tail_latency` instead
+    of `latency`, as a slow host or a lost packet would.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(
+            self,
+            connect_delay: float = 0.0,
+            days: int = 5,
+            port: int = 0,
+            latency: float = 0.0,
+            full_days: int = 3,
+            error_rate: float = 0.0,
+            seed: int = 0,
+            tail_rate: float = 0.0,
+            tail_latency: float = 0.0,
+    ):
+        super().__init__(('127.0.0.1', port), ForecastHandler)
+        self.connect_delay = connect_delay
+        self.days = days
+        self.full_days = min(full_days, days)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.first_request_at: Optional[float] = None
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def handle_error(self, request, client_address):
+        # clients giving up on slow responses are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def delay(self) -> float:
+        if not self.tail_rate:
+            return self.latency
+        with self._random_lock:
+            is_tail = self._random.random() < self.tail_rate
+        return self.tail_latency if is_tail else self.latency
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def url_for(self, city: str) -> str:
+        return f'{self.base_url}/{city.lower()}-response.json'
+
+    def __enter__(self) -> 'FakeForecastServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
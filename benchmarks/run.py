@@ -0,0 +1,393 @@
+"""
+End-to-end and per-stage throughput against the local fake forecast
+server, every run in a fresh process so that peak RSS is its own:
+
+    python -m benchmarks.run --cities 10 1000 100000 -o report.json
+    python -m benchmarks.run --cities 1000 --stages fetch --latency 0.02
+    python -m benchmarks.run --cities 1000 --stages fetch --latency 0.01 \\
+        --tail-rate 0.02 --tail-latency 1 --error-rate 0.05 --hedge 0.95
+
+Prints JSON with cities/sec, p50/p99 per-city stage latency and peak RSS
+of the benchmark process and of its largest child.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import threading
+from datetime import datetime, timezone
+from multiprocessing import JoinableQueue
+from time import perf_counter
+from typing import Iterable, Optional
+
+from benchmarks.fake_server import FakeForecastServer
+from benchmarks.synthetic import make_forecast
+from common_types.task_types import TaskState
+from external.client import YandexWeatherAPI
+from external.resilience import ResiliencePolicy, RetryPolicy, HedgePolicy
+from my_concurrent.thread_fetcher import ThreadFetcher
+from tasks import DataAggregationTask, DataAnalyzingTask
+from tasks import DataCalculationTask, DataFetchingTask, TotalSummary
+from tasks.data_calculation_task import CitySummary, ANALYZERS
+from tasks.data_fetching_task import CityNameUrlPair, CityRawData
+from tasks.result_store import ResultStore
+
+STAGES = ('e2e', 'fetch', 'calculate', 'aggregate', 'analyze')
+DEFAULT_CITIES = (10, 1000, 100000)
+# distinct synthetic forecasts, larger runs cycle through them
+DISTINCT_FORECASTS = 1000
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def summarize(
+        cities: int,
+        seconds: float,
+        latencies: Optional[list[float]] = None,
+        **extra
+) -> dict:
+    p50 = percentile(latencies or [], 0.5)
+    p99 = percentile(latencies or [], 0.99)
+    return {
+        'cities': cities,
+        'seconds': round(seconds, 4),
+        'cities_per_sec': round(cities / seconds, 1) if seconds else None,
+        'p50_ms': round(p50 * 1e3, 3) if p50 is not None else None,
+        'p99_ms': round(p99 * 1e3, 3) if p99 is not None else None,
+        **extra,
+    }
+
+
+def city_sources(
+        server: FakeForecastServer,
+        cities: int
+) -> list[CityNameUrlPair]:
+    return [(f'CITY{i}', server.url_for(f'city{i}')) for i in range(cities)]
+
+
+def raw_cities(cities: int, args) -> Iterable[CityRawData]:
+    forecasts = [
+        make_forecast(f'city{i}', args.days, args.full_days)
+        for i in range(min(cities, DISTINCT_FORECASTS))
+    ]
+    for i in range(cities):
+        yield CityRawData(f'CITY{i}', forecasts[i % len(forecasts)])
+
+
+class TimedFetcher:
+    def __init__(self, task: DataFetchingTask):
+        self._task = task
+        self.latencies: list[float] = []
+
+    def get_sources(self) -> Iterable[CityNameUrlPair]:
+        return self._task.get_sources()
+
+    def fetch_source(self, source: CityNameUrlPair) -> CityRawData:
+        started = perf_counter()
+        try:
+            return self._task.fetch_source(source)
+        finally:
+            self.latencies.append(perf_counter() - started)
+
+
+def bench_e2e(cities: int, args) -> dict:
+    import pipeline
+
+    _configure_resilience(args)
+    result_store = None
+    if args.results_db:
+        # a store filled by a previous run measures the unchanged case
+        result_store = ResultStore(args.results_db)
+    with _make_server(args) as server:
+        sources = city_sources(server, cities)
+        started = perf_counter()
+        pipeline.find_bet_city(
+            sources,
+            pipeline.PipelineSettings(
+                fetchers_count=args.fetchers,
+                calculation_workers_count=args.workers,
+                fetch_engine=args.fetch_engine,
+                streaming=args.streaming,
+                analyzer=args.analyzer,
+                batch_size=args.batch_size,
+            ),
+            result_store=result_store,
+        )
+        seconds = perf_counter() - started
+    if result_store is not None:
+        result_store.close()
+        return summarize(
+            cities,
+            seconds,
+            unchanged=result_store.stats().hits,
+            **_resilience_stats()
+        )
+    return summarize(cities, seconds, **_resilience_stats())
+
+
+def bench_fetch(cities: int, args) -> dict:
+    _configure_resilience(args)
+    with _make_server(args) as server:
+        timed = TimedFetcher(DataFetchingTask(city_sources(server, cities)))
+        out_q: JoinableQueue = JoinableQueue()
+        errors = 0
+
+        def drain():
+            nonlocal errors
+            for _ in range(cities):
+                errors += out_q.get().message is not None
+                out_q.task_done()
+
+        drainer = threading.Thread(target=drain)
+        drainer.start()
+        started = perf_counter()
+        ThreadFetcher(timed, args.fetchers, out_q).fetch_data()
+        drainer.join()
+        return summarize(
+            cities,
+            perf_counter() - started,
+            timed.latencies,
+            errors=errors,
+            **_resilience_stats()
+        )
+
+
+def bench_calculate(cities: int, args) -> dict:
+    latencies = []
+    seconds = 0.0
+    for raw in raw_cities(cities, args):
+        started = perf_counter()
+        DataCalculationTask.calculate_summary_by_days(raw, args.analyzer)
+        latencies.append(perf_counter() - started)
+        seconds += latencies[-1]
+    return summarize(cities, seconds, latencies)
+
+
+def _city_summaries(cities: int, args) -> Iterable[CitySummary]:
+    summaries = [
+        DataCalculationTask.calculate_summary_by_days(raw, args.analyzer)
+        for raw in raw_cities(min(cities, DISTINCT_FORECASTS), args)
+    ]
+    for i in range(cities):
+        yield summaries[i % len(summaries)]._replace(city=f'CITY{i}')
+
+
+class ListReader:
+    def __init__(self, summaries: Iterable[CitySummary]):
+        self._summaries = summaries
+
+    def read_tasks(self) -> Iterable[TaskState[CitySummary]]:
+        for summary in self._summaries:
+            yield TaskState[CitySummary].ok(summary)
+
+
+def bench_aggregate(cities: int, args) -> dict:
+    summaries = list(_city_summaries(cities, args))
+    aggregated = iter(
+        DataAggregationTask(ListReader(summaries)).aggregate_tasks()
+    )
+    latencies = []
+    started = perf_counter()
+    while True:
+        item_started = perf_counter()
+        if next(aggregated, None) is None:
+            break
+        latencies.append(perf_counter() - item_started)
+    return summarize(cities, perf_counter() - started, latencies)
+
+
+def bench_analyze(cities: int, args) -> dict:
+    totals: list[TotalSummary] = list(
+        DataAggregationTask(
+            ListReader(_city_summaries(cities, args))
+        ).aggregate_tasks()
+    )
+    started = perf_counter()
+    if args.top is not None:
+        DataAnalyzingTask().rank_cities(totals, args.top)
+    else:
+        DataAnalyzingTask().find_best_city(totals)
+    return summarize(cities, perf_counter() - started)
+
+
+BENCHMARKS = {
+    'e2e': bench_e2e,
+    'fetch': bench_fetch,
+    'calculate': bench_calculate,
+    'aggregate': bench_aggregate,
+    'analyze': bench_analyze,
+}
+
+
+def _make_server(args) -> FakeForecastServer:
+    return FakeForecastServer(
+        connect_delay=args.connect_delay,
+        days=args.days,
+        latency=args.latency,
+        full_days=args.full_days,
+        error_rate=args.error_rate,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+    )
+
+
+def _configure_resilience(args):
+    YandexWeatherAPI.configure_resilience(ResiliencePolicy(
+        retry=RetryPolicy(args.retries + 1),
+        hedge=HedgePolicy(args.hedge) if args.hedge is not None else None,
+    ))
+
+
+def _resilience_stats() -> dict:
+    if YandexWeatherAPI.resilience is None:
+        return {}
+    return YandexWeatherAPI.resilience.stats()._asdict()
+
+
+def _peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / scale, 1)
+
+
+def _run_one(
+        stage: str,
+        cities: int,
+        args,
+        start_method: str,
+        results: multiprocessing.Queue
+):
+    # a spawned process defaults to spawning its own workers too
+    multiprocessing.set_start_method(start_method, force=True)
+    try:
+        result = BENCHMARKS[stage](cities, args)
+    except Exception as e:
+        result = {'cities': cities, 'error': repr(e)}
+    # only waited for children count in RUSAGE_CHILDREN
+    for child in multiprocessing.active_children():
+        child.join()
+    results.put({
+        'stage': stage,
+        **result,
+        'peak_rss_mb': _peak_rss_mb(resource.RUSAGE_SELF),
+        'peak_child_rss_mb': _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+
+def run_isolated(stage: str, cities: int, args) -> dict:
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    proc = context.Process(
+        target=_run_one,
+        args=(stage, cities, args, multiprocessing.get_start_method(), results)
+    )
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Forecasts analyzer throughput benchmarks',
+    )
+    parser.add_argument(
+        '--cities', type=int, nargs='+', default=list(DEFAULT_CITIES)
+    )
+    parser.add_argument(
+        '--stages', choices=STAGES, nargs='+', default=list(STAGES)
+    )
+    parser.add_argument('-o', '--output', default=None)
+    parser.add_argument('-f', '--fetchers', type=int, default=16)
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument(
+        '--fetch-engine', choices=('thread', 'async'), default='thread'
+    )
+    parser.add_argument('-s', '--streaming', action='store_true')
+    parser.add_argument(
+        '--analyzer', choices=tuple(ANALYZERS), default='default'
+    )
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument(
+        '--top', type=int, default=None,
+        help='Rank only the N best cities in the analyze stage'
+    )
+    parser.add_argument(
+        '--results-db', default=None,
+        help='Result store for the e2e stage, kept between runs'
+    )
+    parser.add_argument(
+        '--latency', type=float, default=0.0,
+        help='Seconds the fake server delays every response'
+    )
+    parser.add_argument('--connect-delay', type=float, default=0.0)
+    parser.add_argument(
+        '--tail-rate', type=float, default=0.0,
+        help='Share of responses delayed by --tail-latency instead'
+    )
+    parser.add_argument('--tail-latency', type=float, default=0.0)
+    parser.add_argument(
+        '--retries', type=int, default=2,
+        help='Times a failed request is retried'
+    )
+    parser.add_argument(
+        '--hedge', type=float, default=None, metavar='QUANTILE',
+        help='Latency quantile after which a request is hedged'
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0.0,
+        help='Share of requests the fake server fails'
+    )
+    parser.add_argument(
+        '--days', type=int, default=5, help='Forecast days per response'
+    )
+    parser.add_argument(
+        '--full-days', type=int, default=3, help='Days with hourly data'
+    )
+    args = parser.parse_args()
+
+    results = []
+    for cities in args.cities:
+        for stage in args.stages:
+            result = run_isolated(stage, cities, args)
+            print(json.dumps(result), file=sys.stderr)
+            results.append(result)
+
+    report = json.dumps({
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'options': vars(args),
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import random
+from datetime import date, datetime, timedelta, timezone
+
+CONDITIONS = (
+    'clear',
+    'partly-cloudy',
+    'cloudy',
+    'overcast',
+    'drizzle',
+    'light-rain',
+    'rain',
+    'showers',
+    'light-snow',
+    'thunderstorm',
+)
+FIRST_DAY = date(2022, 5, 26)
+
+
+def make_forecast(seed: str, days: int = 5, full_days: int = 3) -> dict:
+    """
+    Build a forecast in the upstream response schema, only the first
+    `full_days` days carry hourly data just like the real responses.
+    """
+    rnd = random.Random(seed)
+    forecasts = []
+    for day in range(days):
+        day_date = FIRST_DAY + timedelta(days=day)
+        day_ts = int(datetime(
+            day_date.year, day_date.month, day_date.day,
+            tzinfo=timezone.utc
+        ).timestamp())
+        hours = [
+            {
+                'hour': str(hour),
+                'hour_ts': day_ts + hour * 3600,
+                'temp': rnd.randint(-5, 30),
+                'feels_like': rnd.randint(-10, 30),
+                'condition': rnd.choice(CONDITIONS),
+                'wind_speed': round(rnd.uniform(0, 10), 1),
+                'pressure_mm': rnd.randint(730, 770),
+                'humidity': rnd.randint(20, 100),
+            }
+            for hour in range(24)
+        ] if day < full_days else []
+        forecasts.append({
+            'date': day_date.isoformat(),
+            'date_ts': day_ts,
+            'week': 21,
+            'sunrise': '04:00',
+            'sunset': '21:00',
+            'parts': {
+                part: {'temp_avg': rnd.randint(-5, 30)}
+                for part in ('night', 'morning', 'day', 'evening')
+            },
+            'hours': hours,
+        })
+
+    return {
+        'now': 1653575000,
+        'info': {'lat': 55.75, 'lon': 37.62, 'tzinfo': {'offset': 10800}},
+        'geo_object': {'locality': {'id': 213, 'name': seed}},
+        'fact': {'temp': rnd.randint(-5, 30), 'condition': 'clear'},
+        'forecasts': forecasts,
+    }
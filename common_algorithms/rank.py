@@ -19,3 +19,21 @@ def get_rank(seq: Sequence[Comparable]) -> tuple[Comparable, ...]:
         prev_value = x
 
     return tuple(ranks[x] for x in seq)
+
+
+def get_rank_sorted(sorted_seq: Sequence[Any]) -> tuple[int, ...]:
+    """
+    Ranks of a sequence already sorted in descending order, tied values
+    share the rank of the first of them. Values are only compared for
+    equality with their neighbour, so they don't have to be hashable.
+    """
+    ranks = []
+    prev_value = None
+    curr_rank = 0
+    for i, x in enumerate(sorted_seq, 1):
+        if i == 1 or x != prev_value:
+            curr_rank = i
+            prev_value = x
+        ranks.append(curr_rank)
+
+    return tuple(ranks)
@@ -0,0 +1,39 @@
+import heapq
+from typing import Callable, Iterable, TypeVar, Any
+
+T = TypeVar('T')
+
+
+def top_k(
+        items: Iterable[T],
+        k: int,
+        key: Callable[[T], Any]
+) -> list[T]:
+    """
+    `k` items with the greatest keys in descending order, items tied with
+    the last of them are kept as well so that their ranks stay correct.
+    Consumes `items` once holding O(k) of them, ties keep input order.
+    """
+    if k <= 0:
+        return []
+
+    # index breaks ties without comparing items, min-heap root is the
+    # smallest kept key
+    heap: list[tuple[Any, int, T]] = []
+    ties: list[tuple[Any, int, T]] = []
+    for i, item in enumerate(items):
+        entry = (key(item), -i, item)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            dropped = heapq.heapreplace(heap, entry)
+            if dropped[0] == heap[0][0]:
+                ties.append(dropped)
+            else:
+                ties = []
+        elif entry[0] == heap[0][0]:
+            ties.append(entry)
+
+    kept = heap + ties
+    kept.sort(key=lambda e: (e[0], e[1]), reverse=True)
+    return [item for _, _, item in kept]
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import NamedTuple, Optional, TypeVar, Generic
+from typing import NamedTuple, Optional, TypeVar, Generic, Protocol, Any
 
 
 TaskData = TypeVar('TaskData')
@@ -22,3 +22,15 @@ class TaskState(NamedTuple, Generic[TaskData]):
     @classmethod
     def ok(cls, data: TaskData) -> 'TaskState':
         return cls(Status.OK, None, data)
+
+
+class TaskBatch(NamedTuple, Generic[TaskData]):
+    tasks: list[TaskState[TaskData]]
+    # tracing spans recorded by the worker while handling the tasks
+    spans: tuple = ()
+
+
+class TaskSink(Protocol):
+    """Where a stage puts its tasks, usually the next stage queue"""
+    def put(self, item: Any):
+        ...
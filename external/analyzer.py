@@ -56,9 +56,11 @@ def deep_getitem(obj, path: str):
 
 
 def load_data(input_path: str = PATH_FROM_INPUT):
-    with open(input_path) as file:
-        data = file.read()
-        return json.loads(data)
+    # the decoder reuses the field names above
+    from external.decoder import Decoder
+
+    with open(input_path, mode="rb") as file:
+        return Decoder()(file.read())
 
 
 def dump_data(data, output_path: str = PATH_TO_OUTPUT):
@@ -87,7 +89,7 @@ def parse_args():
     return parser.parse_args()
 
 
-@dataclass
+@dataclass(slots=True)
 class HourInfo:
     raw_data: Dict[str, tuple[str, int]] = field(repr=False)
     condition: Optional[str] = field(init=False, default=None)
@@ -119,7 +121,7 @@ class HourInfo:
         self.condition = deep_getitem(self.raw_data, INPUT_CONDITION_PATH)
 
 
-@dataclass
+@dataclass(slots=True)
 class DayInfo:
     raw_data: Dict[str, tuple[str, int]] = field(repr=False)
     hours: Optional[List[HourInfo]] = field(
@@ -202,7 +204,7 @@ def analyze_json(data):
 
         days.append(d_info.to_json())
 
-    result = DEFAULT_OUTPUT_RESULT
+    result = dict(DEFAULT_OUTPUT_RESULT)
     # result[OUTPUT_RAW_DATA_KEY] = data
     result[OUTPUT_DAYS_KEY] = days
     return result
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import ssl
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import urlsplit
+
+from external.client import Response, YandexWeatherAPI
+from external.resilience import RETRY_STATUSES
+
+ERR_MESSAGE_TEMPLATE = "Unexpected error: {error}"
+BODILESS_STATUSES = (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED)
+
+
+logger = logging.getLogger()
+
+
+class AsyncYandexWeatherAPI:
+    """
+    Non-blocking HTTP/1.1 client built on top of asyncio streams, with
+    the timeout and resilience `YandexWeatherAPI` is configured with
+    """
+
+    _ssl_context: Optional[ssl.SSLContext] = None
+
+    @classmethod
+    def _get_ssl_context(cls) -> ssl.SSLContext:
+        if cls._ssl_context is None:
+            cls._ssl_context = ssl.create_default_context()
+        return cls._ssl_context
+
+    @staticmethod
+    async def _read_body(
+            reader: asyncio.StreamReader,
+            headers: dict[str, str]
+    ) -> bytes:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+                if size == 0:
+                    # skip trailers up to the terminating empty line
+                    while (await reader.readline()).strip():
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            return b"".join(chunks)
+
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+
+        return await reader.read()
+
+    @classmethod
+    async def _do_req(
+            cls,
+            url: str,
+            headers: Optional[dict[str, str]],
+            timeout: Optional[float]
+    ) -> Response:
+        parts = urlsplit(url)
+        is_https = parts.scheme == "https"
+        host = parts.hostname or ""
+        port = parts.port or (443 if is_https else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        extra_headers = "".join(
+            f"{name}: {value}\r\n" for name, value in (headers or {}).items()
+        )
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=cls._get_ssl_context() if is_https else None,
+            ),
+            timeout,
+        )
+        try:
+            writer.write(
+                f"GET {target} HTTP/1.1\r\n"
+                f"Host: {parts.netloc}\r\n"
+                "Accept: application/json\r\n"
+                "Accept-Encoding: identity\r\n"
+                "Connection: close\r\n"
+                f"{extra_headers}"
+                "\r\n".encode("latin-1")
+            )
+            await writer.drain()
+
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            _, status, *reason = (
+                status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+            )
+
+            response_headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+
+            body = b""
+            if int(status) not in BODILESS_STATUSES:
+                body = await asyncio.wait_for(
+                    cls._read_body(reader, response_headers),
+                    timeout
+                )
+        finally:
+            writer.close()
+
+        return Response(int(status), " ".join(reason), response_headers, body)
+
+    @classmethod
+    async def _request(
+            cls,
+            url: str,
+            headers: Optional[dict[str, str]],
+            timeout: Optional[float]
+    ) -> Response:
+        try:
+            return await cls._do_req(url, headers, timeout)
+        except Exception as ex:
+            logger.error(ex)
+            raise Exception(ERR_MESSAGE_TEMPLATE.format(error=ex))
+
+    @classmethod
+    async def get_response(
+            cls,
+            url: str,
+            headers: Optional[dict[str, str]] = None,
+            timeout: Optional[float] = None
+    ) -> Response:
+        """
+        :param url: url_to_json_data as str
+        :param headers: extra request headers, e.g. conditional ones
+        :param timeout: seconds to wait for connection and each read,
+            the timeout of `YandexWeatherAPI.pool` by default
+        :return: raw response, any status
+        """
+        if timeout is None:
+            timeout = YandexWeatherAPI.pool.timeout
+        resilience = YandexWeatherAPI.resilience
+        if resilience is None:
+            return await cls._request(url, headers, timeout)
+
+        return await resilience.call_async(
+            urlsplit(url).netloc,
+            lambda: cls._request(url, headers, timeout),
+            lambda response: response.status in RETRY_STATUSES
+        )
+
+    @classmethod
+    async def get_forecasting(
+            cls,
+            url: str,
+            timeout: Optional[float] = None
+    ):
+        """
+        :param url: url_to_json_data as str
+        :param timeout: seconds to wait for connection and each read,
+            the timeout of `YandexWeatherAPI.pool` by default
+        :return: response data as json
+        """
+        response = await cls.get_response(url, timeout=timeout)
+        return YandexWeatherAPI.parse_response(response)
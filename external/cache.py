@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from pathlib import Path
+from time import time
+from typing import NamedTuple, Optional
+
+from external.client import Response
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_TTL = 300.0
+
+BODY_SUFFIX = ".body"
+META_SUFFIX = ".json"
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    size: int
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    revalidated: int
+    evicted: int
+
+
+class ResponseCache:
+    """
+    On-disk cache of raw response bodies keyed by URL.
+
+    Entries younger than `ttl` are served without a request, older ones
+    are revalidated with If-None-Match/If-Modified-Since. Entries are
+    evicted in LRU order once the bodies exceed `max_size` bytes. Expired
+    entries without validators can't be revalidated and are dropped when
+    the cache is opened.
+    """
+
+    def __init__(
+            self,
+            cache_dir: Path,
+            max_size: int = DEFAULT_MAX_SIZE,
+            ttl: float = DEFAULT_TTL
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._total_size = 0
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        self._evicted = 0
+        self._load_index()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                self._hits,
+                self._misses,
+                self._revalidated,
+                self._evicted
+            )
+
+    def get_fresh(self, url: str) -> Optional[Response]:
+        key = self._key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._is_expired(entry):
+                return None
+            self._entries.move_to_end(key)
+
+        body = self._read_body(key)
+        if body is None:
+            return None
+
+        with self._lock:
+            self._hits += 1
+        return Response(HTTPStatus.OK, "OK", {}, body)
+
+    def validators(self, url: str) -> dict[str, str]:
+        with self._lock:
+            entry = self._entries.get(self._key(url))
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def resolve(self, url: str, response: Response) -> Response:
+        """
+        Turn a (conditional) response into a full one and update the cache
+        """
+        key = self._key(url)
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            body = self._read_body(key)
+            if body is None:
+                raise Exception(f"Cached body for {url} is gone")
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry = entry._replace(stored_at=time())
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                self._revalidated += 1
+            if entry is not None:
+                self._write_meta(key, entry)
+            return Response(HTTPStatus.OK, "OK", response.headers, body)
+
+        with self._lock:
+            self._misses += 1
+        if response.status == HTTPStatus.OK:
+            self._store(key, url, response)
+        return response
+
+    def _store(self, key: str, url: str, response: Response):
+        entry = CacheEntry(
+            url=url,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            stored_at=time(),
+            size=len(response.body),
+        )
+        if entry.size > self.max_size:
+            return
+
+        self._atomic_write(self._path(key, BODY_SUFFIX), response.body)
+        self._write_meta(key, entry)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_size -= old.size
+            self._entries[key] = entry
+            self._total_size += entry.size
+            evicted = self._evict()
+
+        for evicted_key in evicted:
+            self._remove_files(evicted_key)
+
+    def _evict(self, expired: bool = False) -> list[str]:
+        evicted = []
+        if expired:
+            evicted = [
+                key
+                for key, entry in self._entries.items()
+                if self._is_expired(entry) and not entry.has_validators
+            ]
+            for key in evicted:
+                self._total_size -= self._entries.pop(key).size
+
+        while self._total_size > self.max_size and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._total_size -= entry.size
+            evicted.append(key)
+
+        self._evicted += len(evicted)
+        return evicted
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return time() - entry.stored_at > self.ttl
+
+    def _load_index(self):
+        entries = []
+        for meta_path in self.cache_dir.glob(f"*{META_SUFFIX}"):
+            key = meta_path.name[:-len(META_SUFFIX)]
+            body_path = self._path(key, BODY_SUFFIX)
+            try:
+                entry = CacheEntry(**json.loads(meta_path.read_text()))
+                accessed = body_path.stat().st_mtime
+            except (OSError, ValueError, TypeError):
+                self._remove_files(key)
+                continue
+            entries.append((accessed, key, entry))
+
+        for _, key, entry in sorted(entries):
+            self._entries[key] = entry
+            self._total_size += entry.size
+
+        for key in self._evict(expired=True):
+            self._remove_files(key)
+
+    def _read_body(self, key: str) -> Optional[bytes]:
+        body_path = self._path(key, BODY_SUFFIX)
+        try:
+            body = body_path.read_bytes()
+            # body mtime keeps LRU order across runs
+            os.utime(body_path)
+        except OSError:
+            return None
+        return body
+
+    def _write_meta(self, key: str, entry: CacheEntry):
+        self._atomic_write(
+            self._path(key, META_SUFFIX),
+            json.dumps(entry._asdict()).encode("utf-8")
+        )
+
+    def _atomic_write(self, path: Path, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _remove_files(self, key: str):
+        for suffix in (BODY_SUFFIX, META_SUFFIX):
+            try:
+                self._path(key, suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / f"{key}{suffix}"
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
@@ -1,33 +1,263 @@
-import json
 import logging
+import os
+import threading
 from http import HTTPStatus
-from urllib.request import urlopen
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from time import monotonic
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from external.decoder import Decoder
+from external.resilience import Resilience, ResiliencePolicy, RETRY_STATUSES
 
 ERR_MESSAGE_TEMPLATE = "Unexpected error: {error}"
+DEFAULT_POOL_SIZE = 16
+DEFAULT_IDLE_TIMEOUT = 30.0
+# seconds a connect or a read may take, a stuck host fails fast
+DEFAULT_TIMEOUT = 10.0
 
 
 logger = logging.getLogger()
 
 
+class Response(NamedTuple):
+    status: int
+    reason: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class PoolStats(NamedTuple):
+    opened: int
+    reused: int
+
+
+HostKey = tuple[str, str, int]
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of HTTP/1.1 keep-alive connections grouped by host
+    """
+
+    def __init__(
+            self,
+            max_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            timeout: Optional[float] = None,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle: dict[HostKey, list[tuple[float, HTTPConnection]]] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._opened = 0
+        self._reused = 0
+
+    def stats(self) -> PoolStats:
+        with self._lock:
+            return PoolStats(self._opened, self._reused)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, conn in connections:
+                conn.close()
+
+    def request(
+            self,
+            url: str,
+            headers: Optional[dict[str, str]] = None
+    ) -> Response:
+        parts = urlsplit(url)
+        is_https = parts.scheme == "https"
+        key = (
+            parts.scheme,
+            parts.hostname or "",
+            parts.port or (443 if is_https else 80),
+        )
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+
+        conn, reused = self._acquire(key)
+        try:
+            response, will_close = self._send(conn, target, headers)
+        except (HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # the server may drop an idle keep-alive connection at any
+            # moment, GET is idempotent so retry once on a fresh one
+            conn, _ = self._acquire(key, fresh=True)
+            try:
+                response, will_close = self._send(conn, target, headers)
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+
+        if will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return response
+
+    @staticmethod
+    def _send(
+            conn: HTTPConnection,
+            target: str,
+            headers: Optional[dict[str, str]]
+    ) -> tuple[Response, bool]:
+        conn.request("GET", target, headers=headers or {})
+        resp = conn.getresponse()
+        body = resp.read()
+        return Response(
+            resp.status,
+            resp.reason,
+            {name.lower(): value for name, value in resp.getheaders()},
+            body,
+        ), resp.will_close
+
+    def _acquire(
+            self,
+            key: HostKey,
+            fresh: bool = False
+    ) -> tuple[HTTPConnection, bool]:
+        now = monotonic()
+        expired = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # a forked child must not share sockets with its parent
+                self._idle = {}
+                self._pid = os.getpid()
+            idle = self._idle.get(key, [])
+            while idle and not fresh:
+                last_used, conn = idle.pop()
+                if now - last_used <= self.idle_timeout:
+                    self._reused += 1
+                    break
+                expired.append(conn)
+            else:
+                conn = None
+                self._opened += 1
+
+        for old_conn in expired:
+            old_conn.close()
+
+        if conn is not None:
+            return conn, True
+
+        scheme, host, port = key
+        conn_cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        return conn_cls(host, port, timeout=self.timeout), False
+
+    def _release(self, key: HostKey, conn: HTTPConnection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_size:
+                idle.append((monotonic(), conn))
+                return
+
+        conn.close()
+
+
 class YandexWeatherAPI:
     """
     Base class for requests
     """
 
+    pool = ConnectionPool(timeout=DEFAULT_TIMEOUT)
+    decoder = Decoder()
+    resilience: Optional[Resilience] = None
+
+    @classmethod
+    def configure_pool(
+            cls,
+            max_size: int = DEFAULT_POOL_SIZE,
+            idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+            timeout: Optional[float] = DEFAULT_TIMEOUT
+    ):
+        cls.pool.close()
+        cls.pool = ConnectionPool(max_size, idle_timeout, timeout)
+
+    @classmethod
+    def configure_resilience(cls, policy: Optional[ResiliencePolicy]):
+        """Retries, hedging and circuit breaking, None turns them off"""
+        if cls.resilience is not None:
+            cls.resilience.close()
+        cls.resilience = Resilience(policy) if policy is not None else None
+
+    @classmethod
+    def configure_decoder(
+            cls,
+            backend: str = 'auto',
+            projection: bool = False
+    ):
+        cls.decoder = Decoder(backend, projection)
+
     @staticmethod
-    def __do_req(url: str) -> str:
+    def __do_req(
+            url: str,
+            headers: Optional[dict[str, str]] = None
+    ) -> Response:
         """Base request method"""
         try:
-            with urlopen(url) as response:
-                resp_body = response.read().decode("utf-8")
-                data = json.loads(resp_body)
-            if response.status != HTTPStatus.OK:
-                raise Exception(
-                    "Error during execute request. {}: {}".format(
-                        resp_body.status, resp_body.reason
-                    )
+            return YandexWeatherAPI.pool.request(url, headers)
+        except Exception as ex:
+            logger.error(ex)
+            raise Exception(ERR_MESSAGE_TEMPLATE.format(error=ex))
+
+    @staticmethod
+    def get_response(
+            url: str,
+            headers: Optional[dict[str, str]] = None
+    ) -> Response:
+        """
+        :param url: url_to_json_data as str
+        :param headers: extra request headers, e.g. conditional ones
+        :return: raw response, any status
+        """
+        resilience = YandexWeatherAPI.resilience
+        if resilience is None:
+            return YandexWeatherAPI.__do_req(url, headers)
+
+        return resilience.call(
+            urlsplit(url).netloc,
+            lambda: YandexWeatherAPI.__do_req(url, headers),
+            lambda response: response.status in RETRY_STATUSES
+        )
+
+    @staticmethod
+    def get_body(response: Response) -> bytes:
+        """
+        :param response: raw response
+        :return: response body of a successful response
+        """
+        if response.status != HTTPStatus.OK:
+            ex = Exception(
+                "Error during execute request. {}: {}".format(
+                    response.status, response.reason
                 )
-            return data
+            )
+            logger.error(ex)
+            raise Exception(ERR_MESSAGE_TEMPLATE.format(error=ex))
+        return response.body
+
+    @staticmethod
+    def parse_response(response: Response):
+        """
+        :param response: raw response
+        :return: response data as json
+        """
+        body = YandexWeatherAPI.get_body(response)
+        try:
+            return YandexWeatherAPI.decoder(body)
         except Exception as ex:
             logger.error(ex)
             raise Exception(ERR_MESSAGE_TEMPLATE.format(error=ex))
@@ -38,4 +268,6 @@ class YandexWeatherAPI:
         :param url: url_to_json_data as str
         :return: response data as json
         """
-        return YandexWeatherAPI.__do_req(url)
+        return YandexWeatherAPI.parse_response(
+            YandexWeatherAPI.get_response(url)
+        )
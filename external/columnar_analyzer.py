@@ -0,0 +1,151 @@
+import logging
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from external.analyzer import (
+    INPUT_CONDITION_PATH,
+    INPUT_DATE_PATH,
+    INPUT_DAY_HOURS_END,
+    INPUT_DAY_HOURS_START,
+    INPUT_DAY_SUITABLE_CONDITIONS,
+    INPUT_FORECAST_PATH,
+    INPUT_HOUR_PATH,
+    INPUT_HOURS_PATH,
+    INPUT_TEMPERATURE_PATH,
+    OUTPUT_DAYS_KEY,
+    DEFAULT_OUTPUT_RESULT,
+    deep_getitem,
+)
+
+SUITABLE_CONDITIONS = frozenset(INPUT_DAY_SUITABLE_CONDITIONS)
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError(
+            "columnar analyzer requires numpy, install it or use the "
+            "default analyzer"
+        )
+
+
+def analyze_json_columnar(data):
+    """
+    Same result as `external.analyzer.analyze_json` computed over NumPy
+    columns of all hours of the response
+    """
+    return analyze_json_batch([data])[0]
+
+
+def analyze_json_batch(batch: Iterable) -> list:
+    _require_numpy()
+
+    batch = list(batch)
+    dates = []
+    day_offsets = []
+    hours = []
+    temps = []
+    suitable = []
+    day_idx = []
+
+    for data in batch:
+        day_offsets.append(len(dates))
+        if not data:
+            continue
+
+        # read like `analyze_json` does, so malformed forecasts fail the
+        # same way rather than count as empty days or 0 degrees
+        days_data = deep_getitem(data, INPUT_FORECAST_PATH)
+        for day_data in sorted(days_data, key=lambda x: x['date_ts']):
+            day = len(dates)
+            dates.append(day_data[INPUT_DATE_PATH])
+            for hour_data in day_data[INPUT_HOURS_PATH]:
+                hour = int(hour_data[INPUT_HOUR_PATH])
+                if not INPUT_DAY_HOURS_START <= hour <= INPUT_DAY_HOURS_END:
+                    continue
+                hours.append(hour)
+                temps.append(int(deep_getitem(
+                    hour_data,
+                    INPUT_TEMPERATURE_PATH
+                )))
+                suitable.append(
+                    deep_getitem(hour_data, INPUT_CONDITION_PATH)
+                    in SUITABLE_CONDITIONS
+                )
+                day_idx.append(day)
+    day_offsets.append(len(dates))
+
+    days = _analyze_columns(
+        len(dates),
+        np.array(day_idx, dtype=np.int64),
+        np.array(hours, dtype=np.int64),
+        np.array(temps, dtype=np.int64),
+        np.array(suitable, dtype=bool),
+    )
+
+    results = []
+    for i, data in enumerate(batch):
+        if not data:
+            logging.warning("Input data is empty...")
+            results.append({})
+            continue
+
+        start, end = day_offsets[i], day_offsets[i + 1]
+        result = dict(DEFAULT_OUTPUT_RESULT)
+        result[OUTPUT_DAYS_KEY] = [
+            _day_to_json(dates[day], *days[day])
+            for day in range(start, end)
+        ]
+        results.append(result)
+
+    return results
+
+
+def _analyze_columns(days_count, day_idx, hours, temps, suitable) -> list:
+    # only hours inside the analyzed window are read into the columns
+    hours_count = np.bincount(day_idx, minlength=days_count)
+    temp_sum = np.zeros(days_count, dtype=np.int64)
+    np.add.at(temp_sum, day_idx, temps)
+    conds_count = np.bincount(
+        day_idx,
+        weights=suitable,
+        minlength=days_count
+    ).astype(np.int64)
+
+    hour_start = np.full(days_count, np.iinfo(np.int64).max)
+    np.minimum.at(hour_start, day_idx, hours)
+    hour_end = np.full(days_count, -1)
+    np.maximum.at(hour_end, day_idx, hours)
+
+    return list(zip(
+        hours_count.tolist(),
+        temp_sum.tolist(),
+        conds_count.tolist(),
+        hour_start.tolist(),
+        hour_end.tolist(),
+    ))
+
+
+def _day_to_json(
+        date: str,
+        hours_count: int,
+        temp_sum: int,
+        conds_count: int,
+        hour_start: int,
+        hour_end: int
+) -> dict:
+    # mirrors DayInfo.to_json including its rounding and None handling
+    temperature_avg = temp_sum / hours_count if hours_count > 0 else None
+    return {
+        "date": date,
+        "hours_start": hour_start if hours_count > 0 else None,
+        "hours_end": hour_end if hours_count > 0 else None,
+        "hours_count": hours_count,
+        "temp_avg": round(temperature_avg, 3)
+        if temperature_avg
+        else temperature_avg,
+        "relevant_cond_hours": conds_count,
+    }
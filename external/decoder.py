@@ -0,0 +1,80 @@
+import json
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from external.analyzer import (
+    INPUT_CONDITION_PATH,
+    INPUT_DATE_PATH,
+    INPUT_FORECAST_PATH,
+    INPUT_HOUR_PATH,
+    INPUT_HOURS_PATH,
+    INPUT_TEMPERATURE_PATH,
+)
+
+DECODERS = ('auto', 'stdlib', 'orjson')
+
+INPUT_DATE_TS_PATH = 'date_ts'
+# the only fields analyzers read from a forecast response
+DAY_FIELDS = (INPUT_DATE_PATH, INPUT_DATE_TS_PATH)
+HOUR_FIELDS = (INPUT_HOUR_PATH, INPUT_TEMPERATURE_PATH, INPUT_CONDITION_PATH)
+
+
+def decode_stdlib(body: bytes | memoryview) -> Any:
+    return json.loads(str(body, 'utf-8'))
+
+
+def decode_orjson(body: bytes | memoryview) -> Any:
+    return orjson.loads(body)
+
+
+def project_forecast(data: Any) -> Any:
+    """
+    Copy of a decoded response with only the fields analyzers read, so
+    the rest isn't kept in memory and pickled to workers
+    """
+    if not isinstance(data, dict) or INPUT_FORECAST_PATH not in data:
+        return data
+
+    forecasts = []
+    for day in data[INPUT_FORECAST_PATH] or []:
+        projected = {k: day[k] for k in DAY_FIELDS if k in day}
+        if INPUT_HOURS_PATH in day:
+            projected[INPUT_HOURS_PATH] = [
+                {k: hour[k] for k in HOUR_FIELDS if k in hour}
+                for hour in day[INPUT_HOURS_PATH]
+            ]
+        forecasts.append(projected)
+
+    return {INPUT_FORECAST_PATH: forecasts}
+
+
+class Decoder:
+    """
+    Decodes response bodies with orjson when it's installed or the
+    standard library otherwise, `projection` drops unused fields
+    """
+
+    def __init__(self, backend: str = 'auto', projection: bool = False):
+        if backend not in DECODERS:
+            raise ValueError(f'Unknown decoder: {backend}')
+        if backend == 'auto':
+            backend = 'orjson' if orjson is not None else 'stdlib'
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError(
+                'orjson decoder requires orjson, install it or use the '
+                'stdlib decoder'
+            )
+
+        self.backend = backend
+        self.projection = projection
+        self._loads: Callable[[bytes | memoryview], Any] = (
+            decode_orjson if backend == 'orjson' else decode_stdlib
+        )
+
+    def __call__(self, body: bytes | memoryview) -> Any:
+        data = self._loads(body)
+        return project_forecast(data) if self.projection else data
@@ -0,0 +1,376 @@
+import asyncio
+import logging
+import random
+import threading
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from http import HTTPStatus
+from time import monotonic, sleep
+from typing import Awaitable, Callable, NamedTuple, Optional, TypeVar
+
+T = TypeVar('T')
+
+# statuses worth asking again for, anything else is the final answer
+RETRY_STATUSES = frozenset({
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+})
+LATENCY_WINDOW = 512
+HEDGE_WORKERS = 128
+
+logger = logging.getLogger()
+
+
+class RetryPolicy(NamedTuple):
+    """
+    `attempts` counts the first request, the n-th retry waits a random
+    time up to `base_delay * 2 ** n` seconds, capped by `max_delay`
+    """
+    attempts: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 2.0
+    jitter: bool = True
+
+    def delay(self, retry: int, rnd: random.Random) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** retry)
+        return rnd.uniform(0, delay) if self.jitter else delay
+
+
+class HedgePolicy(NamedTuple):
+    """
+    A duplicate request is sent when the first one takes longer than the
+    `quantile` of recent latencies, never sooner than `min_delay`, and
+    only once `min_samples` latencies are known
+    """
+    quantile: float = 0.95
+    min_samples: int = 20
+    min_delay: float = 0.01
+
+
+class BreakerPolicy(NamedTuple):
+    """
+    A host is cut off after `failures` failures in a row, after
+    `reset_timeout` seconds a single trial request is let through
+    """
+    failures: int = 5
+    reset_timeout: float = 5.0
+
+
+class ResiliencePolicy(NamedTuple):
+    retry: Optional[RetryPolicy] = RetryPolicy()
+    hedge: Optional[HedgePolicy] = None
+    breaker: Optional[BreakerPolicy] = BreakerPolicy()
+
+
+class ResilienceStats(NamedTuple):
+    requests: int
+    retries: int
+    hedges: int
+    hedge_wins: int
+    rejected: int
+    failed: int
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LatencyTracker:
+    """Latencies of the last `window` successful requests"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, latency: float):
+        with self._lock:
+            self._samples.append(latency)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class CircuitBreaker:
+    """
+    Per host breaker: closed lets requests through, open rejects them
+    until the reset timeout passes, then one trial request decides
+    whether it closes again
+    """
+
+    def __init__(self, policy: BreakerPolicy):
+        self.policy = policy
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._trial: set[str] = set()
+        self._lock = threading.Lock()
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            return host in self._opened_at
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if host in self._trial:
+                return False
+            if monotonic() - opened_at < self.policy.reset_timeout:
+                return False
+            self._trial.add(host)
+            return True
+
+    def success(self, host: str):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._trial.discard(host)
+
+    def failure(self, host: str):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if host in self._trial or failures >= self.policy.failures:
+                if host not in self._opened_at:
+                    logger.warning(f'circuit opened for {host}')
+                self._opened_at[host] = monotonic()
+                self._trial.discard(host)
+
+
+class Resilience:
+    """
+    Runs requests with retries, hedging and a circuit breaker as set by
+    the policy. `call` takes a function sending one request, a result
+    for which `should_retry` is true counts as a failure, but is still
+    returned when there are no attempts left.
+    """
+
+    def __init__(
+            self,
+            policy: ResiliencePolicy = ResiliencePolicy(),
+            seed: Optional[int] = None
+    ):
+        self.policy = policy
+        self.latency = LatencyTracker()
+        self._breaker = (
+            CircuitBreaker(policy.breaker) if policy.breaker else None
+        )
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        if policy.hedge is not None:
+            self._hedge_pool = ThreadPoolExecutor(
+                HEDGE_WORKERS,
+                thread_name_prefix='hedge'
+            )
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def stats(self) -> ResilienceStats:
+        with self._lock:
+            return ResilienceStats(
+                self._requests,
+                self._retries,
+                self._hedges,
+                self._hedge_wins,
+                self._rejected,
+                self._failed,
+            )
+
+    def close(self):
+        if self._hedge_pool is not None:
+            # losing duplicates may still wait for their responses
+            self._hedge_pool.shutdown(wait=False)
+
+    def call(
+            self,
+            host: str,
+            request: Callable[[], T],
+            should_retry: Callable[[T], bool] = lambda _: False
+    ) -> T:
+        self._count('_requests')
+        attempts = self.policy.retry.attempts if self.policy.retry else 1
+        for attempt in range(attempts):
+            if attempt:
+                sleep(self._retry_delay(attempt))
+            self._admit(host)
+
+            last_attempt = attempt == attempts - 1
+            try:
+                result = self._attempt(request)
+            except Exception:
+                self._failure(host)
+                if last_attempt:
+                    raise
+                continue
+
+            if self._settled(host, result, should_retry, last_attempt):
+                return result
+
+        raise AssertionError('unreachable')  # pragma: no cover
+
+    async def call_async(
+            self,
+            host: str,
+            request: Callable[[], Awaitable[T]],
+            should_retry: Callable[[T], bool] = lambda _: False
+    ) -> T:
+        """`call` for coroutines, retry delays don't block the loop"""
+        self._count('_requests')
+        attempts = self.policy.retry.attempts if self.policy.retry else 1
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(self._retry_delay(attempt))
+            self._admit(host)
+
+            last_attempt = attempt == attempts - 1
+            try:
+                result = await self._attempt_async(request)
+            except Exception:
+                self._failure(host)
+                if last_attempt:
+                    raise
+                continue
+
+            if self._settled(host, result, should_retry, last_attempt):
+                return result
+
+        raise AssertionError('unreachable')  # pragma: no cover
+
+    def _retry_delay(self, attempt: int) -> float:
+        self._count('_retries')
+        with self._lock:
+            return self.policy.retry.delay(attempt - 1, self._random)
+
+    def _admit(self, host: str):
+        if self._breaker is not None and not self._breaker.allow(host):
+            self._count('_rejected')
+            raise CircuitOpenError(f'Circuit open for {host}')
+
+    def _settled(
+            self,
+            host: str,
+            result: T,
+            should_retry: Callable[[T], bool],
+            last_attempt: bool
+    ) -> bool:
+        if not should_retry(result):
+            if self._breaker is not None:
+                self._breaker.success(host)
+            return True
+
+        self._failure(host)
+        return last_attempt
+
+    def _failure(self, host: str):
+        self._count('_failed')
+        if self._breaker is not None:
+            self._breaker.failure(host)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _timed(self, request: Callable[[], T]) -> T:
+        started = monotonic()
+        result = request()
+        self.latency.add(monotonic() - started)
+        return result
+
+    def _attempt(self, request: Callable[[], T]) -> T:
+        hedge = self.policy.hedge
+        if (
+                hedge is None
+                or self._hedge_pool is None
+                or len(self.latency) < hedge.min_samples
+        ):
+            return self._timed(request)
+
+        threshold = max(
+            self.latency.quantile(hedge.quantile) or 0.0,
+            hedge.min_delay
+        )
+        primary = self._hedge_pool.submit(self._timed, request)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        self._count('_hedges')
+        duplicate = self._hedge_pool.submit(self._timed, request)
+        return self._first_success(primary, duplicate)
+
+    def _first_success(self, primary: Future, duplicate: Future):
+        pending = {primary, duplicate}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    if future is duplicate:
+                        self._count('_hedge_wins')
+                    return future.result()
+        assert error is not None
+        raise error
+
+    async def _timed_async(self, request: Callable[[], Awaitable[T]]) -> T:
+        started = monotonic()
+        result = await request()
+        self.latency.add(monotonic() - started)
+        return result
+
+    async def _attempt_async(self, request: Callable[[], Awaitable[T]]) -> T:
+        hedge = self.policy.hedge
+        if hedge is None or len(self.latency) < hedge.min_samples:
+            return await self._timed_async(request)
+
+        threshold = max(
+            self.latency.quantile(hedge.quantile) or 0.0,
+            hedge.min_delay
+        )
+        primary = asyncio.ensure_future(self._timed_async(request))
+        done, _ = await asyncio.wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        self._count('_hedges')
+        duplicate = asyncio.ensure_future(self._timed_async(request))
+        pending = {primary, duplicate}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        if future is duplicate:
+                            self._count('_hedge_wins')
+                        return future.result()
+        finally:
+            # unlike threads, the losing request can be called off
+            for future in pending:
+                future.cancel()
+        assert error is not None
+        raise error
@@ -1,96 +1,223 @@
 #!/usr/bin/env python3
+import argparse
 import logging
-from multiprocessing import JoinableQueue
+import multiprocessing
+import os
+import secrets
+import sys
+from datetime import datetime
 from pathlib import Path
-from typing import NamedTuple, Iterable, Optional
+from typing import Optional
 
 import utils
-from my_concurrent.process_pool import ProcessPool
-from my_concurrent.queue_reader import QueueTaskReader
-from my_concurrent.thread_fetcher import ThreadFetcher
-from tasks import DataAggregationTask, TotalSummary
-from tasks import DataAnalyzingTask
-from tasks import DataCalculationTask
-from tasks import DataFetchingTask
-from tasks.data_calculation_task import CitySummary
-from tasks.data_fetching_task import CityNameUrlPair, CityRawData
-
-
-class Config(NamedTuple):
-    cities_queue: JoinableQueue
-    calculation_queue: JoinableQueue
-    thread_fetcher: ThreadFetcher[CityNameUrlPair, CityRawData]
-    process_pool: ProcessPool[CityRawData, CitySummary]
-    aggregation_task: DataAggregationTask
-    analyzing_task: DataAnalyzingTask
-
-
-def configure(
-        city_urls: Iterable[CityNameUrlPair],
-        fetchers_count: int,
-        calculation_workers_count: int
-) -> Config:
-    cities_queue: JoinableQueue = JoinableQueue()
-
-    fetching_task = DataFetchingTask(city_urls)
-    thread_fetcher = ThreadFetcher[CityNameUrlPair, CityRawData](
-        fetching_task,
-        fetchers_count,
-        cities_queue
-    )
+from common_algorithms.rank import get_rank_sorted
+from external.client import YandexWeatherAPI
+from external.client import DEFAULT_POOL_SIZE, DEFAULT_IDLE_TIMEOUT
+from external.client import DEFAULT_TIMEOUT
+from external.cache import ResponseCache
+from external.decoder import DECODERS
+from external.resilience import ResiliencePolicy, RetryPolicy, HedgePolicy
+from external.resilience import BreakerPolicy
+from my_concurrent.autoscaler import AutoscaleConfig, ScalingBounds
+from my_concurrent.refresh import DEFAULT_REFRESH_INTERVAL
+from my_concurrent.refresh import DEFAULT_REFRESH_SLOTS
+from my_concurrent.sharding import Address, DEFAULT_LEASE_TIMEOUT
+from my_concurrent.sharding import is_loopback
+from pipeline import PipelineSettings, RatingOptions
+from pipeline import find_bet_city, find_bet_city_history
+from pipeline import find_bet_city_sharded, run_shard_worker, run_service
+from pipeline.core import FETCH_ENGINES, EXECUTORS
+from pipeline.core import DEFAULT_QUEUE_SIZE, DEFAULT_BATCH_LINGER
+from pipeline.sharded import DEFAULT_SHARD_SIZE
+from tasks import TotalSummary
+from tasks import configure_logging
+from tasks.analysis_memo import AnalysisMemo
+from tasks.analysis_memo import DEFAULT_MAX_ENTRIES
+from tasks.analysis_rules import CompiledRules, RuleRanking, RuleRankedCity
+from tasks.analysis_rules import load_rule_sets, write_rule_rankings
+from tasks.city_sources import CitySource, CityFilter, DEFAULT_TABLE
+from tasks.city_sources import check_table
+from tasks.data_calculation_task import ANALYZERS
+from tasks.data_fetching_task import TRANSPORTS
+from tasks.history_store import HistoryStore
+from tasks.rating_service import Endpoint
+from tasks.rating_writer import RATING_FORMATS, resolve_format
+from tasks.result_store import ResultStore
 
-    calculation_queue: JoinableQueue = JoinableQueue()
-    process_pool = ProcessPool[CityRawData, CitySummary].make_pool(
-        DataCalculationTask.calculate_summary_by_days,
-        calculation_workers_count,
-        cities_queue,
-        calculation_queue
-    )
 
-    queue_reader = QueueTaskReader[CitySummary](calculation_queue)
-    aggregation_task = DataAggregationTask(queue_reader)
+START_METHODS = ('forkserver', 'spawn', 'fork')
+# imported once by the fork server rather than by every worker it starts
+FORKSERVER_PRELOAD = ['__main__', 'tasks', 'my_concurrent.process_pool']
+AUTHKEY_ENV = 'FORECASTING_AUTHKEY'
+# options of a single ranking, by their destinations
+UNSUPPORTED_BY_SERVICE = {
+    'trace': '--trace',
+    'top': '--top',
+    'rating': '-r',
+    'history_db': '--history-db',
+}
+# shard workers rank as the coordinator tells them to, which records
+# the history of the whole run
+UNSUPPORTED_BY_SHARD_WORKER = {
+    'trace': '--trace',
+    'top': '--top',
+    'rating': '-r',
+    'history_db': '--history-db',
+}
+# the coordinator neither fetches nor analyzes forecasts
+UNSUPPORTED_BY_COORDINATOR = {
+    'trace': '--trace',
+    'results_db': '--results-db',
+}
+
+
+def configure_start_method(method: str = 'forkserver'):
+    """
+    How worker processes are started. The fork server is started right
+    away so that its preloaded imports run while cities are fetched.
+    """
+    if method not in START_METHODS:
+        raise ValueError(f'Unknown start method: {method}')
+    multiprocessing.set_start_method(method, force=True)
+    if method == 'forkserver':
+        from multiprocessing import forkserver
+
+        multiprocessing.set_forkserver_preload(FORKSERVER_PRELOAD)
+        forkserver.ensure_running()
+
+
+def check_args(
+        arg_parser: argparse.ArgumentParser,
+        args: argparse.Namespace
+):
+    """Exits on options that can't be used together or in this setup"""
+    if args.serve:
+        _reject_options(arg_parser, args, '--serve', UNSUPPORTED_BY_SERVICE)
+    if args.shard_worker:
+        _reject_options(
+            arg_parser,
+            args,
+            '--shard-worker',
+            UNSUPPORTED_BY_SHARD_WORKER
+        )
+    if args.shard_coordinator:
+        _reject_options(
+            arg_parser,
+            args,
+            '--shard-coordinator',
+            UNSUPPORTED_BY_COORDINATOR
+        )
+    if args.rules and (args.serve or args.shard_worker
+                       or args.shard_coordinator or args.results_db):
+        arg_parser.error(
+            '--rules is not supported with --serve, the shard options '
+            'and --results-db'
+        )
+    if ((args.max_tasks or args.max_rss_mb)
+            and not (args.serve or args.shard_worker)):
+        arg_parser.error(
+            '--max-tasks and --max-rss-mb only apply to workers kept '
+            'across runs by --serve and --shard-worker'
+        )
+    if args.rating:
+        try:
+            resolve_format(args.rating_format)
+        except RuntimeError as e:
+            arg_parser.error(str(e))
+
 
-    analyzing_task = DataAnalyzingTask()
+def _reject_options(
+        arg_parser: argparse.ArgumentParser,
+        args: argparse.Namespace,
+        mode: str,
+        options: dict[str, str]
+):
+    given = [
+        option for dest, option in options.items()
+        if getattr(args, dest) not in (None, False)
+    ]
+    if given:
+        arg_parser.error(f'{", ".join(given)} not supported with {mode}')
 
-    return Config(
-        cities_queue,
-        calculation_queue,
-        thread_fetcher,
-        process_pool,
-        aggregation_task,
-        analyzing_task,
+
+def pipeline_settings(args: argparse.Namespace) -> PipelineSettings:
+    """Pipeline options of the command line, shared by every mode"""
+    return PipelineSettings(
+        fetchers_count=args.fetchers,
+        calculation_workers_count=args.workers,
+        fetch_engine=args.fetch_engine,
+        response_cache=(
+            ResponseCache(
+                args.cache_dir,
+                args.cache_max_size * 1024 * 1024,
+                args.cache_ttl
+            )
+            if args.cache_dir else None
+        ),
+        streaming=args.streaming,
+        queue_size=args.queue_size,
+        transport=args.transport,
+        analyzer=args.analyzer,
+        batch_size=args.batch_size,
+        batch_linger=args.batch_linger,
+        executor=args.executor,
+        autoscale=(
+            AutoscaleConfig(
+                ScalingBounds(args.min_fetchers, args.max_fetchers),
+                ScalingBounds(args.min_workers, args.max_workers),
+            )
+            if args.autoscale else None
+        ),
+        analysis_memo=(
+            AnalysisMemo(args.memo_db, args.memo_size)
+            if args.memo_db else None
+        ),
+        max_tasks=args.max_tasks,
+        max_rss_mb=args.max_rss_mb,
     )
 
 
-def find_bet_city(
-        city_urls: Iterable[CityNameUrlPair],
-        fetchers_count: int = 16,
-        calculation_workers_count: int = 4,
-        rating_file: Optional[Path] = None,
-) -> list[TotalSummary]:
-    config = configure(city_urls, fetchers_count, calculation_workers_count)
+def rating_options(args: argparse.Namespace) -> RatingOptions:
+    return RatingOptions(
+        args.rating_file if args.rating else None,
+        args.top,
+        args.rating_format,
+    )
 
-    config.process_pool.start_all()
-    logging.info('start fetching cities data')
-    config.thread_fetcher.fetch_data()
-    config.cities_queue.join()
-    logging.info('fetched all cities data')
-    config.process_pool.stop_all()
-    logging.info('calculate all cities summary by days')
 
-    city_summaries = config.aggregation_task.aggregate_tasks()
+def parse_address(value: str) -> Address:
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
 
-    if rating_file:
-        result = config.analyzing_task.calculate_ratings(
-            city_summaries,
-            rating_file
-        )
-    else:
-        result = config.analyzing_task.find_best_city(
-            city_summaries
+
+def shard_authkey(address: Address, coordinator: bool) -> bytes:
+    """
+    Key authenticating shard manager connections, shared by the
+    coordinator and its workers through `AUTHKEY_ENV`. The manager
+    unpickles whatever clients send, so there is no default key: without
+    one a coordinator on a loopback address generates a key and prints
+    it for its workers, anything else exits.
+    """
+    authkey = os.environ.get(AUTHKEY_ENV)
+    if authkey:
+        return authkey.encode()
+    if not coordinator:
+        sys.exit(f'{AUTHKEY_ENV} of the coordinator must be set')
+    if not is_loopback(address):
+        sys.exit(
+            f'{AUTHKEY_ENV} must be set to serve shards on a non-loopback '
+            f'address'
         )
+    authkey = secrets.token_urlsafe(32)
+    print(f'Shard workers authenticate with {AUTHKEY_ENV}={authkey}')
+    return authkey.encode()
 
-    return result
+
+def parse_endpoint(value: str) -> Endpoint:
+    """`unix:PATH` for a Unix socket, `HOST:PORT` otherwise"""
+    if value.startswith('unix:'):
+        return value[len('unix:'):]
+    return parse_address(value)
 
 
 def print_cities(cities: list[TotalSummary]):
@@ -102,26 +229,426 @@ def print_cities(cities: list[TotalSummary]):
         )
 
 
+def print_top_cities(cities: list[TotalSummary]):
+    ranks = get_rank_sorted([c.rating for c in cities])
+    for rank, city in zip(ranks, cities):
+        print(f'{rank}. ', end='')
+        print_cities([city])
+
+
+def print_result(cities: list[TotalSummary], ranked: bool):
+    if ranked:
+        print('Top cities:')
+        print_top_cities(cities)
+    else:
+        print('Best city(ies):')
+        print_cities(cities)
+
+
+def query_history(
+        history_db: Path,
+        city: Optional[str],
+        last_runs: Optional[int],
+        rating: RatingOptions
+):
+    """Prints the history of `city` or ranks the last runs"""
+    history_store = HistoryStore(history_db)
+    try:
+        if city:
+            print_city_history(history_store, city, last_runs)
+            return
+        cities = find_bet_city_history(
+            history_store,
+            last_runs,
+            rating=rating,
+        )
+        print_result(
+            cities,
+            rating.top is not None and rating.rating_file is None
+        )
+    finally:
+        history_store.close()
+
+
+def print_rule_rankings(
+        rule_ranking: Optional[RuleRanking],
+        top: Optional[int],
+        rating_file: Optional[Path]
+):
+    """Best or `top` cities by each rule set, if rules were evaluated"""
+    if rule_ranking is None:
+        return
+    rankings = rule_ranking.rank(top)
+    if rating_file:
+        write_rule_rankings(rating_file, rankings)
+        logging.info(f'Rule set rankings saved in {rating_file}')
+    for name, cities in rankings.items():
+        print(f'{name}:')
+        for city in cities if top is not None else _best(cities):
+            print(
+                f'{city.rank}. {city.city}.'
+                f' Score: {city.score}.'
+                f' Average temperature: {city.temp_avg:.2f}'
+            )
+
+
+def _best(cities: list[RuleRankedCity]) -> list[RuleRankedCity]:
+    return [city for city in cities if city.rank == 1]
+
+
+def print_city_history(
+        history_store: HistoryStore,
+        city: str,
+        last_fetches: Optional[int] = None
+):
+    history = history_store.city_history(city, last_fetches)
+    if history is None:
+        print(f'No history of {city}')
+        return
+    print(
+        f'{history.city}. Fetches: {history.fetches}.'
+        f' Days: {history.days}.'
+        f' Average shinny hours: {history.shiny_hours_avg:.2f}.'
+        f' Average temperature: {history.temp_avg:.2f}'
+    )
+    for fetch in history_store.city_trend(city, last_fetches):
+        print(
+            f'  {datetime.fromtimestamp(fetch.fetched_at):%Y-%m-%d %H:%M}.'
+            f' Average shinny hours: {fetch.shiny_hours_avg:.2f}.'
+            f' Average temperature: {fetch.temp_avg:.2f}'
+        )
+
+
+def run_mode(
+        args: argparse.Namespace,
+        cities_source: CitySource,
+        settings: PipelineSettings,
+        result_store: Optional[ResultStore],
+        history_store: Optional[HistoryStore],
+        rule_ranking: Optional[RuleRanking],
+) -> Optional[list[TotalSummary]]:
+    """
+    Runs the mode the options ask for, returns the ranked cities unless
+    it is the service or a shard worker
+    """
+    if args.serve is not None:
+        run_service(
+            cities_source,
+            args.serve,
+            settings,
+            args.refresh_interval,
+            args.refresh_slots,
+            result_store,
+        )
+        return None
+    if args.shard_worker is not None:
+        shards = run_shard_worker(
+            args.shard_worker,
+            shard_authkey(args.shard_worker, coordinator=False),
+            settings,
+            result_store=result_store,
+        )
+        print(f'Completed shards: {shards}')
+        return None
+    if args.shard_coordinator is not None:
+        return find_bet_city_sharded(
+            cities_source,
+            args.shard_coordinator,
+            shard_authkey(args.shard_coordinator, coordinator=True),
+            args.shard_size,
+            rating_options(args),
+            args.lease_timeout,
+            history_store,
+        )
+    return find_bet_city(
+        cities_source,
+        settings,
+        rating_options(args),
+        trace_file=args.trace,
+        result_store=result_store,
+        history_store=history_store,
+        rule_ranking=rule_ranking,
+    )
+
+
 if __name__ == '__main__':
     def main():
-        import argparse
-
         arg_parser = argparse.ArgumentParser(
             prog='forecasting.py',
             description='Weather forecasts analyzer',
         )
+        arg_parser.add_argument(
+            '--cities',
+            type=Path,
+            default=utils.CITIES_FILE,
+            help='City catalog: a JSON mapping of names to forecast '
+                 'URLs, JSON lines, CSV or SQLite, read lazily',
+        )
+        arg_parser.add_argument(
+            '--cities-table',
+            type=check_table,
+            default=DEFAULT_TABLE,
+            help='Table of a SQLite city catalog',
+        )
+        arg_parser.add_argument(
+            '--region',
+            action='append',
+            default=[],
+            help='Only cities of the region, may be repeated',
+        )
+        arg_parser.add_argument(
+            '--tag',
+            action='append',
+            default=[],
+            help='Only cities having the tag, may be repeated',
+        )
         arg_parser.add_argument(
             '-f', '--fetchers',
             type=int,
             default=16,
             help='Number of data fetchers',
         )
+        arg_parser.add_argument(
+            '--fetch-engine',
+            choices=FETCH_ENGINES,
+            default='thread',
+            help='Fetching engine: thread pool or asyncio event loop',
+        )
+        arg_parser.add_argument(
+            '--pool-size',
+            type=int,
+            default=DEFAULT_POOL_SIZE,
+            help='Max idle keep-alive connections kept per host',
+        )
+        arg_parser.add_argument(
+            '--pool-idle-timeout',
+            type=float,
+            default=DEFAULT_IDLE_TIMEOUT,
+            help='Seconds an idle keep-alive connection may be reused',
+        )
+        arg_parser.add_argument(
+            '--timeout',
+            type=float,
+            default=DEFAULT_TIMEOUT,
+            help='Seconds to connect or to wait for response data',
+        )
+        arg_parser.add_argument(
+            '--retries',
+            type=int,
+            default=2,
+            help='Times a failed request is retried with backoff',
+        )
+        arg_parser.add_argument(
+            '--retry-delay',
+            type=float,
+            default=0.1,
+            help='Base delay of the exponential backoff in seconds',
+        )
+        arg_parser.add_argument(
+            '--hedge',
+            type=float,
+            default=None,
+            metavar='QUANTILE',
+            help='Send a duplicate request when the first one is slower '
+                 'than this latency quantile, e.g. 0.95',
+        )
+        arg_parser.add_argument(
+            '--breaker-failures',
+            type=int,
+            default=5,
+            help='Failures in a row cutting a host off, 0 disables '
+                 'the circuit breaker',
+        )
+        arg_parser.add_argument(
+            '--decoder',
+            choices=DECODERS,
+            default='auto',
+            help='JSON decoder of responses, auto picks orjson '
+                 'when it is installed',
+        )
+        arg_parser.add_argument(
+            '--projection',
+            action='store_true',
+            help='Keep only the response fields used by analyzers',
+        )
+        arg_parser.add_argument(
+            '--cache-dir',
+            type=Path,
+            default=None,
+            help='Directory to cache forecast responses in',
+        )
+        arg_parser.add_argument(
+            '--cache-max-size',
+            type=int,
+            default=256,
+            help='Max size of cached responses in MB',
+        )
+        arg_parser.add_argument(
+            '--cache-ttl',
+            type=float,
+            default=300,
+            help='Seconds a cached response is used without revalidation',
+        )
+        arg_parser.add_argument(
+            '--transport',
+            choices=TRANSPORTS,
+            default='pickle',
+            help='How raw forecasts are passed to analyzing workers',
+        )
         arg_parser.add_argument(
             '-w', '--workers',
             type=int,
             default=4,
             help='Number of analyzing workers',
         )
+        arg_parser.add_argument(
+            '-s', '--streaming',
+            action='store_true',
+            help='Run fetching, calculation and aggregation concurrently',
+        )
+        arg_parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=DEFAULT_QUEUE_SIZE,
+            help='Max items in each stage queue in streaming mode',
+        )
+        arg_parser.add_argument(
+            '--analyzer',
+            choices=tuple(ANALYZERS),
+            default='default',
+            help='Forecast analyzing engine, columnar one requires numpy',
+        )
+        arg_parser.add_argument(
+            '--executor',
+            choices=EXECUTORS,
+            default='process',
+            help='Where forecasts are analyzed: worker processes, '
+                 'a process pool executor or the main process',
+        )
+        arg_parser.add_argument(
+            '--autoscale',
+            action='store_true',
+            help='Resize fetchers and workers during the run, '
+                 'starting from -f and -w',
+        )
+        arg_parser.add_argument(
+            '--min-fetchers',
+            type=int,
+            default=1,
+            help='Min number of data fetchers when autoscaling',
+        )
+        arg_parser.add_argument(
+            '--max-fetchers',
+            type=int,
+            default=64,
+            help='Max number of data fetchers when autoscaling',
+        )
+        arg_parser.add_argument(
+            '--min-workers',
+            type=int,
+            default=1,
+            help='Min number of analyzing workers when autoscaling',
+        )
+        arg_parser.add_argument(
+            '--max-workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Max number of analyzing workers when autoscaling',
+        )
+        arg_parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1,
+            help='Max cities an analyzing worker takes at once',
+        )
+        arg_parser.add_argument(
+            '--batch-linger',
+            type=float,
+            default=DEFAULT_BATCH_LINGER,
+            help='Max seconds a worker waits to fill a batch',
+        )
+        arg_parser.add_argument(
+            '--max-tasks',
+            type=int,
+            default=None,
+            help='Cities after which a worker kept across runs is '
+                 'replaced, in service and shard worker modes',
+        )
+        arg_parser.add_argument(
+            '--max-rss-mb',
+            type=float,
+            default=None,
+            help='Resident memory in MB at which a worker kept across '
+                 'runs is replaced, in service and shard worker modes',
+        )
+        arg_parser.add_argument(
+            '--results-db',
+            type=Path,
+            default=None,
+            help='SQLite file keeping city results between runs, '
+                 'only changed forecasts are analyzed again',
+        )
+        arg_parser.add_argument(
+            '--memo-db',
+            type=Path,
+            default=None,
+            help='SQLite file memoizing analyzer results by a digest of '
+                 'forecasts, shared by workers and kept between runs',
+        )
+        arg_parser.add_argument(
+            '--memo-size',
+            type=int,
+            default=DEFAULT_MAX_ENTRIES,
+            help='Max forecasts memoized, least recently used ones are '
+                 'evicted',
+        )
+        arg_parser.add_argument(
+            '--history-db',
+            type=Path,
+            default=None,
+            help='SQLite file every run adds its city day summaries to',
+        )
+        arg_parser.add_argument(
+            '--history-runs',
+            type=int,
+            default=None,
+            metavar='N',
+            help='Rank cities over the last N runs of the history '
+                 'instead of fetching forecasts',
+        )
+        arg_parser.add_argument(
+            '--history-city',
+            default=None,
+            metavar='CITY',
+            help='Print averages of a city over the last --history-runs '
+                 'runs of the history, all by default, and exit',
+        )
+        arg_parser.add_argument(
+            '--rules',
+            type=Path,
+            default=None,
+            help='JSON file mapping names of rule sets to their hours, '
+                 'condition weights and temperature band, cities are '
+                 'ranked by each of them as well',
+        )
+        arg_parser.add_argument(
+            '--rules-rating',
+            type=Path,
+            default=None,
+            help='CSV file to store the rankings of the rule sets in',
+        )
+        arg_parser.add_argument(
+            '--trace',
+            type=Path,
+            default=None,
+            help='File to save a Chrome trace of the run stages to',
+        )
+        arg_parser.add_argument(
+            '--top',
+            type=int,
+            default=None,
+            help='Only rank the N best cities and the ones tied with them',
+        )
         arg_parser.add_argument(
             '-r', '--rating',
             action='store_true',
@@ -134,15 +661,133 @@ if __name__ == '__main__':
             default='rating.csv',
             help='File to store cities rating'
         )
+        arg_parser.add_argument(
+            '--rating-format',
+            choices=RATING_FORMATS,
+            default='csv',
+            help='Rating file format, columnar is parquet when pyarrow '
+                 'is installed and npz otherwise',
+        )
+        arg_parser.add_argument(
+            '--shard-coordinator',
+            type=parse_address,
+            default=None,
+            metavar='HOST:PORT',
+            help='Split cities into shards served to shard workers on '
+                 'this address and rank their results, authenticated '
+                 f'by {AUTHKEY_ENV}, which is generated on loopback '
+                 'addresses if unset',
+        )
+        arg_parser.add_argument(
+            '--shard-worker',
+            type=parse_address,
+            default=None,
+            metavar='HOST:PORT',
+            help='Run shards of the coordinator on this address, '
+                 f'{AUTHKEY_ENV} must be set to its key',
+        )
+        arg_parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=DEFAULT_SHARD_SIZE,
+            help='Cities per shard',
+        )
+        arg_parser.add_argument(
+            '--lease-timeout',
+            type=float,
+            default=DEFAULT_LEASE_TIMEOUT,
+            help='Seconds without a heartbeat after which a shard of '
+                 'a worker is given to another one',
+        )
+        arg_parser.add_argument(
+            '--serve',
+            type=parse_endpoint,
+            default=None,
+            metavar='HOST:PORT|unix:PATH',
+            help='Keep running, refreshing forecasts, and serve the best '
+                 'city and rating queries over HTTP on this endpoint',
+        )
+        arg_parser.add_argument(
+            '--refresh-interval',
+            type=float,
+            default=DEFAULT_REFRESH_INTERVAL,
+            help='Seconds between refreshes of a city in service mode',
+        )
+        arg_parser.add_argument(
+            '--refresh-slots',
+            type=int,
+            default=DEFAULT_REFRESH_SLOTS,
+            help='Batches the cities are refreshed in, spread evenly '
+                 'over the refresh interval',
+        )
+        arg_parser.add_argument(
+            '--start-method',
+            choices=START_METHODS,
+            default='forkserver',
+            help='How worker processes are started',
+        )
         args = arg_parser.parse_args()
-
+        check_args(arg_parser, args)
+        cities_source = CitySource(
+            args.cities,
+            CityFilter(frozenset(args.region), frozenset(args.tag)),
+            table=args.cities_table,
+        )
         logging.basicConfig(level='INFO', filename='log.txt', filemode='w')
-        print('Best city(ies):')
-        print_cities(find_bet_city(
-            utils.CITIES.items(),
-            args.fetchers,
-            args.workers,
-            args.rating_file if args.rating else None
+        configure_logging()
+        configure_start_method(args.start_method)
+        YandexWeatherAPI.configure_pool(
+            args.pool_size,
+            args.pool_idle_timeout,
+            args.timeout
+        )
+        YandexWeatherAPI.configure_resilience(ResiliencePolicy(
+            retry=RetryPolicy(args.retries + 1, args.retry_delay),
+            hedge=(
+                HedgePolicy(args.hedge) if args.hedge is not None else None
+            ),
+            breaker=(
+                BreakerPolicy(args.breaker_failures)
+                if args.breaker_failures > 0 else None
+            ),
         ))
+        YandexWeatherAPI.configure_decoder(args.decoder, args.projection)
+        if args.history_city or args.history_runs is not None:
+            if args.history_db is None:
+                arg_parser.error('--history-db is required to query history')
+            query_history(
+                args.history_db,
+                args.history_city,
+                args.history_runs,
+                rating_options(args),
+            )
+            return
+        settings = pipeline_settings(args)
+        result_store = (
+            ResultStore(args.results_db) if args.results_db else None
+        )
+        # compiled once, workers get the lookup tables
+        rule_ranking = (
+            RuleRanking(CompiledRules(load_rule_sets(args.rules)))
+            if args.rules else None
+        )
+        history_store = (
+            HistoryStore(args.history_db) if args.history_db else None
+        )
+        try:
+            cities = run_mode(
+                args,
+                cities_source,
+                settings,
+                result_store,
+                history_store,
+                rule_ranking,
+            )
+        finally:
+            for store in filter(None, (result_store, history_store)):
+                store.close()
+        if cities is not None:
+            print_result(cities, args.top is not None and not args.rating)
+            print_rule_rankings(rule_ranking, args.top, args.rules_rating)
 
     main()
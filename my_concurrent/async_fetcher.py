@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from time import monotonic
+from typing import TypeVar, Generic, Iterable, Protocol
+
+from common_types.task_types import TaskState, TaskSink
+from my_concurrent import tracing
+
+
+TSource = TypeVar('TSource')
+TData = TypeVar('TData', covariant=True)
+
+
+class AsyncDataFetcher(Protocol[TSource, TData]):
+    def get_sources(self) -> Iterable[TSource]:
+        ...
+
+    async def fetch_source_async(self, source: TSource) -> TData:
+        ...
+
+
+class AsyncFetcher(Generic[TSource, TData]):
+    def __init__(
+            self,
+            data_fetcher: AsyncDataFetcher[TSource, TData],
+            fetchers_count: int,
+            output_queue: TaskSink
+    ):
+        self.data_fetcher = data_fetcher
+        self._fetchers_count = fetchers_count
+        self._out_q = output_queue
+        self._emitted = 0
+        self._cancelled = threading.Event()
+
+    @property
+    def emitted(self) -> int:
+        return self._emitted
+
+    def cancel(self):
+        """No more sources are fetched, ones in flight are still emitted"""
+        self._cancelled.set()
+
+    def fetch_data(self) -> int:
+        asyncio.run(self._fetch_all())
+        return self._emitted
+
+    async def _fetch_all(self):
+        semaphore = asyncio.Semaphore(self._fetchers_count)
+        pending: set[asyncio.Task] = set()
+
+        for data_source in self.data_fetcher.get_sources():
+            # acquire before creating the task so that sources are pulled
+            # lazily and at most `fetchers_count` requests are in flight
+            await semaphore.acquire()
+            if self._cancelled.is_set():
+                break
+            task = asyncio.create_task(self._handle_one_source(data_source))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+        if pending:
+            await asyncio.wait(pending)
+
+    async def _handle_one_source(self, data_source: TSource):
+        started = monotonic()
+        try:
+            result = await self.data_fetcher.fetch_source_async(data_source)
+        except Exception as e:
+            task = TaskState[TData].error(str(e))
+        else:
+            task = TaskState[TData].ok(result)
+
+        tracing.record('fetch', data_source, started, monotonic())
+        self._out_q.put(task)
+
+        self._emitted += 1
@@ -0,0 +1,185 @@
+import logging
+import threading
+from multiprocessing import JoinableQueue
+from typing import NamedTuple, Optional, Protocol
+
+logger = logging.getLogger('forecasting')
+
+DEFAULT_INTERVAL = 0.5
+LOW_UTILIZATION = 0.25
+# queued cities per worker considered a backlog
+BACKLOG_PER_WORKER = 2
+# fetch latency growth over the best seen one treated as upstream overload
+LATENCY_DEGRADATION = 2.0
+# consecutive idle steps before a worker is stopped
+IDLE_STEPS = 4
+UTILIZATION_SMOOTHING = 0.5
+
+
+class Scalable(Protocol):
+    @property
+    def size(self) -> int:
+        ...
+
+    def resize(self, size: int):
+        ...
+
+
+class Fetcher(Scalable, Protocol):
+    @property
+    def in_flight(self) -> int:
+        ...
+
+    @property
+    def latency(self) -> Optional[float]:
+        ...
+
+
+class Workers(Scalable, Protocol):
+    @property
+    def utilization(self) -> Optional[float]:
+        ...
+
+
+class ScalingBounds(NamedTuple):
+    min_size: int
+    max_size: int
+
+    def clamp(self, size: int) -> int:
+        return min(max(size, self.min_size), self.max_size)
+
+
+class AutoscaleConfig(NamedTuple):
+    fetchers: ScalingBounds
+    workers: ScalingBounds
+    interval: float = DEFAULT_INTERVAL
+
+
+class ScalingDecision(NamedTuple):
+    target: str
+    old_size: int
+    new_size: int
+    reason: str
+
+
+class Autoscaler:
+    """
+    Resizes fetchers and calculation workers during a run. Workers grow
+    while the cities backlog doesn't drain and shrink when idle. Fetchers
+    grow while workers starve and every fetcher is busy, and shrink when
+    fetch latency degrades or workers can't keep up even at max size.
+
+    `calculation_queue` is only watched if something drains it during
+    the run, results piling up there mean adding workers won't help.
+    """
+
+    def __init__(
+            self,
+            fetcher: Fetcher,
+            workers: Workers,
+            cities_queue: JoinableQueue,
+            calculation_queue: Optional[JoinableQueue],
+            config: AutoscaleConfig
+    ):
+        self._fetcher = fetcher
+        self._workers = workers
+        self._cities_q = cities_queue
+        self._calculation_q = calculation_queue
+        self._config = config
+        self._best_latency: Optional[float] = None
+        self._utilization = 0.0
+        self._backlog = 0
+        self._idle_steps = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.decisions: list[ScalingDecision] = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self._config.interval):
+            self.step()
+
+    def step(self):
+        backlog = self._depth(self._cities_q)
+        pending = self._depth(self._calculation_q)
+        self._utilization += UTILIZATION_SMOOTHING * (
+            (self._workers.utilization or 0.0) - self._utilization
+        )
+        utilization = self._utilization
+        latency = self._fetcher.latency
+        if latency is not None:
+            self._best_latency = min(self._best_latency or latency, latency)
+        metrics = (
+            f'backlog={backlog}, pending={pending},'
+            f' utilization={utilization:.2f},'
+            f' latency={latency or 0:.3f}s'
+        )
+
+        workers = self._workers.size
+        draining = backlog < self._backlog
+        self._backlog = backlog
+        idle = backlog == 0 and utilization <= LOW_UTILIZATION
+        self._idle_steps = self._idle_steps + 1 if idle else 0
+        if (backlog > BACKLOG_PER_WORKER * workers and not draining
+                and pending <= BACKLOG_PER_WORKER * workers):
+            self._resize('workers', workers + 1, f'backlog; {metrics}')
+        elif self._idle_steps >= IDLE_STEPS:
+            self._idle_steps = 0
+            self._resize('workers', workers - 1, f'idle; {metrics}')
+
+        fetchers = self._fetcher.size
+        if (latency is not None and self._best_latency
+                and latency > LATENCY_DEGRADATION * self._best_latency):
+            self._resize(
+                'fetchers',
+                fetchers - max(fetchers // 4, 1),
+                f'latency degraded; {metrics}'
+            )
+            # let the new limit settle before judging latency again
+            self._best_latency = latency
+        elif (backlog > 2 * BACKLOG_PER_WORKER * workers
+              and workers >= self._config.workers.max_size):
+            self._resize('fetchers', fetchers - 1, f'workers lag; {metrics}')
+        elif backlog < workers and self._fetcher.in_flight >= fetchers:
+            self._resize(
+                'fetchers',
+                fetchers + max(fetchers // 2, 1),
+                f'workers starve; {metrics}'
+            )
+
+    def _resize(self, target: str, size: int, reason: str):
+        if target == 'workers':
+            scalable: Scalable = self._workers
+            bounds = self._config.workers
+        else:
+            scalable = self._fetcher
+            bounds = self._config.fetchers
+
+        old_size = scalable.size
+        new_size = bounds.clamp(size)
+        if new_size == old_size:
+            return
+
+        scalable.resize(new_size)
+        self.decisions.append(
+            ScalingDecision(target, old_size, new_size, reason)
+        )
+        logger.info(f'autoscale {target} {old_size} -> {new_size}: {reason}')
+
+    @staticmethod
+    def _depth(queue: Optional[JoinableQueue]) -> int:
+        if queue is None:
+            return 0
+        try:
+            return queue.qsize()
+        except NotImplementedError:
+            # not available on macOS
+            return 0
@@ -0,0 +1,122 @@
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from multiprocessing import JoinableQueue
+from time import monotonic
+from typing import Callable, TypeVar, Generic, Any
+
+from common_types.task_types import TaskState, Status
+from my_concurrent import tracing
+
+
+TData = TypeVar('TData')
+TResult = TypeVar('TResult')
+
+
+class DispatchingPool(ABC, Generic[TData, TResult]):
+    """
+    Worker pool fed by a dispatcher thread reading the input queue,
+    speaks the same queue protocol as `ProcessPool`
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[TData], TResult],
+            input_queue: JoinableQueue,
+            output_queue: JoinableQueue
+    ):
+        self._handler = handler
+        self._in_q = input_queue
+        self._out_q = output_queue
+        self._dispatcher = threading.Thread(target=self._dispatch)
+        self._STOP_SENTINEL = 'STOP_SENTINEL'
+
+    def start_all(self):
+        self._dispatcher.start()
+
+    def stop_all(self):
+        self._in_q.put(self._STOP_SENTINEL)
+        if self._dispatcher.is_alive():
+            self._dispatcher.join()
+
+    def _dispatch(self):
+        while True:
+            task = self._in_q.get()
+            if task == self._STOP_SENTINEL:
+                self._shutdown()
+                self._in_q.task_done()
+                break
+
+            if isinstance(task, TaskState) and task.status == Status.ERROR:
+                self._complete(task)
+            else:
+                self._submit(
+                    task.data if isinstance(task, TaskState) else task
+                )
+
+    @abstractmethod
+    def _submit(self, data: TData):
+        """Runs the handler, `_complete` must be called with the result"""
+
+    def _shutdown(self):
+        pass
+
+    def _complete(self, result: TaskState[TResult]):
+        try:
+            self._out_q.put(result)
+        finally:
+            self._in_q.task_done()
+
+
+class InlinePool(DispatchingPool[TData, TResult]):
+    """Runs the handler in the calling process, handy for debugging"""
+
+    def _submit(self, data: TData):
+        try:
+            with tracing.span('calculate', data):
+                result = self._handler(data)
+        except Exception as e:
+            self._complete(TaskState[TResult].error(str(e)))
+        else:
+            self._complete(TaskState[TResult].ok(result))
+
+
+class FuturesPool(DispatchingPool[TData, TResult]):
+    def __init__(
+            self,
+            handler: Callable[[TData], TResult],
+            size: int,
+            input_queue: JoinableQueue,
+            output_queue: JoinableQueue
+    ):
+        super().__init__(handler, input_queue, output_queue)
+        self._size = size
+        # keeps the input queue as the only buffer so that it still
+        # applies backpressure to the fetchers
+        self._in_flight = threading.Semaphore(2 * size)
+        self._executor: Any = None
+
+    def start_all(self):
+        self._executor = ProcessPoolExecutor(self._size)
+        super().start_all()
+
+    def _submit(self, data: TData):
+        self._in_flight.acquire()
+        future = self._executor.submit(self._handler, data)
+        future.add_done_callback(partial(self._on_done, data, monotonic()))
+
+    def _on_done(self, data: TData, submitted: float, future: Future):
+        # measured from the parent, includes the executor's own queueing
+        tracing.record('calculate', data, submitted, monotonic())
+        try:
+            exception = future.exception()
+            if exception is not None:
+                self._complete(TaskState[TResult].error(str(exception)))
+            else:
+                self._complete(TaskState[TResult].ok(future.result()))
+        finally:
+            self._in_flight.release()
+
+    def _shutdown(self):
+        self._executor.shutdown(wait=True)
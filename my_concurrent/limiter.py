@@ -0,0 +1,33 @@
+import threading
+
+
+class AdjustableLimiter:
+    """Semaphore whose limit can be changed while it is held"""
+
+    def __init__(self, limit: int):
+        self._cond = threading.Condition()
+        self._limit = limit
+        self._active = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self._limit = limit
+            self._cond.notify_all()
+
+    def acquire(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
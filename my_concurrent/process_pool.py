@@ -1,19 +1,45 @@
-from multiprocessing import JoinableQueue
-from typing import Callable, TypeVar, Generic
+import logging
+import threading
+from multiprocessing import JoinableQueue, Value
+from multiprocessing.sharedctypes import Synchronized
+from typing import Callable, TypeVar, Generic, Optional, Protocol
 
 from my_concurrent.queue_controlled_process import QueueControlledProcess
+from my_concurrent.queue_controlled_process import BatchHandler
 
 
 TData = TypeVar('TData')
 TResult = TypeVar('TResult')
 
+MONITOR_INTERVAL = 0.1
+
+
+logger = logging.getLogger('forecasting')
+
+
+class WorkerPool(Protocol):
+    def start_all(self):
+        ...
+
+    def stop_all(self):
+        """Stops the workers after the tasks queued and waits for them"""
+        ...
+
 
 class ProcessPool(Generic[TData, TResult]):
     def __init__(
             self,
-            processes: list[QueueControlledProcess[TData, TResult]]
+            processes: list[QueueControlledProcess[TData, TResult]],
+            factory: Optional[
+                Callable[[], QueueControlledProcess[TData, TResult]]
+            ] = None,
+            busy: Optional[Synchronized] = None
     ):
         self._processes = processes
+        self._factory = factory
+        self._busy = busy
+        self._size = len(processes)
+        self._lock = threading.Lock()
 
     @classmethod
     def make_pool(
@@ -21,21 +47,166 @@ class ProcessPool(Generic[TData, TResult]):
             handler: Callable[[TData], TResult],
             size: int,
             input_queue: JoinableQueue,
-            output_queue: JoinableQueue
+            output_queue: JoinableQueue,
+            batch_size: int = 1,
+            max_linger: float = 0.0,
+            batch_handler: Optional[BatchHandler] = None,
     ) -> 'ProcessPool':
-        return cls([
-            QueueControlledProcess[TData, TResult](
+        busy = Value('i', 0)
+
+        def factory() -> QueueControlledProcess[TData, TResult]:
+            return QueueControlledProcess[TData, TResult](
                 handler,
                 input_queue,
-                output_queue
+                output_queue,
+                batch_size,
+                max_linger,
+                batch_handler,
+                busy=busy,
             )
-            for _ in range(size)
-        ])
+
+        return cls([factory() for _ in range(size)], factory, busy)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def utilization(self) -> Optional[float]:
+        """Share of workers handling tasks right now"""
+        if self._busy is None or self._size == 0:
+            return None
+        return min(self._busy.value / self._size, 1.0)
 
     def start_all(self):
         for proc in self._processes:
             proc.start()
 
     def stop_all(self):
-        for proc in self._processes:
-            proc.stop_queue()
+        with self._lock:
+            for _ in range(self._size):
+                self._processes[0].stop_queue()
+            self._size = 0
+            processes = list(self._processes)
+        # exiting before its workers are started would leave the fork
+        # server starting them with the queues already gone
+        for proc in processes:
+            if proc.pid is not None:
+                proc.join()
+
+    def resize(self, size: int):
+        """
+        Grow by starting new workers or shrink by sending stop sentinels,
+        the first idle workers to take them exit
+        """
+        if self._factory is None:
+            raise RuntimeError('Pool without a process factory is fixed')
+
+        with self._lock:
+            for _ in range(self._size, size):
+                proc = self._factory()
+                proc.start()
+                self._processes.append(proc)
+            for _ in range(size, self._size):
+                self._processes[0].stop_queue()
+            self._size = max(size, 0)
+
+
+class PersistentProcessPool(ProcessPool[TData, TResult]):
+    """
+    Process pool owning its queues that survives across pipeline runs.
+    Workers are recycled after `max_tasks` tasks or once their resident
+    memory reaches `max_rss_mb`, and replaced in the background. It serves
+    one run at a time.
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[TData], TResult],
+            size: int,
+            batch_size: int = 1,
+            max_linger: float = 0.0,
+            batch_handler: Optional[BatchHandler] = None,
+            max_tasks: Optional[int] = None,
+            max_rss_mb: Optional[float] = None,
+            queue_size: int = 0,
+    ):
+        self.input_queue: JoinableQueue = JoinableQueue(queue_size)
+        self.output_queue: JoinableQueue = JoinableQueue(queue_size)
+        busy = Value('i', 0)
+
+        def factory() -> QueueControlledProcess[TData, TResult]:
+            return QueueControlledProcess[TData, TResult](
+                handler,
+                self.input_queue,
+                self.output_queue,
+                batch_size,
+                max_linger,
+                batch_handler,
+                max_tasks,
+                max_rss_mb,
+                busy,
+            )
+
+        super().__init__([], factory, busy)
+        self._target_size = size
+        self._retiring: list[QueueControlledProcess[TData, TResult]] = []
+        self._recycled = 0
+        self._monitor: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    @property
+    def recycled(self) -> int:
+        return self._recycled
+
+    def start_all(self):
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(
+                target=self._watch_workers,
+                daemon=True
+            )
+        self.resize(self._target_size)
+        self._monitor.start()
+
+    def stop_all(self):
+        """Workers stay warm for the next run, see `shutdown`"""
+
+    def shutdown(self):
+        self._closed.set()
+        if self._monitor is not None:
+            self._monitor.join()
+        with self._lock:
+            retiring = list(self._retiring)
+        super().stop_all()
+        for proc in retiring:
+            proc.join()
+
+    def resize(self, size: int):
+        self._target_size = size
+        super().resize(size)
+
+    def _watch_workers(self):
+        while not self._closed.wait(MONITOR_INTERVAL):
+            with self._lock:
+                # retired workers are replaced right away, they may not
+                # exit before their results are read
+                self._retiring += [p for p in self._processes if p.retired]
+                self._retiring = [
+                    p for p in self._retiring
+                    if p.exitcode is None
+                ]
+                self._processes = [
+                    p for p in self._processes
+                    if not p.retired
+                ]
+                missing = self._size - len(self._processes)
+                for _ in range(max(missing, 0)):
+                    proc = self._factory()
+                    proc.start()
+                    self._processes.append(proc)
+
+            if missing > 0:
+                self._recycled += missing
+                logger.info(f'replaced {missing} retired workers')
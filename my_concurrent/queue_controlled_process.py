@@ -1,53 +1,183 @@
-from multiprocessing import Process, JoinableQueue
-from typing import Callable, TypeVar, Generic
+import os
+import queue
+from multiprocessing import Process, JoinableQueue, Event
+from multiprocessing.sharedctypes import Synchronized
+from time import monotonic
+from typing import Callable, TypeVar, Generic, Optional, Sequence, Any
 
-from common_types.task_types import TaskState, Status
+from common_types.task_types import TaskState, TaskBatch, Status
+from my_concurrent import tracing
 
 
 TData = TypeVar('TData')
 TResult = TypeVar('TResult')
 
+# may return an Exception in place of a result to fail a single item,
+# if it raises the whole batch is retried item by item with the handler,
+# so once it consumed an item that can't be read twice it has to fail
+# single items instead
+BatchHandler = Callable[[list[TData]], Sequence[TResult | Exception]]
+
+
+def current_rss_mb() -> Optional[float]:
+    """
+    Resident memory of this process right now, unlike the peak one of
+    `getrusage` it drops once memory is given back. None without /proc.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            resident_pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
 
 class QueueControlledProcess(Generic[TData, TResult], Process):
     def __init__(
             self,
             handler: Callable[[TData], TResult],
             input_queue: JoinableQueue,
-            output_queue: JoinableQueue
+            output_queue: JoinableQueue,
+            batch_size: int = 1,
+            max_linger: float = 0.0,
+            batch_handler: Optional[BatchHandler] = None,
+            max_tasks: Optional[int] = None,
+            max_rss_mb: Optional[float] = None,
+            busy: Optional[Synchronized] = None,
     ):
         super().__init__()
         self._handler = handler
         self._in_q = input_queue
         self._out_q = output_queue
+        self._batch_size = max(batch_size, 1)
+        self._max_linger = max_linger
+        self._batch_handler = batch_handler
+        self._max_tasks = max_tasks
+        self._max_rss_mb = max_rss_mb
+        # number of busy workers shared by the whole pool
+        self._busy = busy
+        self._retired = Event()
+        # spans recorded in the worker travel back with its results
+        self._trace = tracing.is_enabled()
         self._STOP_SENTINEL = 'STOP_SENTINEL'
 
+    @property
+    def retired(self) -> bool:
+        """
+        Set once the process takes no more tasks, it may still be flushing
+        its results to the output queue
+        """
+        return self._retired.is_set() or self.exitcode is not None
+
     def run(self):
+        if self._trace:
+            tracing.enable()
+        handled = 0
         while True:
-            task = self._in_q.get()
+            tasks, stop = self._read_batch()
+            if tasks:
+                self._set_busy(1)
+                try:
+                    self._handle_batch(tasks)
+                finally:
+                    self._set_busy(-1)
+                handled += len(tasks)
+            if stop or self._should_recycle(handled):
+                break
+        self._retired.set()
 
+    def _set_busy(self, delta: int):
+        if self._busy is not None:
+            with self._busy.get_lock():
+                self._busy.value += delta
+
+    def _should_recycle(self, handled: int) -> bool:
+        if self._max_tasks is not None and handled >= self._max_tasks:
+            return True
+
+        if self._max_rss_mb is not None:
+            rss_mb = current_rss_mb()
+            return rss_mb is not None and rss_mb >= self._max_rss_mb
+
+        return False
+
+    def _read_batch(self) -> tuple[list[Any], bool]:
+        tasks: list[Any] = []
+        task = self._in_q.get()
+        deadline = monotonic() + self._max_linger
+        while True:
             if task == self._STOP_SENTINEL:
                 self._in_q.task_done()
-                break
+                return tasks, True
+
+            tasks.append(task)
+            if len(tasks) >= self._batch_size:
+                return tasks, False
+
+            try:
+                timeout = deadline - monotonic()
+                if timeout > 0:
+                    task = self._in_q.get(timeout=timeout)
+                else:
+                    task = self._in_q.get_nowait()
+            except queue.Empty:
+                return tasks, False
+
+    def _handle_batch(self, tasks: list[Any]):
+        processed = iter(self._process([
+            task.data if isinstance(task, TaskState) else task
+            for task in tasks
+            if not self._is_error(task)
+        ]))
+        results = [
+            task if self._is_error(task) else next(processed)
+            for task in tasks
+        ]
+
+        spans = tuple(tracing.drain())
+        try:
+            if len(results) == 1 and not spans:
+                self._out_q.put(results[0])
+            else:
+                self._out_q.put(TaskBatch[TResult](results, spans))
+        finally:
+            for _ in tasks:
+                self._in_q.task_done()
 
-            if isinstance(task, TaskState):
-                if task.status == Status.ERROR:
-                    self._out_q.put(task)
-                    self._in_q.task_done()
-                    continue
+    @staticmethod
+    def _is_error(task: Any) -> bool:
+        return isinstance(task, TaskState) and task.status == Status.ERROR
 
-                self._handle_task(task.data)
+    def _process(self, items: list[TData]) -> list[TaskState[TResult]]:
+        if self._batch_handler is not None and len(items) > 1:
+            started = monotonic()
+            try:
+                results = [
+                    TaskState[TResult].error(str(r))
+                    if isinstance(r, Exception)
+                    else TaskState[TResult].ok(r)
+                    for r in self._batch_handler(items)
+                ]
+            except Exception:
+                pass
             else:
-                self._handle_task(task)
+                finished = monotonic()
+                for item in items:
+                    tracing.record('calculate', item, started, finished)
+                return results
+
+        return [self._handle_task(item) for item in items]
 
-    def _handle_task(self, data: TData):
+    def _handle_task(self, data: TData) -> TaskState[TResult]:
+        started = monotonic()
         try:
             result = self._handler(data)
         except Exception as e:
-            self._out_q.put(TaskState[TResult].error(str(e)))
+            return TaskState[TResult].error(str(e))
         else:
-            self._out_q.put(TaskState[TResult].ok(result))
+            return TaskState[TResult].ok(result)
         finally:
-            self._in_q.task_done()
+            tracing.record('calculate', data, started, monotonic())
 
     def stop_queue(self):
         self._in_q.put(self._STOP_SENTINEL)
@@ -1,27 +1,41 @@
-import random
 from multiprocessing import JoinableQueue
-from typing import Iterable, TypeVar, Generic
+from typing import Iterable, TypeVar, Generic, NamedTuple
 
-from common_types.task_types import TaskState
+from common_types.task_types import TaskState, TaskBatch
+from my_concurrent import tracing
 
 
 TData = TypeVar('TData')
 
 
-class QueueTaskReader(Generic[TData]):
+class StreamEnd(NamedTuple):
+    total: int
+
+
+class StreamingQueueReader(Generic[TData]):
+    """
+    Reads tasks while they are still being produced. The producer side
+    puts `StreamEnd(total)` once it knows how many tasks it has emitted,
+    the marker may overtake results still in flight from workers.
+    """
+
     def __init__(self, input_queue: JoinableQueue):
         self._in_q = input_queue
-        self._STOP_SENTINEL = b'STOP_SENTINEL' + random.randbytes(8)
 
     def read_tasks(self) -> Iterable[TaskState[TData]]:
-        self._push_queue()
-        while True:
+        expected = None
+        received = 0
+        while expected is None or received < expected:
             task = self._in_q.get()
             self._in_q.task_done()
-            if task == self._STOP_SENTINEL:
-                break
-
-            yield task
-
-    def _push_queue(self):
-        self._in_q.put(self._STOP_SENTINEL)
+            if isinstance(task, StreamEnd):
+                expected = task.total
+                continue
+
+            if isinstance(task, TaskBatch):
+                tracing.merge(task.spans)
+                received += len(task.tasks)
+                yield from task.tasks
+            else:
+                received += 1
+                yield task
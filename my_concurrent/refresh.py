@@ -0,0 +1,85 @@
+import logging
+import threading
+from time import monotonic
+from typing import Callable, Generic, NamedTuple, Optional, Sequence, TypeVar
+
+logger = logging.getLogger('forecasting')
+
+DEFAULT_REFRESH_INTERVAL = 600.0
+DEFAULT_REFRESH_SLOTS = 60
+
+TItem = TypeVar('TItem')
+
+
+class RefreshStats(NamedTuple):
+    refreshes: int
+    failures: int
+    last_duration: Optional[float]
+
+
+class StaggeredRefresher(Generic[TItem]):
+    """
+    Refreshes every item once per `interval` in a background thread.
+    After a first pass over all of them, items are split into `slots`
+    batches refreshed one at a time at evenly spaced moments, so that
+    upstream sees a steady trickle rather than a burst per interval.
+    A slow refresh delays the next ones instead of making them pile up.
+    """
+
+    def __init__(
+            self,
+            items: Sequence[TItem],
+            refresh: Callable[[list[TItem]], None],
+            interval: float = DEFAULT_REFRESH_INTERVAL,
+            slots: int = DEFAULT_REFRESH_SLOTS
+    ):
+        slots = max(min(slots, len(items)), 1)
+        self._items = items
+        self._batches = [list(items[slot::slots]) for slot in range(slots)]
+        self._refresh = refresh
+        self._period = interval / slots
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._refreshes = 0
+        self._failures = 0
+        self._last_duration: Optional[float] = None
+
+    @property
+    def slots(self) -> int:
+        return len(self._batches)
+
+    def stats(self) -> RefreshStats:
+        return RefreshStats(
+            self._refreshes,
+            self._failures,
+            self._last_duration
+        )
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        self._run_refresh(list(self._items))
+        next_at = monotonic() + self._period
+        slot = 0
+        while not self._stopped.wait(max(next_at - monotonic(), 0)):
+            self._run_refresh(self._batches[slot])
+            slot = (slot + 1) % len(self._batches)
+            next_at = max(next_at + self._period, monotonic())
+
+    def _run_refresh(self, batch: list[TItem]):
+        started = monotonic()
+        try:
+            self._refresh(batch)
+        except Exception:
+            # the previous results are kept and served as they age
+            self._failures += 1
+            logger.exception(f'Refreshing {len(batch)} items failed')
+        self._refreshes += 1
+        self._last_duration = monotonic() - started
@@ -0,0 +1,360 @@
+import ipaddress
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from multiprocessing.managers import BaseManager
+from time import monotonic, sleep
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    TypeVar,
+)
+
+TSource = TypeVar('TSource')
+TResult = TypeVar('TResult')
+
+DEFAULT_LEASE_TIMEOUT = 30.0
+DEFAULT_POLL_INTERVAL = 0.5
+# shards waiting on the board, the rest of the sources aren't read yet
+DEFAULT_SHARD_BACKLOG = 8
+
+logger = logging.getLogger('forecasting')
+
+Address = tuple[str, int]
+
+
+def is_loopback(address: Address) -> bool:
+    """Whether only this host can connect to `address`"""
+    host = address[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        # any other host name may resolve to a public address
+        return False
+
+
+class Shard(NamedTuple, Generic[TSource]):
+    id: int
+    sources: list[TSource]
+
+
+class ShardProgress(NamedTuple):
+    total: int
+    done: int
+    leased: int
+    requeued: int
+
+
+class ShardBoard(Generic[TSource, TResult]):
+    """
+    Shards waiting to be processed, leased to workers and completed.
+    A lease expires unless its worker renews it in time, the shard goes
+    back to the queue then, so shards of a dead worker are picked up by
+    the others. The first result of a shard wins.
+
+    More shards can be added until the board is closed, which it is
+    from the start unless `closed` is False. Sources of completed shards
+    are dropped.
+    """
+
+    def __init__(
+            self,
+            shards: Iterable[list[TSource]] = (),
+            lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+            settings: Optional[dict[str, Any]] = None,
+            closed: bool = True
+    ):
+        self._shards = dict(enumerate(shards))
+        self._total = len(self._shards)
+        self._closed = closed
+        self._lease_timeout = lease_timeout
+        self._settings = settings or {}
+        self._pending = deque(self._shards)
+        # shard id -> worker holding it and the lease deadline
+        self._leases: dict[int, tuple[str, float]] = {}
+        self._done: set[int] = set()
+        self._results: list[tuple[int, TResult]] = []
+        self._requeued = 0
+        self._lock = threading.Lock()
+
+    def lease_timeout(self) -> float:
+        return self._lease_timeout
+
+    def settings(self) -> dict[str, Any]:
+        return self._settings
+
+    def add(self, sources: list[TSource]) -> int:
+        with self._lock:
+            if self._closed:
+                raise ValueError('Shards are not added to a closed board')
+            shard_id = self._total
+            self._shards[shard_id] = sources
+            self._pending.append(shard_id)
+            self._total += 1
+            return shard_id
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+    def backlog(self) -> int:
+        """Shards waiting for a worker"""
+        with self._lock:
+            return len(self._pending)
+
+    def progress(self) -> ShardProgress:
+        """`total` counts the shards added so far"""
+        with self._lock:
+            return ShardProgress(
+                self._total,
+                len(self._done),
+                len(self._leases),
+                self._requeued,
+            )
+
+    def finished(self) -> bool:
+        with self._lock:
+            return self._closed and len(self._done) == self._total
+
+    def lease(self, worker: str) -> Optional[Shard[TSource]]:
+        with self._lock:
+            self._requeue_expired()
+            while self._pending:
+                shard_id = self._pending.popleft()
+                if shard_id in self._done or shard_id in self._leases:
+                    continue
+                self._leases[shard_id] = (
+                    worker,
+                    monotonic() + self._lease_timeout
+                )
+                return Shard(shard_id, self._shards[shard_id])
+            return None
+
+    def renew(self, worker: str, shard_id: int) -> bool:
+        """False when the lease was lost and the shard given to another"""
+        with self._lock:
+            if self._leases.get(shard_id, (None,))[0] != worker:
+                return False
+            self._leases[shard_id] = (
+                worker,
+                monotonic() + self._lease_timeout
+            )
+            return True
+
+    def release(self, worker: str, shard_id: int):
+        """Gives a shard back without a result"""
+        with self._lock:
+            if self._leases.get(shard_id, (None,))[0] == worker:
+                del self._leases[shard_id]
+                self._pending.appendleft(shard_id)
+                self._requeued += 1
+
+    def complete(self, worker: str, shard_id: int, result: TResult) -> bool:
+        with self._lock:
+            if shard_id in self._done:
+                return False
+            if self._leases.get(shard_id, (None,))[0] == worker:
+                del self._leases[shard_id]
+            self._done.add(shard_id)
+            del self._shards[shard_id]
+            self._results.append((shard_id, result))
+            return True
+
+    def take_results(self) -> list[tuple[int, TResult]]:
+        with self._lock:
+            results, self._results = self._results, []
+            return results
+
+    def _requeue_expired(self):
+        now = monotonic()
+        for shard_id, (worker, deadline) in list(self._leases.items()):
+            if deadline < now:
+                logger.warning(
+                    f'lease of shard {shard_id} by {worker} expired'
+                )
+                del self._leases[shard_id]
+                self._pending.append(shard_id)
+                self._requeued += 1
+
+
+_board: Optional[ShardBoard] = None
+
+
+def _init_board(lease_timeout: float, settings: Optional[dict[str, Any]]):
+    global _board
+    # the coordinator adds shards as workers take them
+    _board = ShardBoard((), lease_timeout, settings, closed=False)
+
+
+def _get_board() -> Optional[ShardBoard]:
+    return _board
+
+
+class ShardManager(BaseManager):
+    pass
+
+
+ShardManager.register('board', callable=_get_board)
+
+
+def iter_shards(
+        sources: Iterable[TSource],
+        shard_size: int
+) -> Iterator[list[TSource]]:
+    """Shards of `sources`, which are read as shards are taken"""
+    if shard_size < 1:
+        raise ValueError('Shard size must be positive')
+    sources = iter(sources)
+    return iter(lambda: list(islice(sources, shard_size)), [])
+
+
+def make_shards(
+        sources: Iterable[TSource],
+        shard_size: int
+) -> list[list[TSource]]:
+    return list(iter_shards(sources, shard_size))
+
+
+class ShardCoordinator(Generic[TSource, TResult]):
+    """
+    Serves shards of `sources` to workers over TCP from a manager
+    process and collects their results. Sources are read lazily, only
+    `backlog` shards wait on the board at a time, and are topped up
+    while results are collected.
+    """
+
+    def __init__(
+            self,
+            sources: Iterable[TSource],
+            shard_size: int,
+            address: Address,
+            authkey: bytes,
+            lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+            settings: Optional[dict[str, Any]] = None,
+            backlog: int = DEFAULT_SHARD_BACKLOG
+    ):
+        self._shards: Optional[Iterator[list[TSource]]] = iter_shards(
+            sources,
+            shard_size
+        )
+        self._board_args = (lease_timeout, settings)
+        self._backlog = max(backlog, 1)
+        self._manager = ShardManager(address, authkey)
+        self._board: Any = None
+
+    @property
+    def address(self) -> Address:
+        return self._manager.address
+
+    def progress(self) -> ShardProgress:
+        return self._board.progress()
+
+    def __enter__(self) -> 'ShardCoordinator[TSource, TResult]':
+        # the board lives in the manager process, which workers talk to
+        self._manager.start(_init_board, self._board_args)
+        self._board = self._manager.board()
+        self._add_shards()
+        return self
+
+    def __exit__(self, *exc):
+        self._board = None
+        self._manager.shutdown()
+
+    def results(
+            self,
+            poll_interval: float = DEFAULT_POLL_INTERVAL
+    ) -> Iterator[tuple[int, TResult]]:
+        """Results by shard id as they come until every shard is done"""
+        while True:
+            self._add_shards()
+            # checked before taking so that the last results aren't lost
+            finished = self._board.finished()
+            yield from self._board.take_results()
+            if finished:
+                return
+            sleep(poll_interval)
+
+    def _add_shards(self):
+        if self._shards is None:
+            return
+        for _ in range(self._backlog - self._board.backlog()):
+            shard = next(self._shards, None)
+            if shard is None:
+                self._shards = None
+                self._board.close()
+                return
+            self._board.add(shard)
+
+
+def connect_board(address: Address, authkey: bytes) -> Any:
+    manager = ShardManager(address, authkey)
+    manager.connect()
+    return manager.board()
+
+
+def work_on_shards(
+        board: Any,
+        worker: str,
+        run: Callable[[list[TSource]], TResult],
+        poll_interval: float = DEFAULT_POLL_INTERVAL
+) -> int:
+    """
+    Leases shards from the board and runs them until all are done,
+    renewing the lease while a shard runs. Returns the shards completed.
+    """
+    completed = 0
+    renew_every = board.lease_timeout() / 3
+    while True:
+        try:
+            if board.finished():
+                break
+            shard = board.lease(worker)
+        except (EOFError, ConnectionError):
+            # the coordinator has got every result and quit
+            break
+        if shard is None:
+            # the rest is leased, wait in case one of them is given back
+            sleep(poll_interval)
+            continue
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=_renew_lease,
+            args=(board, worker, shard.id, renew_every, done),
+            daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = run(shard.sources)
+        except BaseException:
+            board.release(worker, shard.id)
+            raise
+        finally:
+            done.set()
+            heartbeat.join()
+
+        completed += board.complete(worker, shard.id, result)
+        logger.info(f'{worker} completed shard {shard.id}')
+
+    return completed
+
+
+def _renew_lease(
+        board: Any,
+        worker: str,
+        shard_id: int,
+        every: float,
+        done: threading.Event
+):
+    while not done.wait(every):
+        if not board.renew(worker, shard_id):
+            logger.warning(f'{worker} lost the lease of shard {shard_id}')
+            return
@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple, Iterator
+
+
+class SharedPayload(NamedTuple):
+    """
+    Handle of a byte payload placed in a shared memory segment. Only the
+    handle travels through queues, the segment is owned by whoever reads
+    it and is released right after reading.
+    """
+
+    name: str
+    size: int
+
+    @classmethod
+    def create(cls, data: bytes) -> 'SharedPayload':
+        shm = SharedMemory(create=True, size=max(len(data), 1))
+        try:
+            shm.buf[:len(data)] = data
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        # the reader unlinks the segment, possibly in another process,
+        # so the producer must not clean it up on its own exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        shm.close()
+
+        return cls(shm.name, len(data))
+
+    def discard(self):
+        """Releases the segment without reading it"""
+        shm = SharedMemory(self.name)
+        shm.close()
+        shm.unlink()
+
+    @contextmanager
+    def open(self) -> Iterator[memoryview]:
+        shm = SharedMemory(self.name)
+        view = shm.buf[:self.size]
+        try:
+            yield view
+        finally:
+            view.release()
+            shm.close()
+            shm.unlink()
@@ -1,13 +1,18 @@
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from multiprocessing import JoinableQueue
-from typing import TypeVar, Generic, Iterable, Protocol
+from time import monotonic
+from typing import TypeVar, Generic, Iterable, Protocol, Optional
 
-from common_types.task_types import TaskState
+from common_types.task_types import TaskState, TaskSink, Status
+from my_concurrent import tracing
+from my_concurrent.limiter import AdjustableLimiter
 
 
 TSource = TypeVar('TSource')
 TData = TypeVar('TData', covariant=True)
 
+LATENCY_SMOOTHING = 0.2
+
 
 class DataFetcher(Protocol[TSource, TData]):
     def get_sources(self) -> Iterable[TSource]:
@@ -22,23 +27,80 @@ class ThreadFetcher(Generic[TSource, TData]):
             self,
             data_fetcher: DataFetcher[TSource, TData],
             fetchers_count: int,
-            output_queue: JoinableQueue
+            output_queue: TaskSink,
+            max_fetchers: Optional[int] = None
     ):
         self.data_fetcher = data_fetcher
-        self._fetchers_count = fetchers_count
+        self._max_fetchers = max(max_fetchers or 0, fetchers_count)
+        self._limiter = AdjustableLimiter(fetchers_count)
         self._out_q = output_queue
+        self._emitted = 0
+        self._failed = 0
+        self._latency: Optional[float] = None
+        self._stats_lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    @property
+    def emitted(self) -> int:
+        return self._emitted
+
+    @property
+    def failed(self) -> int:
+        """Sources emitted as errors, left out of the results"""
+        return self._failed
+
+    @property
+    def size(self) -> int:
+        return self._limiter.limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._limiter.active
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Exponentially weighted average of fetch time in seconds"""
+        return self._latency
 
-    def fetch_data(self):
-        with ThreadPoolExecutor(max_workers=self._fetchers_count) as pool:
-            pool.map(
-                self._handle_one_source,
-                self.data_fetcher.get_sources()
-            )
+    def resize(self, size: int):
+        self._limiter.set_limit(min(max(size, 1), self._max_fetchers))
+
+    def cancel(self):
+        """No more sources are fetched, ones in flight are still emitted"""
+        self._cancelled.set()
+
+    def fetch_data(self) -> int:
+        with ThreadPoolExecutor(max_workers=self._max_fetchers) as pool:
+            for data_source in self.data_fetcher.get_sources():
+                self._limiter.acquire()
+                if self._cancelled.is_set():
+                    self._limiter.release()
+                    break
+                pool.submit(
+                    self._handle_one_source,
+                    data_source
+                ).add_done_callback(lambda _: self._limiter.release())
+
+        return self._emitted
 
     def _handle_one_source(self, data_source: TSource):
+        started = monotonic()
         try:
             result = self.data_fetcher.fetch_source(data_source)
         except Exception as e:
-            self._out_q.put(TaskState[TData].error(str(e)))
+            task = TaskState[TData].error(str(e))
         else:
-            self._out_q.put(TaskState[TData].ok(result))
+            task = TaskState[TData].ok(result)
+
+        fetched = monotonic()
+        tracing.record('fetch', data_source, started, fetched)
+        self._out_q.put(task)
+
+        elapsed = fetched - started
+        with self._stats_lock:
+            self._emitted += 1
+            self._failed += task.status != Status.OK
+            if self._latency is None:
+                self._latency = elapsed
+            else:
+                self._latency += LATENCY_SMOOTHING * (elapsed - self._latency)
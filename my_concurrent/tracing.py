@@ -0,0 +1,290 @@
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing import JoinableQueue
+from time import monotonic
+from typing import NamedTuple, Optional, Iterable, Iterator, Sequence, Any
+
+DEFAULT_SAMPLE_INTERVAL = 0.05
+
+
+class Span(NamedTuple):
+    stage: str
+    key: Optional[str]
+    start: float
+    end: float
+    pid: int
+    tid: int
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Sample(NamedTuple):
+    name: str
+    value: int
+    at: float
+
+
+class Transfer(NamedTuple):
+    """Wait of an item between the end of one stage and start of another"""
+    source: str
+    target: str
+    name: str
+
+
+class StageStats(NamedTuple):
+    stage: str
+    count: int
+    total: float
+    p50: float
+    p99: float
+    max: float
+
+
+class Tracer:
+    """
+    Collects per-item stage spans and queue depth samples of one run.
+    Timestamps come from `time.monotonic`, which is shared by all
+    processes of a host, so spans recorded by workers line up with
+    the parent ones once merged.
+    """
+
+    def __init__(self, transfers: Sequence[Transfer] = ()):
+        self._transfers = transfers
+        self._spans: list[Span] = []
+        self._samples: list[Sample] = []
+        self._sampler: Optional[threading.Thread] = None
+        self._sampling = threading.Event()
+
+    @property
+    def spans(self) -> list[Span]:
+        return self._spans
+
+    @property
+    def samples(self) -> list[Sample]:
+        return self._samples
+
+    def record(self, stage: str, key: Any, start: float, end: float):
+        self._spans.append(Span(
+            stage,
+            key_of(key),
+            start,
+            end,
+            os.getpid(),
+            threading.get_native_id()
+        ))
+
+    def merge(self, spans: Iterable[Span]):
+        self._spans.extend(spans)
+
+    def drain(self) -> list[Span]:
+        spans, self._spans = self._spans, []
+        return spans
+
+    def sample_queues(
+            self,
+            queues: dict[str, JoinableQueue],
+            interval: float = DEFAULT_SAMPLE_INTERVAL
+    ):
+        def sample():
+            while not self._sampling.wait(interval):
+                at = monotonic()
+                for name, queue in queues.items():
+                    try:
+                        depth = queue.qsize()
+                    except NotImplementedError:
+                        return
+                    self._samples.append(Sample(name, depth, at))
+
+        self._sampler = threading.Thread(target=sample, daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self):
+        self._sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def transfer_spans(self) -> list[Span]:
+        by_key: dict[tuple[str, Optional[str]], Span] = {}
+        for span in self._spans:
+            by_key[(span.stage, span.key)] = span
+
+        spans = []
+        for transfer in self._transfers:
+            for (stage, key), source in by_key.items():
+                if stage != transfer.source:
+                    continue
+                target = by_key.get((transfer.target, key))
+                if target is not None:
+                    spans.append(Span(
+                        transfer.name,
+                        key,
+                        source.end,
+                        max(target.start, source.end),
+                        target.pid,
+                        target.tid
+                    ))
+        return spans
+
+    def summary(self) -> list[StageStats]:
+        durations: dict[str, list[float]] = {}
+        for span in self._spans + self.transfer_spans():
+            durations.setdefault(span.stage, []).append(span.duration)
+
+        stats = []
+        for stage, values in durations.items():
+            values.sort()
+            stats.append(StageStats(
+                stage,
+                len(values),
+                sum(values),
+                values[len(values) // 2],
+                values[min(int(len(values) * 0.99), len(values) - 1)],
+                values[-1],
+            ))
+        return stats
+
+    def busy_time(self, stage: str) -> dict[int, float]:
+        """Seconds every process spent in `stage`"""
+        busy: dict[int, float] = {}
+        for span in self._spans:
+            if span.stage == stage:
+                busy[span.pid] = busy.get(span.pid, 0.0) + span.duration
+        return busy
+
+    def wall_time(self) -> float:
+        if not self._spans:
+            return 0.0
+        return (max(s.end for s in self._spans)
+                - min(s.start for s in self._spans))
+
+    def format_summary(self, busy_stage: Optional[str] = None) -> str:
+        lines = [
+            f'{"stage":<20}{"count":>8}{"total s":>10}'
+            f'{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}'
+        ]
+        for s in self.summary():
+            lines.append(
+                f'{s.stage:<20}{s.count:>8}{s.total:>10.3f}'
+                f'{s.p50 * 1e3:>10.3f}{s.p99 * 1e3:>10.3f}'
+                f'{s.max * 1e3:>10.3f}'
+            )
+
+        if busy_stage is not None:
+            wall = self.wall_time() or 1.0
+            lines.append(f'{"worker pid":<20}{"busy s":>18}{"busy %":>10}')
+            for pid, busy in sorted(self.busy_time(busy_stage).items()):
+                lines.append(
+                    f'{pid:<20}{busy:>18.3f}{busy / wall * 100:>10.1f}'
+                )
+        return '\n'.join(lines)
+
+    def to_chrome_trace(self) -> dict:
+        """Trace Event Format, loads in chrome://tracing and Perfetto"""
+        origin = min((s.start for s in self._spans), default=0.0)
+
+        def ts(at: float) -> float:
+            return round((at - origin) * 1e6, 1)
+
+        events: list[dict] = [
+            {
+                'name': span.stage,
+                'cat': 'stage',
+                'ph': 'X',
+                'ts': ts(span.start),
+                'dur': round(span.duration * 1e6, 1),
+                'pid': span.pid,
+                'tid': span.tid,
+                'args': {'key': span.key},
+            }
+            for span in self._spans
+        ]
+        # waits in queues overlap, async events don't have to nest
+        for span in self.transfer_spans():
+            for phase, at in (('b', span.start), ('e', span.end)):
+                events.append({
+                    'name': span.stage,
+                    'cat': 'transfer',
+                    'ph': phase,
+                    'id': f'{span.stage}:{span.key}',
+                    'ts': ts(at),
+                    'pid': span.pid,
+                    'tid': span.tid,
+                })
+        events += [
+            {
+                'name': sample.name,
+                'ph': 'C',
+                'ts': ts(sample.at),
+                'pid': os.getpid(),
+                'args': {'depth': sample.value},
+            }
+            for sample in self._samples
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def key_of(item: Any) -> Optional[str]:
+    """
+    City name of a pipeline item: sources are (city, url) pairs, stage
+    results have a `city` and task states wrap them
+    """
+    if item is None or isinstance(item, str):
+        return item
+    if getattr(item, 'status', None) is not None:
+        return key_of(getattr(item, 'data', None))
+    city = getattr(item, 'city', None)
+    if city is not None:
+        return str(city)
+    if isinstance(item, tuple) and item:
+        return key_of(item[0])
+    return str(item)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enable(transfers: Sequence[Transfer] = ()) -> Tracer:
+    global _tracer
+    _tracer = Tracer(transfers)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def record(stage: str, key: Any, start: float, end: float):
+    if _tracer is not None:
+        _tracer.record(stage, key, start, end)
+
+
+@contextmanager
+def span(stage: str, key: Any = None) -> Iterator[None]:
+    if _tracer is None:
+        yield
+        return
+
+    start = monotonic()
+    try:
+        yield
+    finally:
+        _tracer.record(stage, key, start, monotonic())
+
+
+def merge(spans: Iterable[Span]):
+    if _tracer is not None:
+        _tracer.merge(spans)
+
+
+def drain() -> list[Span]:
+    if _tracer is None:
+        return []
+    return _tracer.drain()
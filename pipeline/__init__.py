@@ -0,0 +1,14 @@
+from .core import PipelineSettings, RatingOptions
+from .core import find_bet_city, find_bet_city_history
+from .sharded import find_bet_city_sharded, run_shard_worker
+from .service import run_service
+
+__all__ = [
+    'PipelineSettings',
+    'RatingOptions',
+    'find_bet_city',
+    'find_bet_city_history',
+    'find_bet_city_sharded',
+    'run_shard_worker',
+    'run_service',
+]
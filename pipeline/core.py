@@ -0,0 +1,585 @@
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import JoinableQueue
+from pathlib import Path
+from queue import Empty
+from typing import NamedTuple, Iterable, Iterator, Optional, Callable
+
+from common_types.task_types import TaskState
+from external.client import YandexWeatherAPI
+from external.cache import ResponseCache
+from my_concurrent import tracing
+from my_concurrent.async_fetcher import AsyncFetcher
+from my_concurrent.autoscaler import Autoscaler, AutoscaleConfig
+from my_concurrent.dispatch_pool import FuturesPool, InlinePool
+from my_concurrent.process_pool import ProcessPool, PersistentProcessPool
+from my_concurrent.process_pool import WorkerPool
+from my_concurrent.queue_reader import StreamingQueueReader, StreamEnd
+from my_concurrent.thread_fetcher import ThreadFetcher
+from tasks import DataAggregationTask, TotalSummary
+from tasks import DataAnalyzingTask
+from tasks import DataCalculationTask
+from tasks import DataFetchingTask
+from tasks.analysis_memo import AnalysisMemo, MemoStats
+from tasks.analysis_rules import CompiledRules, RuleRanking
+from tasks.data_aggregation_task import aggregate_calculated
+from tasks.data_aggregation_task import aggregate_calculated_batch
+from tasks.data_calculation_task import ANALYZERS
+from tasks.data_fetching_task import CityNameUrlPair, CityRawData
+from tasks.data_fetching_task import CityRawPayload
+from tasks.history_store import HistoryStore
+from tasks.rating_writer import resolve_format
+from tasks.result_store import ResultStore, ResultRouter
+
+
+FETCH_ENGINES = ('thread', 'async')
+EXECUTORS = ('process', 'futures', 'inline')
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_BATCH_LINGER = 0.005
+# seconds a drained queue is waited on before checking if it is done
+DRAIN_INTERVAL = 0.05
+
+
+class PipelineSettings(NamedTuple):
+    """How cities are fetched and analyzed, the same for every run"""
+    fetchers_count: int = 16
+    calculation_workers_count: int = 4
+    fetch_engine: str = 'thread'
+    response_cache: Optional[ResponseCache] = None
+    streaming: bool = False
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    transport: str = 'pickle'
+    analyzer: str = 'default'
+    batch_size: int = 1
+    batch_linger: float = DEFAULT_BATCH_LINGER
+    executor: str = 'process'
+    autoscale: Optional[AutoscaleConfig] = None
+    analysis_memo: Optional[AnalysisMemo] = None
+    # warm pools only, see `PersistentProcessPool`
+    max_tasks: Optional[int] = None
+    max_rss_mb: Optional[float] = None
+
+
+class RatingOptions(NamedTuple):
+    """
+    Where the rating of a run is written, `top` only ranks the best
+    cities and the ones tied with them
+    """
+    rating_file: Optional[Path] = None
+    top: Optional[int] = None
+    rating_format: str = 'csv'
+
+
+class Config(NamedTuple):
+    cities_queue: JoinableQueue
+    calculation_queue: JoinableQueue
+    fetcher: (ThreadFetcher[CityNameUrlPair, CityRawData]
+              | AsyncFetcher[CityNameUrlPair, CityRawData])
+    process_pool: WorkerPool
+    aggregation_task: DataAggregationTask
+    analyzing_task: DataAnalyzingTask
+    response_cache: Optional[ResponseCache]
+    autoscaler: Optional[Autoscaler]
+    result_router: Optional[ResultRouter]
+
+
+def configure(
+        city_urls: Iterable[CityNameUrlPair],
+        settings: PipelineSettings = PipelineSettings(),
+        worker_pool: Optional[PersistentProcessPool] = None,
+        result_store: Optional[ResultStore] = None,
+        rules: Optional[CompiledRules] = None,
+) -> Config:
+    settings = _clamped(settings)
+    autoscale = settings.autoscale
+
+    cities_queue: JoinableQueue
+    calculation_queue: JoinableQueue
+    if worker_pool is not None:
+        # a warm pool brings its own queues and calculation settings
+        cities_queue = worker_pool.input_queue
+        calculation_queue = worker_pool.output_queue
+    else:
+        cities_queue = JoinableQueue(_queue_size(settings))
+        calculation_queue = JoinableQueue(_queue_size(settings))
+
+    fetching_task = DataFetchingTask(
+        city_urls,
+        settings.response_cache,
+        settings.transport,
+        result_store,
+        digests=settings.analysis_memo is not None,
+    )
+    result_router = None
+    if result_store is not None:
+        # unchanged cities skip the calculation workers
+        result_router = ResultRouter(
+            result_store,
+            cities_queue,
+            calculation_queue
+        )
+    fetcher: (ThreadFetcher[CityNameUrlPair, CityRawData]
+              | AsyncFetcher[CityNameUrlPair, CityRawData])
+    if settings.fetch_engine == 'async':
+        fetcher = AsyncFetcher[CityNameUrlPair, CityRawData](
+            fetching_task,
+            settings.fetchers_count,
+            result_router or cities_queue
+        )
+    elif settings.fetch_engine == 'thread':
+        fetcher = ThreadFetcher[CityNameUrlPair, CityRawData](
+            fetching_task,
+            settings.fetchers_count,
+            result_router or cities_queue,
+            autoscale.fetchers.max_size if autoscale else None
+        )
+    else:
+        raise ValueError(f'Unknown fetch engine: {settings.fetch_engine}')
+
+    process_pool: WorkerPool
+    if worker_pool is not None:
+        process_pool = worker_pool
+    else:
+        process_pool = _make_worker_pool(
+            settings,
+            cities_queue,
+            calculation_queue,
+            rules,
+        )
+
+    autoscaler = None
+    if autoscale is not None:
+        if not isinstance(fetcher, ThreadFetcher):
+            raise ValueError('Autoscaling requires the thread fetch engine')
+        if not isinstance(process_pool, ProcessPool):
+            raise ValueError('Autoscaling requires a process worker pool')
+        autoscaler = Autoscaler(
+            fetcher,
+            process_pool,
+            cities_queue,
+            # results are only read once fetching is over in phase mode
+            calculation_queue if settings.streaming else None,
+            autoscale
+        )
+
+    queue_reader = StreamingQueueReader[TotalSummary](calculation_queue)
+    aggregation_task = DataAggregationTask(queue_reader)
+
+    analyzing_task = DataAnalyzingTask()
+
+    return Config(
+        cities_queue,
+        calculation_queue,
+        fetcher,
+        process_pool,
+        aggregation_task,
+        analyzing_task,
+        settings.response_cache,
+        autoscaler,
+        result_router,
+    )
+
+
+def _clamped(settings: PipelineSettings) -> PipelineSettings:
+    """Sizes to start from, within the autoscaling bounds if any"""
+    autoscale = settings.autoscale
+    if autoscale is None:
+        return settings
+    return settings._replace(
+        fetchers_count=autoscale.fetchers.clamp(settings.fetchers_count),
+        calculation_workers_count=autoscale.workers.clamp(
+            settings.calculation_workers_count
+        ),
+    )
+
+
+def _queue_size(settings: PipelineSettings) -> int:
+    # in phase mode nothing drains the queues until fetching is over,
+    # so they can only be bounded when the stages run concurrently
+    return settings.queue_size if settings.streaming else 0
+
+
+def _calculation_handlers(
+        analyzer: str,
+        analysis_memo: Optional[AnalysisMemo] = None,
+        rules: Optional[CompiledRules] = None
+) -> tuple[Callable, Callable]:
+    if analyzer not in ANALYZERS:
+        raise ValueError(f'Unknown analyzer: {analyzer}')
+    # workers started by the fork server or spawned import the client
+    # anew with its default decoder, so the configured one goes along
+    decoder = YandexWeatherAPI.decoder
+    # workers aggregate their cities and send back packed totals
+    return (
+        partial(
+            aggregate_calculated,
+            partial(
+                DataCalculationTask.calculate_summary_by_days,
+                analyzer=analyzer,
+                memo=analysis_memo,
+                decoder=decoder,
+            ),
+            rules=rules,
+            decoder=decoder,
+        ),
+        partial(
+            aggregate_calculated_batch,
+            partial(
+                DataCalculationTask.calculate_summaries_batch,
+                analyzer=analyzer,
+                memo=analysis_memo,
+                decoder=decoder,
+            ),
+            rules=rules,
+            decoder=decoder,
+        ),
+    )
+
+
+def _make_worker_pool(
+        settings: PipelineSettings,
+        cities_queue: JoinableQueue,
+        calculation_queue: JoinableQueue,
+        rules: Optional[CompiledRules] = None,
+) -> WorkerPool:
+    calculate, calculate_batch = _calculation_handlers(
+        settings.analyzer,
+        settings.analysis_memo,
+        rules
+    )
+    if settings.executor == 'process':
+        return ProcessPool[CityRawData, TotalSummary].make_pool(
+            calculate,
+            settings.calculation_workers_count,
+            cities_queue,
+            calculation_queue,
+            settings.batch_size,
+            settings.batch_linger,
+            calculate_batch,
+        )
+    elif settings.executor == 'futures':
+        return FuturesPool[CityRawData, TotalSummary](
+            calculate,
+            settings.calculation_workers_count,
+            cities_queue,
+            calculation_queue
+        )
+    elif settings.executor == 'inline':
+        return InlinePool[CityRawData, TotalSummary](
+            calculate,
+            cities_queue,
+            calculation_queue
+        )
+    raise ValueError(f'Unknown executor: {settings.executor}')
+
+
+def make_warm_pool(
+        settings: PipelineSettings
+) -> Optional[PersistentProcessPool]:
+    """
+    Workers kept across runs of the process executor, see
+    `PersistentProcessPool`, None for the other executors
+    """
+    if settings.executor != 'process':
+        return None
+    calculate, calculate_batch = _calculation_handlers(
+        settings.analyzer,
+        settings.analysis_memo
+    )
+    return PersistentProcessPool[CityRawData, TotalSummary](
+        calculate,
+        _clamped(settings).calculation_workers_count,
+        settings.batch_size,
+        settings.batch_linger,
+        calculate_batch,
+        settings.max_tasks,
+        settings.max_rss_mb,
+        _queue_size(settings),
+    )
+
+
+def find_bet_city(
+        city_urls: Iterable[CityNameUrlPair],
+        settings: PipelineSettings = PipelineSettings(),
+        rating: RatingOptions = RatingOptions(),
+        on_update: Optional[Callable[[list[TotalSummary]], None]] = None,
+        worker_pool: Optional[PersistentProcessPool] = None,
+        trace_file: Optional[Path] = None,
+        result_store: Optional[ResultStore] = None,
+        history_store: Optional[HistoryStore] = None,
+        rule_ranking: Optional[RuleRanking] = None,
+) -> list[TotalSummary]:
+    """
+    Best cities, or the `top` ones in rating order when only those
+    are asked for and no rating file is written. Every city of the run
+    is added to `history_store` when given and rated by the rules of
+    `rule_ranking`, which ranks them by each rule set afterwards.
+    """
+    if rating.rating_file:
+        resolve_format(rating.rating_format)
+    if rule_ranking is not None and (worker_pool or result_store):
+        # both hand over cities the workers of this run don't rate
+        raise ValueError(
+            'Rules are only evaluated by workers started for the run '
+            'and without a result store'
+        )
+    # workers pick the tracing flag up when they are created
+    tracer = _start_tracing() if trace_file else None
+    config = configure(
+        city_urls,
+        settings,
+        worker_pool,
+        result_store,
+        rule_ranking.rules if rule_ranking else None,
+    )
+    analysis_memo = settings.analysis_memo
+    memo_before = analysis_memo.stats() if analysis_memo else None
+    if tracer is not None:
+        tracer.sample_queues({
+            'cities_queue': config.cities_queue,
+            'calculation_queue': config.calculation_queue,
+        })
+
+    with run_pipeline(config, settings.streaming) as city_summaries:
+        if history_store is not None:
+            city_summaries = history_store.record(city_summaries)
+        if rule_ranking is not None:
+            city_summaries = rule_ranking.record(city_summaries)
+        result = analyze(
+            config.analyzing_task,
+            city_summaries,
+            rating,
+            on_update
+        )
+
+    if analysis_memo is not None and memo_before is not None:
+        _log_memo_stats(analysis_memo.stats().since(memo_before))
+    if tracer is not None and trace_file is not None:
+        _finish_tracing(tracer, trace_file)
+
+    return result
+
+
+@contextmanager
+def run_pipeline(
+        config: Config,
+        streaming: bool
+) -> Iterator[Iterable[TotalSummary]]:
+    """
+    Aggregated cities as they come, workers stop on exit. When reading
+    them fails, the cities left are dropped so that no stage stays
+    blocked on a full queue and a warm pool is left with empty queues.
+    """
+    # workers start while the first cities are fetched
+    starter = ThreadPoolExecutor(max_workers=1)
+    workers_started = starter.submit(config.process_pool.start_all)
+    starter.shutdown(wait=False)
+    fetching: Optional[threading.Thread] = None
+    try:
+        if config.autoscaler is not None:
+            workers_started.result()
+            config.autoscaler.start()
+        logging.info('start fetching cities data')
+        if streaming:
+            fetching = threading.Thread(
+                target=_fetch_streaming,
+                args=(config,),
+                daemon=True
+            )
+            fetching.start()
+            workers_started.result()
+        else:
+            emitted = config.fetcher.fetch_data()
+            workers_started.result()
+            config.cities_queue.join()
+            # results may still sit in workers' queue buffers after join,
+            # so the reader has to count them rather than wait for a
+            # sentinel
+            config.calculation_queue.put(StreamEnd(emitted))
+            _log_fetch_stats(config)
+        logging.info('calculate all cities summary by days')
+
+        city_summaries = config.aggregation_task.aggregate_tasks()
+        if config.result_router is not None:
+            city_summaries = config.result_router.remember(city_summaries)
+
+        yield city_summaries
+    except BaseException:
+        _cancel_pipeline(config, workers_started, fetching)
+        raise
+    finally:
+        if fetching is not None:
+            fetching.join()
+        _stop_autoscaler(config)
+        # every worker started has to get its stop sentinel
+        wait([workers_started])
+        config.process_pool.stop_all()
+
+
+def _cancel_pipeline(
+        config: Config,
+        workers_started: Future,
+        fetching: Optional[threading.Thread]
+):
+    config.fetcher.cancel()
+    if config.autoscaler is not None:
+        # its stop sentinels mustn't be dropped with the cities
+        config.autoscaler.stop()
+    wait([workers_started])
+    results_drained = threading.Event()
+    draining = threading.Thread(
+        target=_drain,
+        args=(config.calculation_queue, results_drained.is_set),
+        daemon=True
+    )
+    draining.start()
+    try:
+        # fetches in flight may wait for room in the cities queue
+        _drain(
+            config.cities_queue,
+            lambda: fetching is None or not fetching.is_alive()
+        )
+        # cities already taken by workers are finished
+        config.cities_queue.join()
+        config.calculation_queue.join()
+    finally:
+        results_drained.set()
+        draining.join()
+
+
+def _drain(queue: JoinableQueue, until: Callable[[], bool]):
+    """Drops items of `queue` until it is empty and `until()` is true"""
+    while True:
+        try:
+            task = queue.get(timeout=DRAIN_INTERVAL)
+        except Empty:
+            if until():
+                return
+            continue
+        # shared memory segments are owned by whoever takes the task
+        if (isinstance(task, TaskState)
+                and isinstance(task.data, CityRawPayload)):
+            task.data.payload.discard()
+        queue.task_done()
+
+
+def analyze(
+        analyzing_task: DataAnalyzingTask,
+        city_summaries: Iterable[TotalSummary],
+        rating: RatingOptions,
+        on_update: Optional[Callable[[list[TotalSummary]], None]] = None
+) -> list[TotalSummary]:
+    if rating.rating_file:
+        return analyzing_task.calculate_ratings(
+            city_summaries,
+            rating.rating_file,
+            rating.top,
+            rating.rating_format
+        )
+    if rating.top is not None:
+        result, _ = analyzing_task.rank_cities(city_summaries, rating.top)
+        return result
+    return analyzing_task.find_best_city(city_summaries, on_update)
+
+
+def find_bet_city_history(
+        history_store: HistoryStore,
+        last_runs: Optional[int] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        rating: RatingOptions = RatingOptions(),
+) -> list[TotalSummary]:
+    """
+    `find_bet_city` over a window of stored runs, see
+    `HistoryStore.window_totals`, nothing is fetched or analyzed
+    """
+    if rating.rating_file:
+        resolve_format(rating.rating_format)
+    return analyze(
+        DataAnalyzingTask(),
+        history_store.window_totals(last_runs, since, until),
+        rating
+    )
+
+
+def _start_tracing() -> tracing.Tracer:
+    return tracing.enable((
+        tracing.Transfer('fetch', 'calculate', 'cities_queue'),
+        tracing.Transfer('calculate', 'aggregate', 'calculation_queue'),
+    ))
+
+
+def _finish_tracing(tracer: tracing.Tracer, trace_file: Path):
+    tracer.stop_sampling()
+    tracing.disable()
+    with open(trace_file, 'w') as file:
+        json.dump(tracer.to_chrome_trace(), file)
+    logging.info(
+        f'stage timings, trace saved to {trace_file}:\n'
+        f'{tracer.format_summary("calculate")}'
+    )
+
+
+def _stop_autoscaler(config: Config):
+    if config.autoscaler is not None:
+        config.autoscaler.stop()
+        logging.info(
+            f'autoscaled to {config.fetcher.size} fetchers'
+            f' and {config.process_pool.size} workers'
+        )
+
+
+def _fetch_streaming(config: Config):
+    try:
+        config.fetcher.fetch_data()
+    finally:
+        # results of every emitted city may still be in flight
+        config.calculation_queue.put(StreamEnd(config.fetcher.emitted))
+    _log_fetch_stats(config)
+
+
+def _log_fetch_stats(config: Config):
+    logging.info('fetched all cities data')
+    if isinstance(config.fetcher, ThreadFetcher):
+        if config.fetcher.failed:
+            logging.warning(
+                f'{config.fetcher.failed} cities failed to fetch'
+            )
+        pool_stats = YandexWeatherAPI.pool.stats()
+        logging.info(
+            f'connections opened: {pool_stats.opened},'
+            f' reused: {pool_stats.reused}'
+        )
+        if YandexWeatherAPI.resilience is not None:
+            stats = YandexWeatherAPI.resilience.stats()
+            logging.info(
+                f'requests: {stats.requests}, retries: {stats.retries},'
+                f' hedged: {stats.hedges}, hedges won: {stats.hedge_wins},'
+                f' rejected by circuit breaker: {stats.rejected}'
+            )
+    if config.response_cache is not None:
+        cache_stats = config.response_cache.stats()
+        logging.info(
+            f'response cache hits: {cache_stats.hits},'
+            f' misses: {cache_stats.misses},'
+            f' revalidated: {cache_stats.revalidated},'
+            f' evicted: {cache_stats.evicted}'
+        )
+    if config.result_router is not None:
+        store_stats = config.result_router.store.stats()
+        logging.info(
+            f'unchanged cities: {store_stats.hits},'
+            f' changed: {store_stats.misses}'
+        )
+
+
+def _log_memo_stats(stats: MemoStats):
+    logging.info(
+        f'analysis memo hits: {stats.hits}, misses: {stats.misses},'
+        f' hit rate: {stats.hit_rate:.1%}, evicted: {stats.evicted},'
+        f' entries: {stats.entries}'
+    )
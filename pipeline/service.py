@@ -0,0 +1,58 @@
+import logging
+import signal
+import sys
+from time import time
+from typing import Iterable, Optional
+
+from my_concurrent.refresh import StaggeredRefresher
+from my_concurrent.refresh import DEFAULT_REFRESH_INTERVAL
+from my_concurrent.refresh import DEFAULT_REFRESH_SLOTS
+from pipeline.core import PipelineSettings
+from pipeline.core import configure, make_warm_pool, run_pipeline
+from tasks.data_fetching_task import CityNameUrlPair
+from tasks.rating_service import Endpoint, RatingBoard, make_server
+from tasks.result_store import ResultStore
+
+
+def run_service(
+        city_urls: Iterable[CityNameUrlPair],
+        endpoint: Endpoint,
+        settings: PipelineSettings = PipelineSettings(),
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+        refresh_slots: int = DEFAULT_REFRESH_SLOTS,
+        result_store: Optional[ResultStore] = None,
+):
+    """
+    Serves the latest ranking of cities on `endpoint` until interrupted,
+    see `RatingRequestHandler`, while a `StaggeredRefresher` keeps
+    fetching and analyzing them on a warm worker pool. Cities unchanged
+    since they were put in `result_store` aren't analyzed again.
+    """
+    board = RatingBoard()
+    worker_pool = make_warm_pool(settings)
+
+    def refresh(cities: list[CityNameUrlPair]):
+        fetched_at = time()
+        config = configure(cities, settings, worker_pool, result_store)
+        with run_pipeline(config, settings.streaming) as city_summaries:
+            board.update(list(city_summaries), fetched_at)
+        logging.info(f'refreshed {len(cities)} cities')
+
+    refresher = StaggeredRefresher[CityNameUrlPair](
+        list(city_urls),
+        refresh,
+        refresh_interval,
+        refresh_slots,
+    )
+    server = make_server(endpoint, board)
+    # stopped like on Ctrl+C, so that the cleanup below runs
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    refresher.start()
+    logging.info(f'serving ratings on {endpoint}')
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        refresher.stop()
+        if worker_pool is not None:
+            worker_pool.shutdown()
@@ -0,0 +1,103 @@
+import logging
+import os
+import socket
+from itertools import chain
+from typing import Iterable, Optional
+
+from my_concurrent.sharding import Address, ShardCoordinator
+from my_concurrent.sharding import DEFAULT_LEASE_TIMEOUT
+from my_concurrent.sharding import connect_board, work_on_shards
+from pipeline.core import PipelineSettings, RatingOptions
+from pipeline.core import analyze, configure, make_warm_pool, run_pipeline
+from tasks import DataAnalyzingTask, TotalSummary
+from tasks.data_fetching_task import CityNameUrlPair
+from tasks.history_store import HistoryStore
+from tasks.rating_writer import resolve_format
+from tasks.result_store import ResultStore
+
+
+DEFAULT_SHARD_SIZE = 1000
+
+
+def find_bet_city_sharded(
+        city_urls: Iterable[CityNameUrlPair],
+        address: Address,
+        authkey: bytes,
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        rating: RatingOptions = RatingOptions(),
+        lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+        history_store: Optional[HistoryStore] = None,
+) -> list[TotalSummary]:
+    """
+    `find_bet_city` over shards of cities run by shard workers, see
+    `run_shard_worker`. Workers send back aggregated cities, which are
+    ranked here. Only their `top` ones are sent when just those are
+    asked for, unless every city is added to `history_store` as a run.
+    """
+    if rating.rating_file:
+        resolve_format(rating.rating_format)
+    top = rating.top if history_store is None else None
+    coordinator = ShardCoordinator[CityNameUrlPair, list[TotalSummary]](
+        city_urls,
+        shard_size,
+        address,
+        authkey,
+        lease_timeout,
+        {'top': top},
+    )
+    partials: dict[int, list[TotalSummary]] = {}
+    with coordinator:
+        logging.info(f'serving shards on {coordinator.address}')
+        for shard_id, cities in coordinator.results():
+            partials[shard_id] = cities
+            progress = coordinator.progress()
+            logging.info(
+                f'shard {shard_id} done, {progress.done}/{progress.total}'
+                f' added so far,'
+                f' requeued: {progress.requeued}'
+            )
+
+    # shard order keeps ties in the order of a single node run
+    city_summaries = chain.from_iterable(
+        partials[shard_id] for shard_id in sorted(partials)
+    )
+    if history_store is not None:
+        city_summaries = history_store.record(city_summaries)
+    return analyze(DataAnalyzingTask(), city_summaries, rating)
+
+
+def run_shard_worker(
+        address: Address,
+        authkey: bytes,
+        settings: PipelineSettings = PipelineSettings(),
+        name: Optional[str] = None,
+        result_store: Optional[ResultStore] = None,
+) -> int:
+    """
+    Runs shards of a `find_bet_city_sharded` coordinator until all of
+    them are done, returns the number of shards this worker completed.
+    Cities unchanged since they were put in `result_store` aren't
+    analyzed again.
+    """
+    board = connect_board(address, authkey)
+    top = board.settings().get('top')
+    name = name or f'{socket.gethostname()}:{os.getpid()}'
+    # workers stay warm across shards
+    worker_pool = make_warm_pool(settings)
+
+    def run_shard(city_urls: list[CityNameUrlPair]) -> list[TotalSummary]:
+        config = configure(city_urls, settings, worker_pool, result_store)
+        with run_pipeline(config, settings.streaming) as city_summaries:
+            if top is None:
+                return list(city_summaries)
+            cities, _ = config.analyzing_task.rank_cities(
+                city_summaries,
+                top
+            )
+            return cities
+
+    try:
+        return work_on_shards(board, name, run_shard)
+    finally:
+        if worker_pool is not None:
+            worker_pool.shutdown()
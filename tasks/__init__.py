@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from .data_fetching_task import DataFetchingTask
 from .data_calculation_task import DataCalculationTask
@@ -11,15 +12,29 @@ __all__ = [
     'DataAggregationTask',
     'TotalSummary',
     'DataAnalyzingTask',
+    'configure_logging',
 ]
 
+LOG_FILE = 'forecasting.log'
+
 logger = logging.getLogger('forecasting')
-logger.setLevel(logging.INFO)
 
-file_handler = logging.FileHandler('forecasting.log')
-file_handler.setLevel(logging.DEBUG)
-logger.addHandler(file_handler)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-logger.addHandler(console_handler)
+def configure_logging(log_file: Optional[str] = LOG_FILE):
+    """
+    Console and file handlers of the `forecasting` logger, set up by
+    entry points rather than on import, so that importing the package
+    in worker processes doesn't open the log file
+    """
+    if logger.handlers:
+        return
+    logger.setLevel(logging.INFO)
+
+    if log_file:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setLevel(logging.DEBUG)
+        logger.addHandler(file_handler)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    logger.addHandler(console_handler)
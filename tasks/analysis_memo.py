@@ -0,0 +1,202 @@
+import os
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from time import time
+from typing import NamedTuple, Optional
+
+from tasks.data_calculation_task import DaysSummary
+
+# bump when memoized summaries are no longer valid for the current code
+MEMO_VERSION = 1
+DEFAULT_MAX_ENTRIES = 100000
+# entries are evicted once this many were added by a process
+EVICT_EVERY = 100
+# a hit only refreshes the recency of an entry this much older
+TOUCH_INTERVAL = 60.0
+COUNTERS = ('hits', 'misses', 'stored', 'evicted')
+
+# connections of this process by memo path, workers get memos pickled
+# with every task by some pools and must not reconnect each time
+_connections: dict[str, sqlite3.Connection] = {}
+_connections_pid = os.getpid()
+_connections_lock = threading.Lock()
+
+
+class MemoStats(NamedTuple):
+    hits: int
+    misses: int
+    stored: int
+    evicted: int
+    entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def since(self, before: 'MemoStats') -> 'MemoStats':
+        """Counts added after `before` was taken, entries as they are"""
+        return MemoStats(
+            self.hits - before.hits,
+            self.misses - before.misses,
+            self.stored - before.stored,
+            self.evicted - before.evicted,
+            self.entries,
+        )
+
+
+class AnalysisMemo:
+    """
+    Analyzer results keyed by the analyzer and a digest of the raw
+    forecast, kept in a SQLite file shared by calculation workers, so
+    that a payload already seen by any of them isn't analyzed again.
+    Least recently used entries are evicted beyond about `max_entries`.
+    Hits and misses of all processes are counted in the file too.
+
+    Pickled by path, every process opens the file once.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            max_entries: int = DEFAULT_MAX_ENTRIES
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._pending_misses = 0
+        self._stored = 0
+        with _connections_lock:
+            self._init_schema(self._connect())
+
+    def __getstate__(self):
+        return self.path, self.max_entries
+
+    def __setstate__(self, state):
+        self.path, self.max_entries = state
+        self._pending_misses = 0
+        self._stored = 0
+
+    def get(self, analyzer: str, digest: str) -> Optional[DaysSummary]:
+        with _connections_lock:
+            db = self._connect()
+            row = db.execute(
+                'SELECT summary, used FROM memo'
+                ' WHERE analyzer = ? AND digest = ?',
+                (analyzer, digest)
+            ).fetchone()
+            if row is None:
+                # counted with the next write, which a miss leads to
+                self._pending_misses += 1
+                return None
+
+            summary, used = row
+            now = time()
+            with db:
+                if now - used > TOUCH_INTERVAL:
+                    db.execute(
+                        'UPDATE memo SET used = ?'
+                        ' WHERE analyzer = ? AND digest = ?',
+                        (now, analyzer, digest)
+                    )
+                self._count(db, hits=1)
+
+        return pickle.loads(summary)
+
+    def put(self, analyzer: str, digest: str, summary: DaysSummary):
+        blob = pickle.dumps(summary, pickle.HIGHEST_PROTOCOL)
+        with _connections_lock:
+            db = self._connect()
+            with db:
+                db.execute(
+                    'INSERT OR REPLACE INTO memo (analyzer, digest,'
+                    ' summary, used) VALUES (?, ?, ?, ?)',
+                    (analyzer, digest, blob, time())
+                )
+                self._count(db, stored=1)
+                self._stored += 1
+                if self._stored % EVICT_EVERY == 0:
+                    self._evict(db)
+
+    def flush(self):
+        with _connections_lock:
+            db = self._connect()
+            with db:
+                self._count(db)
+
+    def stats(self) -> MemoStats:
+        with _connections_lock:
+            db = self._connect()
+            counters = dict(db.execute('SELECT name, value FROM counters'))
+            entries = db.execute('SELECT COUNT(*) FROM memo').fetchone()[0]
+        return MemoStats(
+            *(counters.get(name, 0) for name in COUNTERS),
+            entries
+        )
+
+    def _count(self, db: sqlite3.Connection, **counts: int):
+        counts['misses'] = counts.get('misses', 0) + self._pending_misses
+        self._pending_misses = 0
+        db.executemany(
+            'UPDATE counters SET value = value + ? WHERE name = ?',
+            [(value, name) for name, value in counts.items() if value]
+        )
+
+    def _evict(self, db: sqlite3.Connection):
+        evicted = db.execute(
+            'DELETE FROM memo WHERE rowid IN (SELECT rowid FROM memo'
+            ' ORDER BY used LIMIT max((SELECT COUNT(*) FROM memo) - ?, 0))',
+            (self.max_entries,)
+        ).rowcount
+        self._count(db, evicted=evicted)
+
+    def _connect(self) -> sqlite3.Connection:
+        global _connections_pid
+        if _connections_pid != os.getpid():
+            # inherited by a forked worker, SQLite connections can't be
+            # shared across processes
+            _connections.clear()
+            _connections_pid = os.getpid()
+        key = str(self.path)
+        db = _connections.get(key)
+        if db is None:
+            db = sqlite3.connect(
+                self.path,
+                timeout=30,
+                check_same_thread=False
+            )
+            # several workers write at once, losing a memo isn't harmful
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = OFF')
+            _connections[key] = db
+        return db
+
+    @staticmethod
+    def _init_schema(db: sqlite3.Connection):
+        with db:
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version != MEMO_VERSION:
+                db.execute('DROP TABLE IF EXISTS memo')
+                db.execute('DROP TABLE IF EXISTS counters')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS memo ('
+                ' analyzer TEXT NOT NULL,'
+                ' digest TEXT NOT NULL,'
+                ' summary BLOB NOT NULL,'
+                ' used REAL NOT NULL,'
+                ' PRIMARY KEY (analyzer, digest))'
+            )
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS memo_by_use ON memo (used)'
+            )
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                ' name TEXT PRIMARY KEY,'
+                ' value INTEGER NOT NULL)'
+            )
+            db.executemany(
+                'INSERT OR IGNORE INTO counters VALUES (?, 0)',
+                [(name,) for name in COUNTERS]
+            )
+            db.execute(f'PRAGMA user_version = {MEMO_VERSION}')
@@ -0,0 +1,284 @@
+import json
+import math
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from common_algorithms.rank import get_rank_sorted
+from common_algorithms.top_k import top_k
+from external.analyzer import (
+    INPUT_CONDITION_PATH,
+    INPUT_DAY_HOURS_END,
+    INPUT_DAY_HOURS_START,
+    INPUT_DAY_SUITABLE_CONDITIONS,
+    INPUT_FORECAST_PATH,
+    INPUT_HOUR_PATH,
+    INPUT_HOURS_PATH,
+    INPUT_TEMPERATURE_PATH,
+)
+from tasks.data_aggregation_task import Rating, TotalSummary
+
+DAY_HOURS = 24
+# band masks of these temperatures are looked up, others are computed
+TEMP_TABLE_RANGE = range(-100, 101)
+RULE_KEYS = frozenset(('hours', 'conditions', 'temp'))
+
+
+def _is_int(value: Any) -> bool:
+    # JSON true and false are ints to Python
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return _is_int(value) or (
+        isinstance(value, float) and math.isfinite(value)
+    )
+
+
+def _is_pair(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2
+
+
+class RuleSet(NamedTuple):
+    """
+    Which hours of a day count, in `hours_start`..`hours_end`, and how
+    good each of them is: the weight of its condition if its temperature
+    is within `temp_min`..`temp_max`, unknown conditions weigh nothing.
+    Cities are ranked by the weights of their days and their average
+    temperature over the counted hours.
+    """
+    name: str
+    hours_start: int = INPUT_DAY_HOURS_START
+    hours_end: int = INPUT_DAY_HOURS_END
+    condition_weights: tuple[tuple[str, float], ...] = tuple(
+        (condition, 1) for condition in INPUT_DAY_SUITABLE_CONDITIONS
+    )
+    temp_min: Optional[float] = None
+    temp_max: Optional[float] = None
+
+    @classmethod
+    def from_spec(cls, name: str, spec: dict[str, Any]) -> 'RuleSet':
+        """
+        `{"hours": [9, 19], "conditions": {"clear": 1}, "temp": [15,
+        null]}`, every key is optional and defaults to the rules of
+        `external.analyzer`
+        """
+        if not isinstance(spec, dict) or not RULE_KEYS.issuperset(spec):
+            raise ValueError(
+                f'Rule set {name} must be an object with some of the '
+                f'keys: {", ".join(sorted(RULE_KEYS))}'
+            )
+        rule_set = cls(name)
+        if 'hours' in spec:
+            hours = spec['hours']
+            if not (_is_pair(hours) and all(map(_is_int, hours))
+                    and 0 <= hours[0] <= hours[1] < DAY_HOURS):
+                raise ValueError(f'Rule set {name} has invalid hours: {hours}')
+            rule_set = rule_set._replace(
+                hours_start=hours[0],
+                hours_end=hours[1]
+            )
+        if 'conditions' in spec:
+            conditions = spec['conditions']
+            if not (isinstance(conditions, dict) and all(
+                    _is_number(w) and w >= 0 for w in conditions.values()
+            )):
+                raise ValueError(
+                    f'Rule set {name} has invalid condition weights, '
+                    f'they must be non-negative numbers: {conditions}'
+                )
+            rule_set = rule_set._replace(
+                condition_weights=tuple(conditions.items())
+            )
+        if 'temp' in spec:
+            temp = spec['temp']
+            if not (_is_pair(temp)
+                    and all(t is None or _is_number(t) for t in temp)
+                    and (None in temp or temp[0] <= temp[1])):
+                raise ValueError(
+                    f'Rule set {name} has an invalid temperature band: {temp}'
+                )
+            rule_set = rule_set._replace(temp_min=temp[0], temp_max=temp[1])
+        return rule_set
+
+    def in_band(self, temp: float) -> bool:
+        return ((self.temp_min is None or temp >= self.temp_min)
+                and (self.temp_max is None or temp <= self.temp_max))
+
+
+def load_rule_sets(path: Path) -> list[RuleSet]:
+    """Rule sets of a JSON file mapping their names to specs"""
+    with open(path) as file:
+        specs = json.load(file)
+    if not isinstance(specs, dict) or not specs:
+        raise ValueError(f'{path} must map rule set names to specs')
+    return [RuleSet.from_spec(name, spec) for name, spec in specs.items()]
+
+
+class CompiledRules:
+    """
+    Rule sets compiled into lookup tables evaluated together in a single
+    pass over the hours of a forecast: the rule sets counting each hour
+    of the day, the weights of each condition in every rule set and
+    the rule sets each temperature is within the band of.
+    """
+
+    def __init__(self, rule_sets: Iterable[RuleSet]):
+        self.rule_sets = tuple(rule_sets)
+        if not self.rule_sets:
+            raise ValueError('At least one rule set is required')
+        self.names = tuple(rule_set.name for rule_set in self.rule_sets)
+        if len(set(self.names)) != len(self.names):
+            raise ValueError('Rule set names must be unique')
+
+        indices = range(len(self.rule_sets))
+        self._hour_sets = tuple(
+            tuple(
+                i for i in indices
+                if (self.rule_sets[i].hours_start
+                    <= hour
+                    <= self.rule_sets[i].hours_end)
+            )
+            for hour in range(DAY_HOURS)
+        )
+        self._no_weights = (0,) * len(self.rule_sets)
+        conditions = {
+            condition
+            for rule_set in self.rule_sets
+            for condition, _ in rule_set.condition_weights
+        }
+        self._weights = {
+            condition: tuple(
+                dict(rule_set.condition_weights).get(condition, 0)
+                for rule_set in self.rule_sets
+            )
+            for condition in conditions
+        }
+        self._band_masks = {
+            temp: self._band_mask(temp) for temp in TEMP_TABLE_RANGE
+        }
+
+    def __len__(self) -> int:
+        return len(self.rule_sets)
+
+    def evaluate(self, data: Any) -> tuple[Rating, ...]:
+        """
+        Rating of a forecast by every rule set, for the default rules the
+        same as `TotalSummary.rating` after `external.analyzer`
+        """
+        count = len(self.rule_sets)
+        scores = [0] * count
+        temp_sums = [0.0] * count
+        hours_counts = [0] * count
+        hour_sets = self._hour_sets
+        weights = self._weights
+        no_weights = self._no_weights
+        band_masks = self._band_masks
+        days = data[INPUT_FORECAST_PATH]
+        for day in sorted(days, key=lambda day: day['date_ts']):
+            day_temps = [0] * count
+            day_hours = [0] * count
+            for hour_data in day[INPUT_HOURS_PATH]:
+                active = hour_sets[int(hour_data[INPUT_HOUR_PATH])]
+                if not active:
+                    continue
+                temp = int(hour_data[INPUT_TEMPERATURE_PATH])
+                band = band_masks.get(temp)
+                if band is None:
+                    band = self._band_mask(temp)
+                hour_weights = weights.get(
+                    hour_data.get(INPUT_CONDITION_PATH),
+                    no_weights
+                )
+                for i in active:
+                    day_temps[i] += temp
+                    day_hours[i] += 1
+                    if band >> i & 1:
+                        scores[i] += hour_weights[i]
+
+            for i, hours in enumerate(day_hours):
+                if hours:
+                    # aggregated from the rounded day average like the
+                    # analyzer's day summaries are
+                    temp_sums[i] += round(day_temps[i] / hours, 3) * hours
+                    hours_counts[i] += hours
+
+        return tuple(
+            Rating(
+                round(scores[i], 3),
+                round(temp_sums[i] / hours_counts[i], 1)
+                if hours_counts[i] else 0
+            )
+            for i in range(count)
+        )
+
+    def _band_mask(self, temp: float) -> int:
+        mask = 0
+        for i, rule_set in enumerate(self.rule_sets):
+            if rule_set.in_band(temp):
+                mask |= 1 << i
+        return mask
+
+
+class RuleRankedCity(NamedTuple):
+    rank: int
+    city: str
+    score: float
+    temp_avg: float
+
+
+class RuleRanking:
+    """
+    Collects rule set ratings of the cities of a run, which calculation
+    workers evaluate with `rules`, and ranks them by every rule set
+    """
+
+    def __init__(self, rules: CompiledRules):
+        self.rules = rules
+        # only ratings are kept, ranking doesn't need the days
+        self._ratings: list[tuple[str, tuple[Rating, ...]]] = []
+
+    def record(self, totals: Iterable[TotalSummary]) -> Iterator[TotalSummary]:
+        """Passes `totals` through keeping their rule set ratings"""
+        for total in totals:
+            if len(total.rule_ratings) == len(self.rules):
+                self._ratings.append((total.city, total.rule_ratings))
+            yield total
+
+    def rank(
+            self,
+            top: Optional[int] = None
+    ) -> dict[str, list[RuleRankedCity]]:
+        """
+        Cities in descending rating order by each rule set, only the `top`
+        ones and the ones tied with them if given
+        """
+        rankings = {}
+        for i, name in enumerate(self.rules.names):
+            def key(item: tuple[str, tuple[Rating, ...]]) -> Rating:
+                return item[1][i]
+
+            if top is None:
+                ranked = sorted(self._ratings, key=key, reverse=True)
+            else:
+                ranked = top_k(self._ratings, top, key=key)
+            ranks = get_rank_sorted([key(item) for item in ranked])
+            rankings[name] = [
+                RuleRankedCity(rank, city, ratings[i].good_hours,
+                               ratings[i].temp_avg)
+                for rank, (city, ratings) in zip(ranks, ranked)
+            ]
+        return rankings
+
+
+def write_rule_rankings(
+        rating_file: Path,
+        rankings: dict[str, list[RuleRankedCity]]
+):
+    with open(rating_file, 'w') as file:
+        file.write('Rules,Rating,City,Score,Average')
+        for name, cities in rankings.items():
+            for city in cities:
+                file.write(
+                    f'\n{name},{city.rank},{city.city},'
+                    f'{city.score},{city.temp_avg}'
+                )
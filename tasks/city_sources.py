@@ -0,0 +1,170 @@
+import csv
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from tasks.data_fetching_task import CityNameUrlPair
+
+SOURCE_FORMATS = ('json', 'jsonl', 'csv', 'sqlite')
+SOURCE_SUFFIXES = {
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.csv': 'csv',
+    '.db': 'sqlite',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite',
+}
+DEFAULT_TABLE = 'cities'
+# table names are put into the query, parameters can't stand for them
+TABLE_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+# tags of a city in a CSV cell or a SQLite column
+TAGS_SEPARATOR = ';'
+
+
+class CityRecord(NamedTuple):
+    name: str
+    url: str
+    region: Optional[str] = None
+    tags: frozenset[str] = frozenset()
+
+
+class CityFilter(NamedTuple):
+    """Cities of any of `regions` having any of `tags`, empty means all"""
+    regions: frozenset[str] = frozenset()
+    tags: frozenset[str] = frozenset()
+
+    def __bool__(self) -> bool:
+        return bool(self.regions or self.tags)
+
+    def matches(self, city: CityRecord) -> bool:
+        if self.regions and city.region not in self.regions:
+            return False
+        return not self.tags or not self.tags.isdisjoint(city.tags)
+
+
+def _split_tags(tags: Optional[str]) -> frozenset[str]:
+    if not tags:
+        return frozenset()
+    return frozenset(
+        tag.strip() for tag in tags.split(TAGS_SEPARATOR) if tag.strip()
+    )
+
+
+def check_table(table: str) -> str:
+    if not TABLE_NAME.fullmatch(table):
+        raise ValueError(f'Invalid SQLite table name: {table!r}')
+    return table
+
+
+def read_json(path: Path) -> Iterator[CityRecord]:
+    """The `cities.json` mapping of names to URLs, read at once"""
+    with open(path) as file:
+        cities = json.load(file)
+    for name, url in cities.items():
+        yield CityRecord(name, url)
+
+
+def read_jsonl(path: Path) -> Iterator[CityRecord]:
+    """
+    A city per line:
+    {"name": "MOSCOW", "url": "...", "region": "europe", "tags": ["capital"]}
+    """
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            city = json.loads(line)
+            yield CityRecord(
+                city['name'],
+                city['url'],
+                city.get('region'),
+                frozenset(city.get('tags') or ()),
+            )
+
+
+def read_csv(path: Path) -> Iterator[CityRecord]:
+    """`name,url,region,tags` with a header, tags separated by `;`"""
+    with open(path, newline='') as file:
+        for row in csv.DictReader(file):
+            yield CityRecord(
+                row['name'],
+                row['url'],
+                row.get('region') or None,
+                _split_tags(row.get('tags')),
+            )
+
+
+def read_sqlite(
+        path: Path,
+        table: str = DEFAULT_TABLE,
+        city_filter: CityFilter = CityFilter()
+) -> Iterator[CityRecord]:
+    """
+    Rows of `table` with `name`, `url`, `region` and `tags` columns,
+    regions are filtered by the query so that other rows aren't read
+    """
+    query = f'SELECT name, url, region, tags FROM "{check_table(table)}"'
+    params: tuple[str, ...] = ()
+    if city_filter.regions:
+        params = tuple(sorted(city_filter.regions))
+        query += f' WHERE region IN ({", ".join("?" * len(params))})'
+
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        for name, url, region, tags in db.execute(query, params):
+            yield CityRecord(name, url, region, _split_tags(tags))
+    finally:
+        db.close()
+
+
+class CitySource:
+    """
+    Cities of a catalog file read lazily, every iteration reads the file
+    again and yields `(name, url)` pairs of the cities passing the
+    filter, so that a catalog of any size takes constant memory
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            city_filter: CityFilter = CityFilter(),
+            source_format: Optional[str] = None,
+            table: str = DEFAULT_TABLE
+    ):
+        self.path = Path(path)
+        self.city_filter = city_filter
+        self.format = source_format or SOURCE_SUFFIXES.get(
+            self.path.suffix.lower()
+        )
+        if self.format not in SOURCE_FORMATS:
+            raise ValueError(f'Unknown city source format: {self.path}')
+        if self.format == 'json' and city_filter:
+            raise ValueError(
+                'A JSON mapping of cities has no regions or tags to filter'
+            )
+        self.table = check_table(table)
+
+    def records(self) -> Iterator[CityRecord]:
+        cities: Iterable[CityRecord]
+        if self.format == 'json':
+            cities = read_json(self.path)
+        elif self.format == 'jsonl':
+            cities = read_jsonl(self.path)
+        elif self.format == 'csv':
+            cities = read_csv(self.path)
+        else:
+            cities = read_sqlite(self.path, self.table, self.city_filter)
+
+        if not self.city_filter:
+            yield from cities
+            return
+        for city in cities:
+            if self.city_filter.matches(city):
+                yield city
+
+    def __iter__(self) -> Iterator[CityNameUrlPair]:
+        for city in self.records():
+            yield city.name, city.url
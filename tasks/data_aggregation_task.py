@@ -1,10 +1,14 @@
 import logging
 from dataclasses import dataclass
 from functools import reduce
-from typing import NamedTuple, Optional, Protocol, TypeVar, Iterable
+from time import monotonic
+from typing import Any, Callable, NamedTuple, Optional, Protocol, TypeVar
+from typing import Iterable
 
 from common_types.task_types import TaskState, Status
-from tasks.data_calculation_task import CitySummary, DaySummary
+from my_concurrent import tracing
+from tasks.data_calculation_task import CitySummary, DaySummary, PackedDays
+from tasks.data_calculation_task import BodyDecoder, DataCalculationTask
 
 
 logger = logging.getLogger('forecasting')
@@ -15,17 +19,41 @@ class Rating(NamedTuple):
     temp_avg: float
 
 
-@dataclass
+@dataclass(slots=True)
 class TotalSummary:
-    city_summary: CitySummary
-    temp_sum: float
-    shiny_hours: int
-    analyzing_hours: int
-    analyzing_days: int
+    city: str
+    # kept packed, all cities stay in memory until they are ranked
+    days: PackedDays
+    temp_sum: float = 0
+    shiny_hours: int = 0
+    analyzing_hours: int = 0
+    analyzing_days: int = 0
+    # ratings by the rule sets the run was asked to evaluate
+    rule_ratings: tuple[Rating, ...] = ()
+
+    def __reduce__(self):
+        # sent back by calculation workers, a tuple pickles compactly
+        return TotalSummary, (
+            self.city,
+            self.days,
+            self.temp_sum,
+            self.shiny_hours,
+            self.analyzing_hours,
+            self.analyzing_days,
+            self.rule_ratings,
+        )
+
+    @classmethod
+    def from_city_summary(cls, city_summary: CitySummary) -> 'TotalSummary':
+        return cls(
+            city_summary.city,
+            PackedDays.pack(city_summary.days_summary['days'])
+        )
 
     @property
-    def city(self):
-        return self.city_summary.city
+    def city_summary(self) -> CitySummary:
+        """Unpacked copy of the summary the city was aggregated from"""
+        return CitySummary(self.city, {'days': self.days.unpack()})
 
     @property
     def temp_avg(self) -> float:
@@ -46,13 +74,25 @@ class TotalSummary:
 TData = TypeVar('TData')
 
 
+class IncorrectSummaryError(ValueError):
+    pass
+
+
+class RuleEvaluator(Protocol):
+    def evaluate(self, data: Any) -> tuple[Rating, ...]:
+        ...
+
+
 class TaskReader(Protocol[TData]):
     def read_tasks(self) -> Iterable[TaskState[TData]]:
         ...
 
 
 class DataAggregationTask:
-    def __init__(self, task_reader: TaskReader[CitySummary]):
+    def __init__(
+            self,
+            task_reader: TaskReader[CitySummary | TotalSummary]
+    ):
         self._task_reader = task_reader
 
     def aggregate_tasks(self) -> Iterable[TotalSummary]:
@@ -64,7 +104,14 @@ class DataAggregationTask:
             if task.data is None:
                 continue
 
+            if isinstance(task.data, TotalSummary):
+                # aggregated by a worker or stored for an unchanged city
+                yield task.data
+                continue
+
+            started = monotonic()
             ts = self.aggregate_city_summary(task.data)
+            tracing.record('aggregate', task.data, started, monotonic())
             if ts is None:
                 continue
 
@@ -73,30 +120,44 @@ class DataAggregationTask:
     def _on_error(self, message: Optional[str]):
         logger.warning(f'Trying get city summary failed: "{message}"')
 
+    @staticmethod
     def aggregate_city_summary(
-            self,
             city_summary: CitySummary
     ) -> Optional[TotalSummary]:
         try:
-            days_summary = city_summary.days_summary
-            fulfilled_days = filter(self._filter_day, days_summary['days'])
-        except KeyError:
+            return DataAggregationTask.total_summary(city_summary)
+        except IncorrectSummaryError:
             logger.error('Incorrect city summary format')
             return None
+
+    @staticmethod
+    def total_summary(city_summary: CitySummary) -> TotalSummary:
+        try:
+            days_summary = city_summary.days_summary
+            fulfilled_days = filter(
+                DataAggregationTask._filter_day,
+                days_summary['days']
+            )
+            total_summary = TotalSummary.from_city_summary(city_summary)
+        except (KeyError, TypeError, OverflowError) as e:
+            raise IncorrectSummaryError(
+                'Incorrect city summary format'
+            ) from e
         else:
             return reduce(
-                self._aggregate_day,
+                DataAggregationTask._aggregate_day,
                 fulfilled_days,
-                TotalSummary(city_summary, 0, 0, 0, 0)
+                total_summary
             )
 
-    def _filter_day(self, day_data: DaySummary):
+    @staticmethod
+    def _filter_day(day_data: DaySummary):
         return (day_data['hours_count'] != 0
                 and day_data['temp_avg'] is not None
                 and 'relevant_cond_hours' in day_data)
 
+    @staticmethod
     def _aggregate_day(
-            self,
             total_summary: TotalSummary,
             day_data: DaySummary
     ) -> TotalSummary:
@@ -107,3 +168,70 @@ class DataAggregationTask:
         total_summary.analyzing_days += 1
 
         return total_summary
+
+
+def aggregate_calculated(
+        calculate: Callable[[TData], CitySummary],
+        data: TData,
+        rules: Optional[RuleEvaluator] = None,
+        decoder: Optional[BodyDecoder] = None
+) -> TotalSummary:
+    """
+    `calculate` and aggregation of its city summary in one calculation
+    worker step, so that packed totals rather than city summaries cross
+    the process boundary and the parent only passes them through.
+    The forecast is rated by `rules` as well when given, decoded by
+    `decoder` then.
+    """
+    if rules is None:
+        return DataAggregationTask.total_summary(calculate(data))
+
+    # read once for the analyzer and the rules
+    raw_city_data = DataCalculationTask.load(data, decoder)
+    total_summary = DataAggregationTask.total_summary(
+        calculate(raw_city_data)
+    )
+    total_summary.rule_ratings = rules.evaluate(raw_city_data.data)
+    return total_summary
+
+
+def aggregate_calculated_batch(
+        calculate_batch: Callable[
+            [list[TData]],
+            list[CitySummary | Exception]
+        ],
+        items: list[TData],
+        rules: Optional[RuleEvaluator] = None,
+        decoder: Optional[BodyDecoder] = None
+) -> list[TotalSummary | Exception]:
+    loaded: list[Any] = items
+    if rules is not None:
+        loaded = [_load_or_error(item, decoder) for item in items]
+    city_summaries = iter(calculate_batch([
+        item for item in loaded if not isinstance(item, Exception)
+    ]))
+
+    results: list[TotalSummary | Exception] = []
+    for item in loaded:
+        city_summary = (
+            item if isinstance(item, Exception) else next(city_summaries)
+        )
+        if isinstance(city_summary, Exception):
+            results.append(city_summary)
+            continue
+        try:
+            total_summary = DataAggregationTask.total_summary(city_summary)
+            if rules is not None:
+                total_summary.rule_ratings = rules.evaluate(item.data)
+        except Exception as e:
+            results.append(e)
+        else:
+            results.append(total_summary)
+    return results
+
+
+def _load_or_error(item: Any, decoder: Optional[BodyDecoder]) -> Any:
+    try:
+        return DataCalculationTask.load(item, decoder)
+    except Exception as e:
+        return e
@@ -1,10 +1,12 @@
 import logging
 from pathlib import Path
-from typing import Iterable, Any
+from typing import Iterable, Callable, Optional
 
-from common_algorithms.rank import get_rank
+from common_algorithms.rank import get_rank_sorted
+from common_algorithms.top_k import top_k
+from my_concurrent import tracing
 from tasks.data_aggregation_task import TotalSummary, Rating
-from tasks.data_calculation_task import DaysSummary
+from tasks.rating_writer import write_ratings
 
 logger = logging.getLogger('forecasting')
 
@@ -12,7 +14,8 @@ logger = logging.getLogger('forecasting')
 class DataAnalyzingTask:
     @staticmethod
     def find_best_city(
-            cities_data: Iterable[TotalSummary]
+            cities_data: Iterable[TotalSummary],
+            on_update: Optional[Callable[[list[TotalSummary]], None]] = None
     ) -> list[TotalSummary]:
         max_rating = Rating(0, -271)
         best = []
@@ -23,90 +26,58 @@ class DataAnalyzingTask:
                 best = [cd]
             elif max_rating == cd_rating:
                 best.append(cd)
+            else:
+                continue
+
+            if on_update is not None:
+                on_update(best)
 
         return best
 
+    @staticmethod
+    def rank_cities(
+            cities_data: Iterable[TotalSummary],
+            top: Optional[int] = None
+    ) -> tuple[list[TotalSummary], tuple[int, ...]]:
+        """
+        Cities in descending rating order with their ranks, only the `top`
+        ones and the ones tied with them if given
+        """
+        with tracing.span('rank'):
+            if top is None:
+                sorted_cities = sorted(
+                    cities_data,
+                    key=lambda cd: cd.rating,
+                    reverse=True
+                )
+            else:
+                sorted_cities = top_k(
+                    cities_data,
+                    top,
+                    key=lambda cd: cd.rating
+                )
+            ranks = get_rank_sorted([c.rating for c in sorted_cities])
+
+        return sorted_cities, ranks
+
     @staticmethod
     def calculate_ratings(
             cities_data: Iterable[TotalSummary],
-            rating_file: Path
+            rating_file: Path,
+            top: Optional[int] = None,
+            rating_format: str = 'csv'
     ):
-        cities_data = list(cities_data)
-        sorted_cities = sorted(
+        sorted_cities, ranks = DataAnalyzingTask.rank_cities(
             cities_data,
-            key=lambda cd: cd.rating,
-            reverse=True
+            top
         )
-        header, dates = DataAnalyzingTask._make_header(sorted_cities)
-        rows = [header]
-        ratings = [c.rating for c in sorted_cities]
 
-        for city, rank in zip(sorted_cities, get_rank(ratings)):
-            row_one: list[Any] = [city.city_summary.city, 'temperature']
-            row_one.extend(DataAnalyzingTask._extract_day_measurement(
-                city.city_summary.days_summary,
-                dates,
-                'temp_avg'
-            ))
-            row_one.append(city.temp_avg)
-            row_one.append(rank)
-            row_two: list[Any] = ['', 'shiny hours']
-            row_two.extend(DataAnalyzingTask._extract_day_measurement(
-                city.city_summary.days_summary,
-                dates,
-                'relevant_cond_hours'
-            ))
-            row_two.append(city.shiny_hours_avg)
-            row_two.append('')
-            rows.append(row_one)
-            rows.append(row_two)
-
-        rating_file.write_text('\n'.join(
-            ','.join(map(str, row))
-            for row in rows
-        ))
+        with tracing.span('write_ratings'):
+            write_ratings(rating_file, sorted_cities, ranks, rating_format)
 
         logger.info(f'Rating saved in {rating_file}')
 
-        return DataAnalyzingTask.find_best_city(cities_data)
-
-    @staticmethod
-    def _make_header(
-            cities_data: list[TotalSummary]
-    ) -> tuple[list[str], list[str]]:
-        header = ['City', 'Measurement/days']
-        all_dates = {
-            d['date']
-            for ts in cities_data
-            for d in ts.city_summary.days_summary['days']
-        }
-        dates = sorted(all_dates)
-        header.extend(dates)
-        header.extend(['Average', 'Rating'])
-
-        return header, dates
-
-    @staticmethod
-    def _extract_day_measurement(
-            days_summary: DaysSummary,
-            dates: list[str],
-            key: str
-    ) -> list[int | float | str]:
-
-        result = []
-
-        for date in dates:
-            for day in days_summary['days']:
-                if day['date'] == date:
-                    if key == 'temp_avg':
-                        m = day['temp_avg']
-                    elif key == 'relevant_cond_hours':
-                        m = day['relevant_cond_hours']
-                    else:
-                        m = None
-                    result.append(m if m is not None else '')
-                    break
-            else:
-                result.append('')
-
-        return result
+        # ties keep their input order, so these are the first best cities
+        return DataAnalyzingTask.find_best_city(
+            sorted_cities[:ranks.count(1)]
+        )
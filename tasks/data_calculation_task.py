@@ -1,7 +1,35 @@
-from typing import TypedDict, NamedTuple
+import math
+import sys
+from array import array
+from typing import TypedDict, NamedTuple, Any, Iterable, Optional, Protocol
+from typing import Callable
 
 from external.analyzer import analyze_json
-from tasks.data_fetching_task import CityRawData
+from external.client import YandexWeatherAPI
+from tasks.data_fetching_task import CityRawData, CityRawPayload
+
+
+def analyze_json_columnar(data: Any) -> Any:
+    # numpy is only imported by workers actually using it
+    from external.columnar_analyzer import analyze_json_columnar
+    return analyze_json_columnar(data)
+
+
+def analyze_json_batch(batch: Iterable) -> list:
+    from external.columnar_analyzer import analyze_json_batch
+    return analyze_json_batch(batch)
+
+
+# decodes the response bodies of shared memory payloads
+BodyDecoder = Callable[[bytes | memoryview], Any]
+
+ANALYZERS = {
+    'default': analyze_json,
+    'columnar': analyze_json_columnar,
+}
+BATCH_ANALYZERS = {
+    'columnar': analyze_json_batch,
+}
 
 
 class DaySummary(TypedDict):
@@ -22,13 +50,243 @@ class CitySummary(NamedTuple):
     days_summary: DaysSummary
 
 
+PACKED_HOURS_KEYS = (
+    'hours_start',
+    'hours_end',
+    'hours_count',
+    'relevant_cond_hours',
+)
+# stands for None in the packed hours
+NO_HOURS = 0xFFFF
+
+
+class PackedDays(NamedTuple):
+    """
+    Day summaries of a city packed into arrays, `hours` holds
+    `PACKED_HOURS_KEYS` of every day in a row and `temps` average
+    temperatures, NaN for None. Takes a fraction of a dict per day.
+    """
+    dates: tuple[str, ...]
+    hours: array
+    temps: array
+
+    @classmethod
+    def pack(cls, days: Iterable[DaySummary]) -> 'PackedDays':
+        dates = []
+        hours = array('H')
+        temps = array('f')
+        for day in days:
+            # every city shares the same few dates
+            dates.append(sys.intern(day['date']))
+            for key in PACKED_HOURS_KEYS:
+                value = day.get(key)
+                hours.append(NO_HOURS if value is None else value)
+            temp = day['temp_avg']
+            temps.append(math.nan if temp is None else temp)
+
+        return cls(tuple(dates), hours, temps)
+
+    def unpack(self) -> list[DaySummary]:
+        days = []
+        width = len(PACKED_HOURS_KEYS)
+        for i, date in enumerate(self.dates):
+            start, end, count, cond_hours = (
+                None if value == NO_HOURS else value
+                for value in self.hours[i * width:(i + 1) * width]
+            )
+            temp = self.temps[i]
+            days.append(DaySummary(
+                date=date,
+                hours_start=start,
+                hours_end=end,
+                hours_count=count,
+                # analyzers round to 3 digits, which single precision keeps
+                temp_avg=None if math.isnan(temp) else round(temp, 3),
+                relevant_cond_hours=cond_hours,
+            ))
+
+        return days
+
+    def __reduce__(self):
+        # raw array bytes pickle smaller and faster than arrays do
+        return _unpickle_packed_days, (
+            self.dates,
+            self.hours.tobytes(),
+            self.temps.tobytes(),
+        )
+
+
+def _unpickle_packed_days(
+        dates: tuple[str, ...],
+        hours: bytes,
+        temps: bytes
+) -> PackedDays:
+    hours_array = array('H')
+    hours_array.frombytes(hours)
+    temps_array = array('f')
+    temps_array.frombytes(temps)
+    # packed days of all cities stay in memory, so dates are shared
+    return PackedDays(
+        tuple(map(sys.intern, dates)),
+        hours_array,
+        temps_array
+    )
+
+
+class SummaryMemo(Protocol):
+    def get(self, analyzer: str, digest: str) -> Optional[DaysSummary]:
+        ...
+
+    def put(self, analyzer: str, digest: str, summary: DaysSummary):
+        ...
+
+
 class DataCalculationTask:
     @staticmethod
-    def calculate_summary_by_days(raw_city_data: CityRawData) -> CitySummary:
-        city = raw_city_data.city
-        days_summary = analyze_json(raw_city_data.data)
+    def calculate_summary_by_days(
+            raw_city_data: CityRawData | CityRawPayload,
+            analyzer: str = 'default',
+            memo: Optional[SummaryMemo] = None,
+            decoder: Optional[BodyDecoder] = None
+    ) -> CitySummary:
+        days_summary = DataCalculationTask._recall(
+            raw_city_data,
+            analyzer,
+            memo
+        )
+        if days_summary is None:
+            data = DataCalculationTask._load_data(raw_city_data, decoder)
+            days_summary = ANALYZERS[analyzer](data)
+            DataCalculationTask._remember(
+                raw_city_data,
+                analyzer,
+                memo,
+                days_summary
+            )
 
         return CitySummary(
-            city=city,
+            city=raw_city_data.city,
             days_summary=days_summary,
         )
+
+    @staticmethod
+    def calculate_summaries_batch(
+            raw_cities_data: list[CityRawData | CityRawPayload],
+            analyzer: str = 'default',
+            memo: Optional[SummaryMemo] = None,
+            decoder: Optional[BodyDecoder] = None
+    ) -> list[CitySummary | Exception]:
+        summaries: dict[int, Any] = {}
+        loaded: list[tuple[int, Any]] = []
+        # payloads are gone once read, so failures only fail their city
+        # rather than the batch, which workers would retry city by city
+        for i, raw_city_data in enumerate(raw_cities_data):
+            try:
+                summaries[i] = DataCalculationTask._recall(
+                    raw_city_data,
+                    analyzer,
+                    memo
+                )
+                if summaries[i] is None:
+                    loaded.append((i, DataCalculationTask._load_data(
+                        raw_city_data,
+                        decoder
+                    )))
+            except Exception as e:
+                summaries[i] = e
+
+        days_summaries = DataCalculationTask._analyze_batch(
+            [data for _, data in loaded],
+            analyzer
+        )
+        for (i, _), days_summary in zip(loaded, days_summaries):
+            if not isinstance(days_summary, Exception):
+                try:
+                    DataCalculationTask._remember(
+                        raw_cities_data[i],
+                        analyzer,
+                        memo,
+                        days_summary
+                    )
+                except Exception as e:
+                    days_summary = e
+            summaries[i] = days_summary
+
+        return [
+            summaries[i] if isinstance(summaries[i], Exception)
+            else CitySummary(
+                city=raw_city_data.city,
+                days_summary=summaries[i],
+            )
+            for i, raw_city_data in enumerate(raw_cities_data)
+        ]
+
+    @staticmethod
+    def _recall(
+            raw_city_data: CityRawData | CityRawPayload,
+            analyzer: str,
+            memo: Optional[SummaryMemo]
+    ) -> Optional[DaysSummary]:
+        if memo is None or raw_city_data.digest is None:
+            return None
+        days_summary = memo.get(analyzer, raw_city_data.digest)
+        if (days_summary is not None
+                and isinstance(raw_city_data, CityRawPayload)):
+            # the payload is never read, but its segment must be freed
+            raw_city_data.payload.discard()
+        return days_summary
+
+    @staticmethod
+    def _remember(
+            raw_city_data: CityRawData | CityRawPayload,
+            analyzer: str,
+            memo: Optional[SummaryMemo],
+            days_summary: DaysSummary
+    ):
+        if memo is not None and raw_city_data.digest is not None:
+            memo.put(analyzer, raw_city_data.digest, days_summary)
+
+    @staticmethod
+    def _analyze_batch(batch: list[Any], analyzer: str) -> list[Any]:
+        if analyzer in BATCH_ANALYZERS:
+            try:
+                return BATCH_ANALYZERS[analyzer](batch)
+            except Exception:
+                pass
+
+        results = []
+        for data in batch:
+            try:
+                results.append(ANALYZERS[analyzer](data))
+            except Exception as e:
+                results.append(e)
+
+        return results
+
+    @staticmethod
+    def load(
+            raw_city_data: CityRawData | CityRawPayload,
+            decoder: Optional[BodyDecoder] = None
+    ) -> CityRawData:
+        """`raw_city_data` with its forecast read out of shared memory"""
+        if isinstance(raw_city_data, CityRawPayload):
+            return CityRawData(
+                raw_city_data.city,
+                DataCalculationTask._load_data(raw_city_data, decoder),
+                raw_city_data.digest,
+            )
+        return raw_city_data
+
+    @staticmethod
+    def _load_data(
+            raw_city_data: CityRawData | CityRawPayload,
+            decoder: Optional[BodyDecoder] = None
+    ) -> Any:
+        if isinstance(raw_city_data, CityRawPayload):
+            # the client's decoder is only configured in this process
+            # and in forked workers, others have to be given it
+            decoder = decoder or YandexWeatherAPI.decoder
+            with raw_city_data.payload.open() as buffer:
+                return decoder(buffer)
+
+        return raw_city_data.data
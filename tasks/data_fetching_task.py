@@ -1,6 +1,10 @@
-from typing import TypeAlias, NamedTuple, Iterable
+import hashlib
+from typing import TypeAlias, NamedTuple, Iterable, Optional, Protocol, Any
 
-from external.client import YandexWeatherAPI
+from external.async_client import AsyncYandexWeatherAPI
+from external.cache import ResponseCache
+from external.client import YandexWeatherAPI, Response
+from my_concurrent.shared_payload import SharedPayload
 
 
 CityName: TypeAlias = str
@@ -8,22 +12,127 @@ CityUrl: TypeAlias = str
 CityNameUrlPair: TypeAlias = tuple[CityName, CityUrl]
 
 
+TRANSPORTS = ('pickle', 'shm')
+
+
 class CityRawData(NamedTuple):
     city: CityName
     data: dict
+    # digest of the response body, set when results are stored or
+    # analyzer results are memoized
+    digest: Optional[str] = None
+
+
+class CityRawPayload(NamedTuple):
+    city: CityName
+    payload: SharedPayload
+    digest: Optional[str] = None
+
+
+class ResultLookup(Protocol):
+    def get(self, city: CityName, digest: str) -> Optional[Any]:
+        ...
 
 
 class DataFetchingTask:
-    def __init__(self, sources: Iterable[CityNameUrlPair]):
+    def __init__(
+            self,
+            sources: Iterable[CityNameUrlPair],
+            cache: Optional[ResponseCache] = None,
+            transport: str = 'pickle',
+            results: Optional[ResultLookup] = None,
+            digests: bool = False,
+    ):
+        if transport not in TRANSPORTS:
+            raise ValueError(f'Unknown transport: {transport}')
+
         self._sources = sources
+        self._cache = cache
+        self._transport = transport
+        self._results = results
+        self._digests = digests or results is not None
 
     def get_sources(self) -> Iterable[CityNameUrlPair]:
         return self._sources
 
-    def fetch_source(self, city_source: CityNameUrlPair) -> CityRawData:
+    def fetch_source(
+            self,
+            city_source: CityNameUrlPair
+    ) -> CityRawData | CityRawPayload | Any:
+        city_name, city_url = city_source
+
+        return self._make_raw_data(
+            city_name,
+            self._fetch_response(city_url)
+        )
+
+    async def fetch_source_async(
+            self,
+            city_source: CityNameUrlPair
+    ) -> CityRawData | CityRawPayload | Any:
         city_name, city_url = city_source
 
+        return self._make_raw_data(
+            city_name,
+            await self._fetch_response_async(city_url)
+        )
+
+    def _make_raw_data(
+            self,
+            city_name: CityName,
+            response: Response
+    ) -> CityRawData | CityRawPayload | Any:
+        digest = None
+        if self._digests:
+            digest = hashlib.sha256(
+                YandexWeatherAPI.get_body(response)
+            ).hexdigest()
+        if self._results is not None and digest is not None:
+            # an unchanged forecast isn't even parsed
+            stored = self._results.get(city_name, digest)
+            if stored is not None:
+                return stored
+
+        if self._transport == 'shm':
+            # parsing is left to the worker reading the segment
+            return CityRawPayload(
+                city=city_name,
+                payload=SharedPayload.create(
+                    YandexWeatherAPI.get_body(response)
+                ),
+                digest=digest,
+            )
+
         return CityRawData(
             city=city_name,
-            data=YandexWeatherAPI.get_forecasting(city_url),
+            data=YandexWeatherAPI.parse_response(response),
+            digest=digest,
+        )
+
+    def _fetch_response(self, url: CityUrl) -> Response:
+        if self._cache is None:
+            return YandexWeatherAPI.get_response(url)
+
+        cached = self._cache.get_fresh(url)
+        if cached is not None:
+            return cached
+
+        response = YandexWeatherAPI.get_response(
+            url,
+            self._cache.validators(url)
+        )
+        return self._cache.resolve(url, response)
+
+    async def _fetch_response_async(self, url: CityUrl) -> Response:
+        if self._cache is None:
+            return await AsyncYandexWeatherAPI.get_response(url)
+
+        cached = self._cache.get_fresh(url)
+        if cached is not None:
+            return cached
+
+        response = await AsyncYandexWeatherAPI.get_response(
+            url,
+            self._cache.validators(url)
         )
+        return self._cache.resolve(url, response)
@@ -0,0 +1,254 @@
+import sqlite3
+from pathlib import Path
+from time import time
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from tasks.data_aggregation_task import DataAggregationTask, TotalSummary
+from tasks.data_calculation_task import CitySummary, DaySummary
+
+# bump when the schema changes, older history is dropped
+HISTORY_VERSION = 1
+INSERT_BATCH = 10000
+
+DAY_COLUMNS = (
+    'date',
+    'hours_start',
+    'hours_end',
+    'hours_count',
+    'temp_avg',
+    'relevant_cond_hours',
+)
+# the days aggregation counts, see `DataAggregationTask._filter_day`
+ANALYZED_DAY = (
+    'hours_count > 0'
+    ' AND temp_avg IS NOT NULL'
+    ' AND relevant_cond_hours IS NOT NULL'
+)
+# the last runs a city was fetched in, LIMIT -1 is no limit
+CITY_RUNS = (
+    'SELECT DISTINCT run FROM days WHERE city = ?'
+    ' ORDER BY run DESC LIMIT ?'
+)
+# days of the runs between two ids, of every date the latest forecast
+WINDOW_DAYS = (
+    f'SELECT city, {", ".join(DAY_COLUMNS)} FROM days'
+    ' JOIN (SELECT city, date, MAX(run) AS run FROM days'
+    '  WHERE run BETWEEN ? AND ? GROUP BY city, date)'
+    ' USING (city, date, run)'
+    ' ORDER BY city, date, run, pos'
+)
+
+
+class CityHistory(NamedTuple):
+    city: str
+    fetches: int
+    days: int
+    # averages over the analyzed days, as `TotalSummary` has them
+    temp_avg: Optional[float]
+    shiny_hours_avg: Optional[float]
+
+
+class FetchStats(NamedTuple):
+    run: int
+    fetched_at: float
+    temp_avg: Optional[float]
+    shiny_hours_avg: Optional[float]
+
+
+class HistoryStore:
+    """
+    Append-only SQLite history of per day city summaries of every run,
+    keyed by city, forecast date and fetch time. Answers trend queries
+    and rebuilds `TotalSummary` of any window of runs to be ranked
+    without analyzing the forecasts again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._db = sqlite3.connect(self.path)
+        self._init_schema()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+    def start_run(self, fetched_at: Optional[float] = None) -> int:
+        cursor = self._db.execute(
+            'INSERT INTO runs (fetched_at) VALUES (?)',
+            (time() if fetched_at is None else fetched_at,)
+        )
+        self._db.commit()
+        return cursor.lastrowid
+
+    def record(
+            self,
+            totals: Iterable[TotalSummary],
+            fetched_at: Optional[float] = None
+    ) -> Iterator[TotalSummary]:
+        """Passes cities through storing their days as a new run"""
+        run = self.start_run(fetched_at)
+        rows: list[tuple] = []
+        for total in totals:
+            for pos, day in enumerate(total.days.unpack()):
+                rows.append((
+                    run,
+                    total.city,
+                    pos,
+                    *(day[column] for column in DAY_COLUMNS),
+                ))
+            if len(rows) >= INSERT_BATCH:
+                self._insert(rows)
+            yield total
+
+        self._insert(rows)
+        self._db.commit()
+
+    def runs(self) -> list[tuple[int, float]]:
+        return self._db.execute(
+            'SELECT id, fetched_at FROM runs ORDER BY id'
+        ).fetchall()
+
+    def city_history(
+            self,
+            city: str,
+            last_fetches: Optional[int] = None
+    ) -> Optional[CityHistory]:
+        """Averages of a city over its last fetches, all by default"""
+        fetches, days, temp_avg, shiny_hours_avg = self._db.execute(
+            'SELECT COUNT(DISTINCT run), COUNT(*),'
+            ' SUM(temp_avg * hours_count) / SUM(hours_count),'
+            ' AVG(relevant_cond_hours)'
+            f' FROM days WHERE city = ? AND {ANALYZED_DAY}'
+            f' AND run IN ({CITY_RUNS})',
+            (city, city, -1 if last_fetches is None else last_fetches)
+        ).fetchone()
+        if not fetches:
+            return None
+        return CityHistory(
+            city,
+            fetches,
+            days,
+            round(temp_avg, 1),
+            round(shiny_hours_avg, 1),
+        )
+
+    def city_trend(
+            self,
+            city: str,
+            last_fetches: Optional[int] = None
+    ) -> list[FetchStats]:
+        """Averages of a city per fetch, oldest first"""
+        rows = self._db.execute(
+            'SELECT run, fetched_at,'
+            ' SUM(temp_avg * hours_count) / SUM(hours_count),'
+            ' AVG(relevant_cond_hours)'
+            ' FROM days JOIN runs ON runs.id = days.run'
+            f' WHERE city = ? AND {ANALYZED_DAY} AND run IN ({CITY_RUNS})'
+            ' GROUP BY run ORDER BY run',
+            (city, city, -1 if last_fetches is None else last_fetches)
+        )
+        return [
+            FetchStats(run, fetched_at, round(temp, 1), round(hours, 1))
+            for run, fetched_at, temp, hours in rows
+        ]
+
+    def window_totals(
+            self,
+            last_runs: Optional[int] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None
+    ) -> Iterator[TotalSummary]:
+        """
+        Cities aggregated over a window of runs, the last ones or the
+        ones fetched in [since, until]. The latest forecast of every
+        date in the window is used, so ranking a single run gives the
+        ranking of that run.
+        """
+        first, last = self._window(last_runs, since, until)
+        rows = self._db.execute(WINDOW_DAYS, (first, last))
+        city: Optional[str] = None
+        days: list[DaySummary] = []
+        for row in rows:
+            if row[0] != city:
+                if city is not None:
+                    yield from self._aggregate(city, days)
+                city, days = row[0], []
+            days.append(DaySummary(**dict(zip(DAY_COLUMNS, row[1:]))))
+        if city is not None:
+            yield from self._aggregate(city, days)
+
+    @staticmethod
+    def _aggregate(
+            city: str,
+            days: list[DaySummary]
+    ) -> Iterator[TotalSummary]:
+        total = DataAggregationTask.aggregate_city_summary(
+            CitySummary(city, {'days': days})
+        )
+        if total is not None:
+            yield total
+
+    def _window(
+            self,
+            last_runs: Optional[int],
+            since: Optional[float],
+            until: Optional[float]
+    ) -> tuple[int, int]:
+        query = 'SELECT MIN(id), MAX(id) FROM runs WHERE fetched_at >= ?' \
+                ' AND fetched_at <= ?'
+        params: tuple = (
+            -1.0 if since is None else since,
+            float('inf') if until is None else until,
+        )
+        if last_runs is not None:
+            query = 'SELECT MIN(id), MAX(id) FROM (SELECT id FROM runs' \
+                    ' ORDER BY id DESC LIMIT ?)'
+            params = (last_runs,)
+        first, last = self._db.execute(query, params).fetchone()
+        # an empty window
+        return (first, last) if first is not None else (0, -1)
+
+    def _insert(self, rows: list[tuple]):
+        self._db.executemany(
+            'INSERT INTO days (run, city, pos,'
+            f' {", ".join(DAY_COLUMNS)}) VALUES ({", ".join("?" * 9)})',
+            rows
+        )
+        rows.clear()
+
+    def _init_schema(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version != HISTORY_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS days')
+            self._db.execute('DROP TABLE IF EXISTS runs')
+        # readers may query the history while a run writes to it
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS runs ('
+            ' id INTEGER PRIMARY KEY,'
+            ' fetched_at REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS days ('
+            ' run INTEGER NOT NULL REFERENCES runs (id),'
+            ' city TEXT NOT NULL,'
+            ' pos INTEGER NOT NULL,'
+            ' date TEXT NOT NULL,'
+            ' hours_start INTEGER,'
+            ' hours_end INTEGER,'
+            ' hours_count INTEGER,'
+            ' temp_avg REAL,'
+            ' relevant_cond_hours INTEGER)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS days_by_city ON days (city, run)'
+        )
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS days_by_date ON days (date)'
+        )
+        # windows are ranges of runs
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS days_by_run ON days (run, city, date)'
+        )
+        self._db.execute(f'PRAGMA user_version = {HISTORY_VERSION}')
+        self._db.commit()
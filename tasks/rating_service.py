@@ -0,0 +1,193 @@
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import takewhile
+from socketserver import ThreadingMixIn, UnixStreamServer
+from time import time
+from typing import Any, Iterable, NamedTuple, Optional, Union
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from common_algorithms.rank import get_rank_sorted
+from tasks.data_aggregation_task import Rating, TotalSummary
+
+logger = logging.getLogger('forecasting')
+
+DEFAULT_TOP = 10
+# a TCP (host, port) pair or a Unix socket path
+Endpoint = Union[tuple[str, int], str]
+
+
+class RatedCity(NamedTuple):
+    rank: int
+    city: str
+    shiny_hours: int
+    temp_avg: float
+    fetched_at: float
+
+
+class RatingSnapshot(NamedTuple):
+    """Ranking of every city known at `updated_at`, never modified"""
+    cities: tuple[RatedCity, ...]
+    by_city: dict[str, RatedCity]
+    updated_at: Optional[float]
+    oldest_fetched_at: Optional[float]
+
+    def ages(self, now: float) -> dict[str, Optional[float]]:
+        return {
+            'age': _age(now, self.updated_at),
+            'oldest_age': _age(now, self.oldest_fetched_at),
+        }
+
+
+EMPTY_SNAPSHOT = RatingSnapshot((), {}, None, None)
+
+
+def _age(now: float, moment: Optional[float]) -> Optional[float]:
+    return None if moment is None else round(now - moment, 3)
+
+
+class RatingBoard:
+    """
+    Latest rating of every city. Each update ranks them again and swaps
+    in a new snapshot, which readers take without locks. Cities missing
+    from an update keep their previous rating.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # only ratings are kept, ranking doesn't need the days
+        self._ratings: dict[str, tuple[Rating, float]] = {}
+        self._snapshot = EMPTY_SNAPSHOT
+
+    @property
+    def snapshot(self) -> RatingSnapshot:
+        return self._snapshot
+
+    def update(
+            self,
+            totals: Iterable[TotalSummary],
+            fetched_at: Optional[float] = None
+    ) -> RatingSnapshot:
+        fetched_at = time() if fetched_at is None else fetched_at
+        with self._lock:
+            for total in totals:
+                self._ratings[total.city] = (total.rating, fetched_at)
+            # the order of `DataAnalyzingTask.rank_cities`
+            ranked = sorted(
+                self._ratings.items(),
+                key=lambda item: item[1][0],
+                reverse=True
+            )
+            ranks = get_rank_sorted([rating for _, (rating, _) in ranked])
+            cities = tuple(
+                RatedCity(rank, city, rating.good_hours, rating.temp_avg, at)
+                for rank, (city, (rating, at)) in zip(ranks, ranked)
+            )
+            self._snapshot = RatingSnapshot(
+                cities,
+                {city.city: city for city in cities},
+                time(),
+                min((city.fetched_at for city in cities), default=None),
+            )
+            return self._snapshot
+
+
+class RatingRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /best, /rating?top=N, /city/<name> and /health as JSON, each
+    with the age of the ranking and of its stalest city in seconds
+    """
+    protocol_version = 'HTTP/1.1'
+    # headers and body leave in a single send flushed after the request,
+    # separate small writes stall on delayed ACKs of kept alive sockets
+    wbufsize = -1
+    server: Any
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        snapshot = self.server.board.snapshot
+        body: dict[str, Any] = snapshot.ages(time())
+        if url.path == '/best':
+            body['cities'] = [
+                self._city(city) for city in takewhile(
+                    lambda city: city.rank == 1,
+                    snapshot.cities
+                )
+            ]
+        elif url.path == '/rating':
+            query = parse_qs(url.query)
+            try:
+                top = int(query.get('top', [DEFAULT_TOP])[0])
+            except ValueError:
+                self._send(400, {'error': 'top must be an integer'})
+                return
+            body['cities'] = [
+                self._city(city) for city in snapshot.cities[:max(top, 0)]
+            ]
+        elif url.path.startswith('/city/'):
+            city = snapshot.by_city.get(unquote(url.path[len('/city/'):]))
+            if city is None:
+                self._send(404, {**body, 'error': 'unknown city'})
+                return
+            body['city'] = self._city(city)
+            body['city_age'] = _age(time(), city.fetched_at)
+        elif url.path == '/health':
+            body['cities_count'] = len(snapshot.cities)
+            body['ready'] = snapshot.updated_at is not None
+        else:
+            self._send(404, {'error': 'not found'})
+            return
+        self._send(200, body)
+
+    @staticmethod
+    def _city(city: RatedCity) -> dict[str, Any]:
+        return {
+            'rank': city.rank,
+            'city': city.city,
+            'shiny_hours': city.shiny_hours,
+            'temp_avg': city.temp_avg,
+        }
+
+    def _send(self, status: int, body: dict[str, Any]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args):
+        logger.debug(format % args)
+
+
+class RatingHTTPServer(ThreadingHTTPServer):
+    def __init__(self, address: tuple[str, int], board: RatingBoard):
+        super().__init__(address, RatingRequestHandler)
+        self.board = board
+
+
+class RatingUnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, board: RatingBoard):
+        if os.path.exists(path):
+            # left behind by a previous run, binding would fail
+            os.unlink(path)
+        super().__init__(path, RatingRequestHandler)
+        self.board = board
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(
+        endpoint: Endpoint,
+        board: RatingBoard
+) -> Union[RatingHTTPServer, RatingUnixServer]:
+    if isinstance(endpoint, str):
+        return RatingUnixServer(endpoint, board)
+    return RatingHTTPServer(endpoint, board)
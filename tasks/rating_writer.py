@@ -0,0 +1,240 @@
+import math
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Iterable, Iterator, Any, Sequence, Optional
+
+from tasks.data_aggregation_task import TotalSummary
+from tasks.data_calculation_task import PackedDays, PACKED_HOURS_KEYS
+from tasks.data_calculation_task import NO_HOURS
+
+
+RATING_FORMATS = ('csv', 'columnar', 'parquet', 'arrow', 'npz')
+# rows written at once, bounds the memory taken by the formatted text
+CSV_CHUNK_ROWS = 1024
+COND_HOURS = PACKED_HOURS_KEYS.index('relevant_cond_hours')
+
+
+def write_ratings(
+        rating_file: Path,
+        sorted_cities: Sequence[TotalSummary],
+        ranks: Sequence[int],
+        rating_format: str = 'csv'
+):
+    """
+    Writes ranked cities as CSV or as columns for downstream jobs,
+    `columnar` picks Parquet when pyarrow is installed and NPZ otherwise
+    """
+    rating_format = resolve_format(rating_format)
+    dates = rating_dates(sorted_cities)
+    if rating_format == 'csv':
+        write_csv(rating_file, sorted_cities, ranks, dates)
+    elif rating_format == 'npz':
+        write_npz(rating_file, sorted_cities, ranks, dates)
+    else:
+        write_arrow(rating_file, sorted_cities, ranks, dates, rating_format)
+
+
+def resolve_format(rating_format: str) -> str:
+    """Checks the format can be written, before the run rather than after"""
+    if rating_format not in RATING_FORMATS:
+        raise ValueError(f'Unknown rating format: {rating_format}')
+    # numpy and pyarrow are only imported once a rating is written in
+    # their format, they take longer to import than the rest of the app
+    has_pyarrow = find_spec('pyarrow') is not None
+    if rating_format == 'columnar':
+        rating_format = 'parquet' if has_pyarrow else 'npz'
+
+    if rating_format in ('parquet', 'arrow') and not has_pyarrow:
+        raise RuntimeError(
+            f'{rating_format} rating format requires pyarrow, install it '
+            f'or use the npz format'
+        )
+    if rating_format == 'npz' and find_spec('numpy') is None:
+        raise RuntimeError('npz rating format requires numpy')
+    return rating_format
+
+
+def rating_dates(cities: Iterable[TotalSummary]) -> tuple[str, ...]:
+    return tuple(sorted({date for ts in cities for date in ts.days.dates}))
+
+
+def day_values(
+        days: PackedDays,
+        dates: tuple[str, ...]
+) -> tuple[list[Optional[float]], list[Optional[int]]]:
+    """Average temperature and shiny hours of a city by `dates`"""
+    width = len(PACKED_HOURS_KEYS)
+    if days.dates == dates:
+        # most cities have a forecast for every date
+        return (
+            [None if math.isnan(t) else round(t, 3) for t in days.temps],
+            [
+                None if h == NO_HOURS else h
+                for h in days.hours[COND_HOURS::width]
+            ],
+        )
+
+    positions: dict[str, int] = {}
+    for i, date in enumerate(days.dates):
+        # the first day of a date wins
+        positions.setdefault(date, i)
+
+    temps: list[Optional[float]] = []
+    hours: list[Optional[int]] = []
+    for date in dates:
+        i = positions.get(date)
+        if i is None:
+            temps.append(None)
+            hours.append(None)
+            continue
+
+        temp = days.temps[i]
+        # analyzers round to 3 digits, which single precision keeps
+        temps.append(None if math.isnan(temp) else round(temp, 3))
+        cond_hours = days.hours[i * width + COND_HOURS]
+        hours.append(None if cond_hours == NO_HOURS else cond_hours)
+
+    return temps, hours
+
+
+def write_csv(
+        rating_file: Path,
+        sorted_cities: Iterable[TotalSummary],
+        ranks: Iterable[int],
+        dates: tuple[str, ...]
+):
+    header = ['City', 'Measurement/days', *dates, 'Average', 'Rating']
+    with open(rating_file, 'w') as file:
+        file.write(','.join(header))
+        chunk: list[str] = []
+        for row in _csv_rows(sorted_cities, ranks, dates):
+            chunk.append(row)
+            if len(chunk) >= CSV_CHUNK_ROWS:
+                file.write('\n' + '\n'.join(chunk))
+                chunk.clear()
+        if chunk:
+            file.write('\n' + '\n'.join(chunk))
+
+
+def _csv_rows(
+        sorted_cities: Iterable[TotalSummary],
+        ranks: Iterable[int],
+        dates: tuple[str, ...]
+) -> Iterator[str]:
+    for city, rank in zip(sorted_cities, ranks):
+        temps, hours = day_values(city.days, dates)
+        yield ','.join([
+            city.city,
+            'temperature',
+            *map(_cell, temps),
+            str(city.temp_avg),
+            str(rank),
+        ])
+        yield ','.join([
+            '',
+            'shiny hours',
+            *map(_cell, hours),
+            str(city.shiny_hours_avg),
+            '',
+        ])
+
+
+def _cell(value: Any) -> str:
+    return '' if value is None else str(value)
+
+
+def _columns(
+        sorted_cities: Sequence[TotalSummary],
+        ranks: Sequence[int],
+        dates: tuple[str, ...]
+) -> dict[str, list]:
+    columns: dict[str, list] = {
+        'city': [c.city for c in sorted_cities],
+        'rank': list(ranks),
+        'temp_avg': [c.temp_avg for c in sorted_cities],
+        'shiny_hours_avg': [c.shiny_hours_avg for c in sorted_cities],
+        'day_temp_avg': [],
+        'day_shiny_hours': [],
+    }
+    for city in sorted_cities:
+        temps, hours = day_values(city.days, dates)
+        columns['day_temp_avg'].append(temps)
+        columns['day_shiny_hours'].append(hours)
+    return columns
+
+
+def write_arrow(
+        rating_file: Path,
+        sorted_cities: Sequence[TotalSummary],
+        ranks: Sequence[int],
+        dates: tuple[str, ...],
+        rating_format: str = 'parquet'
+):
+    """
+    One row per city, per day measurements are list columns aligned with
+    the `dates` kept in the schema metadata
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as parquet
+
+    columns = _columns(sorted_cities, ranks, dates)
+    table = pa.table({
+        'city': pa.array(columns['city'], pa.string()),
+        'rank': pa.array(columns['rank'], pa.int32()),
+        'temp_avg': pa.array(columns['temp_avg'], pa.float64()),
+        'shiny_hours_avg': pa.array(
+            columns['shiny_hours_avg'],
+            pa.float64()
+        ),
+        'day_temp_avg': pa.array(
+            columns['day_temp_avg'],
+            pa.list_(pa.float64())
+        ),
+        'day_shiny_hours': pa.array(
+            columns['day_shiny_hours'],
+            pa.list_(pa.int32())
+        ),
+    }).replace_schema_metadata({'dates': ','.join(dates)})
+
+    if rating_format == 'parquet':
+        parquet.write_table(table, rating_file)
+    else:
+        feather.write_feather(table, rating_file)
+
+
+def write_npz(
+        rating_file: Path,
+        sorted_cities: Sequence[TotalSummary],
+        ranks: Sequence[int],
+        dates: tuple[str, ...]
+):
+    """
+    Arrays `city`, `rank`, `temp_avg` and `shiny_hours_avg` by city and
+    `day_temp_avg`, `day_shiny_hours` by city and date, NaN for no data
+    """
+    import numpy as np
+
+    columns = _columns(sorted_cities, ranks, dates)
+    shape = (len(sorted_cities), len(dates))
+    # open the file so that numpy doesn't append .npz to the name
+    with open(rating_file, 'wb') as file:
+        np.savez_compressed(
+            file,
+            dates=np.array(dates, dtype=str),
+            city=np.array(columns['city'], dtype=str),
+            rank=np.array(columns['rank'], dtype=np.int32),
+            temp_avg=np.array(columns['temp_avg'], dtype=np.float64),
+            shiny_hours_avg=np.array(
+                columns['shiny_hours_avg'],
+                dtype=np.float64
+            ),
+            day_temp_avg=np.array(
+                columns['day_temp_avg'],
+                dtype=np.float64
+            ).reshape(shape),
+            day_shiny_hours=np.array(
+                columns['day_shiny_hours'],
+                dtype=np.float64
+            ).reshape(shape),
+        )
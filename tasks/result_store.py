@@ -0,0 +1,145 @@
+import pickle
+import sqlite3
+import threading
+from multiprocessing import JoinableQueue
+from pathlib import Path
+from typing import NamedTuple, Optional, Iterable
+
+from common_types.task_types import TaskState, Status
+from tasks.data_aggregation_task import TotalSummary
+
+# bump when stored summaries are no longer valid for the current code
+STORE_VERSION = 2
+COMMIT_EVERY = 1000
+
+
+class StoreStats(NamedTuple):
+    hits: int
+    misses: int
+    stored: int
+
+
+class ResultStore:
+    """
+    SQLite store of city results keyed by city and a digest of its raw
+    forecast. A city whose forecast didn't change since the previous run
+    gets its stored `TotalSummary` back and doesn't have to be analyzed
+    again. Only the latest result of every city is kept.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._init_schema()
+        # digests are small enough to keep in memory, summaries are not
+        self._digests: dict[str, str] = dict(
+            self._db.execute('SELECT city, digest FROM results')
+        )
+        self._uncommitted = 0
+        self._hits = 0
+        self._misses = 0
+        self._stored = 0
+
+    def stats(self) -> StoreStats:
+        with self._lock:
+            return StoreStats(self._hits, self._misses, self._stored)
+
+    def get(self, city: str, digest: str) -> Optional[TotalSummary]:
+        with self._lock:
+            if self._digests.get(city) != digest:
+                self._misses += 1
+                return None
+
+            row = self._db.execute(
+                'SELECT total FROM results WHERE city = ?',
+                (city,)
+            ).fetchone()
+            self._hits += 1
+
+        return pickle.loads(row[0])
+
+    def put(self, city: str, digest: str, total: TotalSummary):
+        blob = pickle.dumps(total, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results (city, digest, total)'
+                ' VALUES (?, ?, ?)',
+                (city, digest, blob)
+            )
+            self._digests[city] = digest
+            self._stored += 1
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def _commit(self):
+        self._db.commit()
+        self._uncommitted = 0
+
+    def _init_schema(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version != STORE_VERSION:
+            self._db.execute('DROP TABLE IF EXISTS results')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            ' city TEXT PRIMARY KEY,'
+            ' digest TEXT NOT NULL,'
+            ' total BLOB NOT NULL)'
+        )
+        self._db.execute(f'PRAGMA user_version = {STORE_VERSION}')
+        self._db.commit()
+
+
+class ResultRouter:
+    """
+    Output of the fetchers when a result store is used. Cities found in
+    the store bypass the calculation workers and go straight to the
+    results queue, changed ones are remembered to be stored once they
+    are aggregated.
+    """
+
+    def __init__(
+            self,
+            store: ResultStore,
+            cities_queue: JoinableQueue,
+            calculation_queue: JoinableQueue
+    ):
+        self._store = store
+        self._cities_q = cities_queue
+        self._calculation_q = calculation_queue
+        self._fresh: dict[str, str] = {}
+
+    @property
+    def store(self) -> ResultStore:
+        return self._store
+
+    def put(self, task: TaskState):
+        if task.status == Status.OK and isinstance(task.data, TotalSummary):
+            self._calculation_q.put(task)
+            return
+
+        digest = getattr(task.data, 'digest', None)
+        if task.status == Status.OK and digest is not None:
+            self._fresh[task.data.city] = digest
+        self._cities_q.put(task)
+
+    def remember(
+            self,
+            totals: Iterable[TotalSummary]
+    ) -> Iterable[TotalSummary]:
+        for total in totals:
+            digest = self._fresh.pop(total.city, None)
+            if digest is not None:
+                self._store.put(total.city, digest, total)
+            yield total
+
+        self._store.flush()
@@ -1,6 +1,6 @@
 import pytest
 
-from common_algorithms.rank import get_rank
+from common_algorithms.rank import get_rank, get_rank_sorted
 
 
 @pytest.mark.parametrize(
@@ -14,3 +14,16 @@ from common_algorithms.rank import get_rank
 )
 def test_get_rank(seq, expected_rank):
     assert get_rank(seq) == expected_rank
+
+
+@pytest.mark.parametrize(
+    'sorted_seq, expected_rank',
+    [
+        ([], ()),
+        ([5, 4, 3], (1, 2, 3)),
+        ([5, 4, 4, 2], (1, 2, 2, 4)),
+        ([(3, 1.5), (3, 1.5), (2, 0.0)], (1, 1, 3)),
+    ]
+)
+def test_get_rank_sorted(sorted_seq, expected_rank):
+    assert get_rank_sorted(sorted_seq) == expected_rank
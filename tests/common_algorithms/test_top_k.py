@@ -0,0 +1,28 @@
+import pytest
+
+from common_algorithms.top_k import top_k
+
+
+@pytest.mark.parametrize(
+    'seq, k, expected',
+    [
+        ([1, 5, 3, 4], 2, [5, 4]),
+        ([1, 5, 3], 5, [5, 3, 1]),
+        ([1, 5, 3], 0, []),
+        ([3, 5, 3, 1, 3], 2, [5, 3, 3, 3]),
+        ([3, 3, 5, 4, 3], 2, [5, 4]),
+    ]
+)
+def test_top_k(seq, k, expected):
+    assert top_k(seq, k, key=lambda x: x) == expected
+
+
+def test_top_k_ties_keep_input_order():
+    items = [('a', 1), ('b', 2), ('c', 1), ('d', 1)]
+    assert top_k(items, 2, key=lambda x: x[1]) == [
+        ('b', 2), ('a', 1), ('c', 1), ('d', 1)
+    ]
+
+
+def test_top_k_consumes_iterator_once():
+    assert top_k(iter(range(1000)), 3, key=lambda x: -x) == [0, 1, 2]
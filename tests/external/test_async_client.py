@@ -0,0 +1,53 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from external.async_client import AsyncYandexWeatherAPI
+
+PAYLOAD = {'forecasts': [{'date': '2022-05-26', 'hours': []}]}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_error(404)
+            return
+
+        body = json.dumps(PAYLOAD).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_forecasting(server_url):
+    data = asyncio.run(
+        AsyncYandexWeatherAPI.get_forecasting(f'{server_url}/moscow.json')
+    )
+    assert data == PAYLOAD
+
+
+def test_get_forecasting_error(server_url):
+    with pytest.raises(Exception, match='404'):
+        asyncio.run(
+            AsyncYandexWeatherAPI.get_forecasting(f'{server_url}/missing')
+        )
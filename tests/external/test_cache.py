@@ -0,0 +1,54 @@
+import pytest
+
+from benchmarks.fake_server import FakeForecastServer
+from external.cache import ResponseCache
+from external.client import YandexWeatherAPI
+from tasks import DataFetchingTask
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeForecastServer() as server:
+        yield server
+
+
+def test_fresh_hit(server, tmp_path):
+    cache = ResponseCache(tmp_path)
+    task = DataFetchingTask([], cache)
+    source = ('MOSCOW', server.url_for('moscow'))
+
+    first = task.fetch_source(source)
+    second = task.fetch_source(source)
+
+    assert first == second
+    assert cache.stats() == (1, 1, 0, 0)
+
+
+def test_revalidate(server, tmp_path):
+    source = ('MOSCOW', server.url_for('moscow'))
+    expected = DataFetchingTask([]).fetch_source(source)
+
+    DataFetchingTask([], ResponseCache(tmp_path)).fetch_source(source)
+    # reopened cache with every entry already stale
+    cache = ResponseCache(tmp_path, ttl=-1)
+    assert cache.validators(source[1])['If-None-Match']
+
+    assert DataFetchingTask([], cache).fetch_source(source) == expected
+    assert cache.stats() == (0, 0, 1, 0)
+
+
+def test_lru_eviction(server, tmp_path):
+    sizes = [
+        len(YandexWeatherAPI.get_response(server.url_for(f'city{i}')).body)
+        for i in range(3)
+    ]
+    cache = ResponseCache(tmp_path, max_size=sizes[1] + sizes[2])
+    task = DataFetchingTask([], cache)
+
+    for i in range(3):
+        task.fetch_source((f'CITY{i}', server.url_for(f'city{i}')))
+
+    assert cache.stats().evicted == 1
+    assert cache.get_fresh(server.url_for('city0')) is None
+    assert cache.get_fresh(server.url_for('city2')) is not None
+    assert len(list(tmp_path.glob('*.body'))) == 2
@@ -0,0 +1,68 @@
+import multiprocessing
+import socket
+
+import pytest
+
+from benchmarks.fake_server import FakeForecastServer
+from external.client import ConnectionPool
+
+
+@pytest.fixture
+def server():
+    with FakeForecastServer() as server:
+        yield server
+
+
+def test_reuse_connection(server):
+    pool = ConnectionPool(max_size=2)
+    for i in range(5):
+        response = pool.request(server.url_for(f'city{i}'))
+        assert response.status == 200
+        assert response.body.startswith(b'{')
+
+    assert pool.stats() == (1, 4)
+    pool.close()
+
+
+def test_idle_timeout(server):
+    pool = ConnectionPool(idle_timeout=0)
+    pool.request(server.url_for('city'))
+    pool.request(server.url_for('city'))
+
+    assert pool.stats() == (2, 0)
+    pool.close()
+
+
+def test_retry_dropped_connection(server):
+    pool = ConnectionPool()
+    pool.request(server.url_for('city'))
+    # drop idle connections behind the pool's back
+    for connections in pool._idle.values():
+        for _, conn in connections:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+
+    assert pool.request(server.url_for('city')).status == 200
+    assert pool.stats() == (2, 1)
+    pool.close()
+
+
+def _request_in_child(pool: ConnectionPool, url: str, stats):
+    pool.request(url)
+    stats.put(pool.stats())
+
+
+def test_fork_drops_inherited_connections(server):
+    pool = ConnectionPool()
+    pool.request(server.url_for('city'))
+
+    context = multiprocessing.get_context('fork')
+    stats = context.Queue()
+    child = context.Process(
+        target=_request_in_child,
+        args=(pool, server.url_for('city'), stats)
+    )
+    child.start()
+    # the child opened its own connection instead of the parent's one
+    assert stats.get(timeout=10) == (2, 0)
+    child.join()
+    pool.close()
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+
+pytest.importorskip('numpy')
+
+from external.columnar_analyzer import (  # noqa: E402
+    analyze_json_batch,
+    analyze_json_columnar,
+)
+
+
+def make_forecasts() -> list[dict]:
+    forecasts = [
+        make_forecast(f'city{i}', days=days, full_days=min(days, i % 5))
+        for i in range(10)
+        for days in (1, 5)
+    ]
+    # day without hours inside the analyzed window
+    forecasts[3]['forecasts'][0]['hours'] = (
+        forecasts[3]['forecasts'][0]['hours'][:5]
+    )
+    forecasts[7]['forecasts'][1]['hours'].reverse()
+    forecasts.append({})
+
+    return forecasts
+
+
+@pytest.mark.parametrize('data', make_forecasts())
+def test_same_output(data):
+    expected = json.dumps(analyze_json(data))
+    assert json.dumps(analyze_json_columnar(data)) == expected
+
+
+def test_batch():
+    forecasts = make_forecasts()
+
+    assert (
+        [json.dumps(r) for r in analyze_json_batch(forecasts)]
+        == [json.dumps(analyze_json(data)) for data in forecasts]
+    )
+
+
+def malformed(change) -> dict:
+    data = make_forecast('city')
+    change(data, data['forecasts'][0]['hours'])
+    return data
+
+
+@pytest.mark.parametrize('data', [
+    {'now': 1},
+    {'forecasts': None},
+    [1],
+    malformed(lambda data, hours: hours[12].pop('temp')),
+    malformed(lambda data, hours: hours[12].update(temp='warm')),
+    malformed(lambda data, hours: data['forecasts'][1].pop('hours')),
+    malformed(lambda data, hours: hours[3].pop('temp')),
+    malformed(lambda data, hours: hours[12].pop('condition')),
+])
+def test_same_output_on_malformed(data):
+    try:
+        expected = json.dumps(analyze_json(data))
+    except Exception as e:
+        with pytest.raises(type(e)):
+            analyze_json_columnar(data)
+        with pytest.raises(type(e)):
+            analyze_json_batch([make_forecast('other'), data])
+    else:
+        assert json.dumps(analyze_json_columnar(data)) == expected
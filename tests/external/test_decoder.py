@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from external.decoder import Decoder, DECODERS, project_forecast, orjson
+
+
+BODIES = [
+    json.dumps(make_forecast(f'city{i}', days=5, full_days=i % 4)).encode()
+    for i in range(8)
+] + [b'{}']
+
+
+@pytest.mark.parametrize('backend', DECODERS)
+def test_decoders_agree(backend: str):
+    if backend == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+
+    decoder = Decoder(backend)
+    for body in BODIES:
+        assert decoder(body) == json.loads(body)
+        assert decoder(memoryview(body)) == json.loads(body)
+
+
+def test_projection_keeps_analyzed_fields():
+    for body in BODIES:
+        data = json.loads(body)
+        projected = Decoder('stdlib', projection=True)(body)
+        assert analyze_json(projected) == analyze_json(data)
+
+
+def test_projection_drops_unused_fields():
+    projected = project_forecast(make_forecast('city', days=1, full_days=1))
+
+    assert list(projected) == ['forecasts']
+    [day] = projected['forecasts']
+    assert set(day) == {'date', 'date_ts', 'hours'}
+    assert set(day['hours'][0]) == {'hour', 'temp', 'condition'}
+
+
+def test_unknown_decoder():
+    with pytest.raises(ValueError):
+        Decoder('simdjson')
@@ -0,0 +1,208 @@
+import asyncio
+import random
+from functools import partial
+from time import monotonic, sleep
+
+import pytest
+
+from benchmarks.fake_server import FakeForecastServer
+from external.async_client import AsyncYandexWeatherAPI
+from external.client import YandexWeatherAPI
+from external.resilience import (
+    BreakerPolicy,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    Resilience,
+    ResiliencePolicy,
+    RetryPolicy,
+    RETRY_STATUSES,
+)
+
+FAST_RETRY = RetryPolicy(attempts=5, base_delay=0.001, max_delay=0.01)
+
+
+@pytest.fixture
+def client():
+    yield YandexWeatherAPI
+    YandexWeatherAPI.configure_resilience(None)
+    YandexWeatherAPI.configure_pool()
+
+
+def test_retry_delay_backoff():
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5, jitter=False)
+    rnd = random.Random(0)
+    assert [policy.delay(i, rnd) for i in range(4)] == [0.1, 0.2, 0.4, 0.5]
+
+    jittered = RetryPolicy(base_delay=0.1, max_delay=0.5)
+    assert all(0 <= jittered.delay(2, rnd) <= 0.4 for _ in range(100))
+
+
+def test_retry_transient_failures(client):
+    with FakeForecastServer(error_rate=0.3, seed=1) as server:
+        client.configure_resilience(ResiliencePolicy(retry=FAST_RETRY))
+        statuses = [
+            client.get_response(server.url_for(f'city{i}')).status
+            for i in range(50)
+        ]
+
+    stats = client.resilience.stats()
+    assert statuses == [200] * 50
+    assert stats.requests == 50
+    assert stats.retries == stats.failed > 0
+
+
+def test_forecasts_are_retried(client):
+    with FakeForecastServer(error_rate=0.3, seed=1) as server:
+        client.configure_resilience(ResiliencePolicy(retry=FAST_RETRY))
+        for i in range(20):
+            client.get_forecasting(server.url_for(f'city{i}'))
+
+    assert client.resilience.stats().retries > 0
+
+
+def test_async_retry_transient_failures(client):
+    async def fetch_all(server: FakeForecastServer) -> list[int]:
+        responses = await asyncio.gather(*(
+            AsyncYandexWeatherAPI.get_response(server.url_for(f'city{i}'))
+            for i in range(50)
+        ))
+        return [response.status for response in responses]
+
+    with FakeForecastServer(error_rate=0.3, seed=1) as server:
+        client.configure_resilience(ResiliencePolicy(retry=FAST_RETRY))
+        statuses = asyncio.run(fetch_all(server))
+
+    stats = client.resilience.stats()
+    assert statuses == [200] * 50
+    assert stats.requests == 50
+    assert stats.retries == stats.failed > 0
+
+
+def test_async_timeout_is_configured(client):
+    # the first request of the seed is slower than the timeout
+    with FakeForecastServer(tail_rate=0.5, tail_latency=1, seed=1) as server:
+        client.configure_pool(timeout=0.2)
+        client.configure_resilience(ResiliencePolicy(retry=FAST_RETRY))
+        started = monotonic()
+        response = asyncio.run(
+            AsyncYandexWeatherAPI.get_response(server.url_for('city'))
+        )
+
+    assert response.status == 200
+    assert client.resilience.stats().retries >= 1
+    assert monotonic() - started < 1
+
+
+def test_last_failed_response_returned():
+    resilience = Resilience(ResiliencePolicy(retry=FAST_RETRY, breaker=None))
+    assert resilience.call('host', lambda: 500, RETRY_STATUSES.__contains__)
+    assert resilience.stats().retries == FAST_RETRY.attempts - 1
+
+
+def test_timeout_is_retried(client):
+    # the first request of the seed is slower than the timeout
+    with FakeForecastServer(tail_rate=0.5, tail_latency=1, seed=1) as server:
+        client.configure_pool(timeout=0.2)
+        client.configure_resilience(ResiliencePolicy(retry=FAST_RETRY))
+        response = client.get_response(server.url_for('city'))
+
+    assert response.status == 200
+    assert client.resilience.stats().retries >= 1
+
+
+def test_hedge_beats_slow_response():
+    calls: dict[int, int] = {}
+
+    def request(i: int) -> int:
+        calls[i] = calls.get(i, 0) + 1
+        # every tenth first request is stuck
+        if i % 10 == 9 and calls[i] == 1:
+            sleep(1)
+        else:
+            sleep(0.002)
+        return i
+
+    resilience = Resilience(ResiliencePolicy(
+        retry=None,
+        hedge=HedgePolicy(min_samples=5),
+    ))
+    started = monotonic()
+    results = [resilience.call('host', partial(request, i)) for i in range(30)]
+    elapsed = monotonic() - started
+    resilience.close()
+
+    assert results == list(range(30))
+    assert resilience.stats().hedges == resilience.stats().hedge_wins == 3
+    # stuck requests weren't waited for
+    assert elapsed < 1
+
+
+def test_async_hedge_beats_slow_response():
+    calls: dict[int, int] = {}
+
+    async def request(i: int) -> int:
+        calls[i] = calls.get(i, 0) + 1
+        # every tenth first request is stuck
+        if i % 10 == 9 and calls[i] == 1:
+            await asyncio.sleep(10)
+        else:
+            await asyncio.sleep(0.002)
+        return i
+
+    async def call_all(resilience: Resilience) -> list[int]:
+        return [
+            await resilience.call_async('host', partial(request, i))
+            for i in range(30)
+        ]
+
+    resilience = Resilience(ResiliencePolicy(
+        retry=None,
+        hedge=HedgePolicy(min_samples=5),
+    ))
+    started = monotonic()
+    results = asyncio.run(call_all(resilience))
+
+    assert results == list(range(30))
+    assert resilience.stats().hedges == resilience.stats().hedge_wins == 3
+    # stuck requests were called off rather than waited for
+    assert monotonic() - started < 1
+
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(BreakerPolicy(failures=2, reset_timeout=0.05))
+    breaker.failure('a')
+    assert breaker.allow('a')
+    breaker.failure('a')
+    assert breaker.is_open('a')
+    assert not breaker.allow('a')
+    assert breaker.allow('b')
+
+    start = monotonic()
+    while monotonic() - start < 0.06:
+        pass
+    # a single trial request after the reset timeout
+    assert breaker.allow('a')
+    assert not breaker.allow('a')
+    breaker.success('a')
+    assert not breaker.is_open('a')
+    assert breaker.allow('a')
+
+
+def test_breaker_rejects_requests():
+    resilience = Resilience(ResiliencePolicy(
+        retry=FAST_RETRY,
+        breaker=BreakerPolicy(failures=3, reset_timeout=60),
+    ))
+
+    def fail():
+        raise ConnectionError('down')
+
+    with pytest.raises(CircuitOpenError):
+        resilience.call('host', fail)
+    with pytest.raises(CircuitOpenError):
+        resilience.call('host', fail)
+
+    stats = resilience.stats()
+    assert stats.failed == 3
+    assert stats.rejected == 2
@@ -0,0 +1,50 @@
+import asyncio
+from multiprocessing import JoinableQueue
+
+from common_types.task_types import Status
+from my_concurrent.async_fetcher import AsyncFetcher
+
+
+class FakeFetcher:
+    def __init__(self, sources: list[str]):
+        self._sources = sources
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get_sources(self) -> list[str]:
+        return self._sources
+
+    async def fetch_source_async(self, source: str) -> int:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return int(source)
+
+
+def drain(queue: JoinableQueue, count: int) -> list:
+    result = []
+    for _ in range(count):
+        result.append(queue.get(timeout=1))
+        queue.task_done()
+    return result
+
+
+def test_fetch_data():
+    out_q: JoinableQueue = JoinableQueue()
+    data_fetcher = FakeFetcher([str(i) for i in range(20)])
+    AsyncFetcher[str, int](data_fetcher, 4, out_q).fetch_data()
+
+    results = drain(out_q, 20)
+    assert all(r.status == Status.OK for r in results)
+    assert sorted(r.data for r in results) == list(range(20))
+    assert data_fetcher.max_in_flight == 4
+
+
+def test_fetch_error():
+    out_q: JoinableQueue = JoinableQueue()
+    AsyncFetcher[str, int](FakeFetcher(['x']), 4, out_q).fetch_data()
+
+    [result] = drain(out_q, 1)
+    assert result.status == Status.ERROR
+    assert result.data is None
@@ -0,0 +1,97 @@
+from multiprocessing import JoinableQueue
+from time import sleep
+from typing import Optional
+
+from my_concurrent.autoscaler import Autoscaler, AutoscaleConfig
+from my_concurrent.autoscaler import ScalingBounds, IDLE_STEPS
+
+
+class FakeFetcher:
+    def __init__(self, size: int):
+        self.size = size
+        self.in_flight = size
+        self.latency: Optional[float] = 0.1
+
+    def resize(self, size: int):
+        self.size = size
+
+
+class FakeWorkers:
+    def __init__(self, size: int):
+        self.size = size
+        self.utilization: Optional[float] = 1.0
+
+    def resize(self, size: int):
+        self.size = size
+
+
+def make_autoscaler(
+        fetcher: FakeFetcher,
+        workers: FakeWorkers,
+        backlog: int = 0
+) -> Autoscaler:
+    cities_queue: JoinableQueue = JoinableQueue()
+    for i in range(backlog):
+        cities_queue.put(i)
+    # let the feeder thread flush items so qsize sees them
+    sleep(0.05)
+
+    return Autoscaler(
+        fetcher,
+        workers,
+        cities_queue,
+        JoinableQueue(),
+        AutoscaleConfig(ScalingBounds(1, 8), ScalingBounds(1, 3))
+    )
+
+
+def test_grow_workers_on_backlog():
+    workers = FakeWorkers(2)
+    autoscaler = make_autoscaler(FakeFetcher(4), workers, backlog=10)
+
+    for _ in range(3):
+        autoscaler.step()
+
+    assert workers.size == 3
+    assert [d.target for d in autoscaler.decisions].count('workers') == 1
+
+
+def test_shrink_idle_workers():
+    workers = FakeWorkers(2)
+    workers.utilization = 0.0
+    autoscaler = make_autoscaler(FakeFetcher(4), workers)
+
+    for _ in range(IDLE_STEPS - 1):
+        autoscaler.step()
+    assert workers.size == 2
+
+    autoscaler.step()
+    assert workers.size == 1
+
+
+def test_grow_fetchers_when_workers_starve():
+    fetcher = FakeFetcher(4)
+    autoscaler = make_autoscaler(fetcher, FakeWorkers(2))
+
+    autoscaler.step()
+    assert fetcher.size == 6
+    fetcher.in_flight = 6
+    autoscaler.step()
+    assert fetcher.size == 8
+
+    fetcher.in_flight = 3
+    autoscaler.step()
+    assert fetcher.size == 8
+
+
+def test_shrink_fetchers_on_latency_degradation():
+    fetcher = FakeFetcher(8)
+    fetcher.in_flight = 0
+    autoscaler = make_autoscaler(fetcher, FakeWorkers(2))
+
+    autoscaler.step()
+    fetcher.latency = 0.5
+    autoscaler.step()
+
+    assert fetcher.size == 6
+    assert 'latency' in autoscaler.decisions[-1].reason
@@ -0,0 +1,44 @@
+from multiprocessing import JoinableQueue
+
+import pytest
+
+from common_types.task_types import TaskState, Status
+from my_concurrent.dispatch_pool import DispatchingPool
+from my_concurrent.dispatch_pool import FuturesPool, InlinePool
+
+
+def convert(data: str) -> int:
+    return int(data)
+
+
+@pytest.mark.parametrize('make_pool', [
+    lambda in_q, out_q: InlinePool[str, int](convert, in_q, out_q),
+    lambda in_q, out_q: FuturesPool[str, int](convert, 2, in_q, out_q),
+])
+def test_dispatching_pool(make_pool):
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    pool = make_pool(in_q, out_q)
+    pool.start_all()
+
+    in_q.put(TaskState[str].ok('1'))
+    in_q.put('2')
+    in_q.put('x')
+    in_q.put(TaskState[str].error('fetch failed'))
+    in_q.join()
+    pool.stop_all()
+    in_q.join()
+
+    results = [out_q.get(timeout=5) for _ in range(4)]
+    assert sorted(r.data for r in results if r.status == Status.OK) == [1, 2]
+    assert sorted(
+        r.message for r in results if r.status == Status.ERROR
+    ) == ['fetch failed', "invalid literal for int() with base 10: 'x'"]
+
+
+def test_pool_without_submit_is_not_built():
+    class IdlePool(DispatchingPool[str, int]):
+        pass
+
+    with pytest.raises(TypeError):
+        IdlePool(convert, JoinableQueue(), JoinableQueue())
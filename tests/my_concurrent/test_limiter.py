@@ -0,0 +1,42 @@
+import threading
+from time import sleep
+
+from my_concurrent.limiter import AdjustableLimiter
+
+
+def test_raise_limit_releases_waiters():
+    limiter = AdjustableLimiter(1)
+    limiter.acquire()
+
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    sleep(0.05)
+    assert not acquired.is_set()
+
+    limiter.set_limit(2)
+    assert acquired.wait(1)
+    assert limiter.active == 2
+
+
+def test_lower_limit_applies_on_release():
+    limiter = AdjustableLimiter(2)
+    limiter.acquire()
+    limiter.acquire()
+    limiter.set_limit(1)
+    limiter.release()
+
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=acquire, daemon=True).start()
+    assert not acquired.wait(0.05)
+    limiter.release()
+    assert acquired.wait(1)
@@ -0,0 +1,80 @@
+import os
+from multiprocessing import JoinableQueue
+from time import sleep, monotonic
+
+from common_types.task_types import TaskState, Status
+from my_concurrent.process_pool import ProcessPool, PersistentProcessPool
+
+
+def worker_pid(data: int) -> int:
+    return os.getpid()
+
+
+def double(data: int) -> int:
+    return data * 2
+
+
+def read_results(out_q: JoinableQueue, count: int) -> list[TaskState]:
+    results = [out_q.get(timeout=5) for _ in range(count)]
+    for _ in results:
+        out_q.task_done()
+    return results
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
+        if predicate():
+            return True
+        sleep(0.01)
+    return False
+
+
+def test_resize():
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    pool = ProcessPool[int, int].make_pool(double, 1, in_q, out_q)
+    pool.start_all()
+
+    pool.resize(3)
+    assert pool.size == 3
+    pool.resize(1)
+    assert pool.size == 1
+
+    in_q.put(21)
+    assert read_results(out_q, 1)[0].data == 42
+
+    pool.stop_all()
+    in_q.join()
+
+
+def test_persistent_pool_survives_runs():
+    pool = PersistentProcessPool[int, int](worker_pid, 2)
+    pool.start_all()
+    try:
+        pids = set()
+        for _ in range(2):
+            for i in range(4):
+                pool.input_queue.put(i)
+            pool.input_queue.join()
+            pids |= {r.data for r in read_results(pool.output_queue, 4)}
+            pool.stop_all()
+        assert len(pids) <= 2
+    finally:
+        pool.shutdown()
+
+
+def test_persistent_pool_recycles_workers():
+    pool = PersistentProcessPool[int, int](worker_pid, 1, max_tasks=2)
+    pool.start_all()
+    try:
+        for i in range(6):
+            pool.input_queue.put(i)
+        pool.input_queue.join()
+
+        results = read_results(pool.output_queue, 6)
+        assert all(r.status == Status.OK for r in results)
+        assert len({r.data for r in results}) == 3
+        assert wait_for(lambda: pool.recycled >= 2)
+    finally:
+        pool.shutdown()
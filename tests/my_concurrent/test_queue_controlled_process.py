@@ -2,8 +2,12 @@ from multiprocessing import JoinableQueue
 from time import sleep
 from typing import Callable
 
-from common_types.task_types import TaskState, Status
+from common_types.task_types import TaskState, TaskBatch, Status
 from my_concurrent.queue_controlled_process import QueueControlledProcess
+from my_concurrent.queue_controlled_process import current_rss_mb
+
+# memory kept by a worker between tasks
+HELD: list[bytes] = []
 
 
 def simple_converter(data: str) -> int:
@@ -15,15 +19,34 @@ def sleepy_converter(data: str) -> int:
     return int(data)
 
 
+def batch_converter(data: list[str]) -> list[int | Exception]:
+    return [int(d) if d.isdigit() else ValueError(d) for d in data]
+
+
+def broken_batch_converter(data: list[str]) -> list[int]:
+    raise RuntimeError('batch failed')
+
+
+def allocating_converter(data: str) -> int:
+    """`hold:MB` keeps the memory, `free:MB` gives it back"""
+    kind, mb = data.split(':')
+    block = b'x' * (int(mb) * 1024 * 1024)
+    if kind == 'hold':
+        HELD.append(block)
+    return int(mb)
+
+
 def setup(
-        handler: Callable
+        handler: Callable,
+        **kwargs
 ) -> tuple[JoinableQueue, JoinableQueue, QueueControlledProcess]:
     in_q: JoinableQueue = JoinableQueue()
     out_q: JoinableQueue = JoinableQueue()
     qcp = QueueControlledProcess[str, int](
         handler,
         in_q,
-        out_q
+        out_q,
+        **kwargs
     )
     qcp.daemon = True
     qcp.start()
@@ -100,3 +123,108 @@ def test_chained():
     assert result.data == 123
 
     stop_process(qcp)
+
+
+def put_all(in_q: JoinableQueue, tasks: list):
+    for task in tasks:
+        in_q.put(task)
+    in_q.join()
+
+
+def test_batch():
+    [in_q, out_q, qcp] = setup(
+        simple_converter,
+        batch_size=3,
+        max_linger=1
+    )
+
+    put_all(in_q, ['1', 'x', TaskState.error('fetch failed')])
+
+    result = out_q.get()
+    assert isinstance(result, TaskBatch)
+    assert [t.status for t in result.tasks] == [
+        Status.OK, Status.ERROR, Status.ERROR
+    ]
+    assert result.tasks[0].data == 1
+    assert result.tasks[2].message == 'fetch failed'
+
+    stop_process(qcp)
+
+
+def test_batch_linger():
+    [in_q, out_q, qcp] = setup(
+        simple_converter,
+        batch_size=10,
+        max_linger=0.05
+    )
+
+    put_all(in_q, ['1', '2'])
+
+    result = out_q.get()
+    assert [t.data for t in result.tasks] == [1, 2]
+
+    stop_process(qcp)
+
+
+def test_batch_handler():
+    [in_q, out_q, qcp] = setup(
+        simple_converter,
+        batch_size=2,
+        max_linger=1,
+        batch_handler=batch_converter
+    )
+
+    put_all(in_q, ['1', 'x'])
+
+    result = out_q.get()
+    assert [t.data for t in result.tasks] == [1, None]
+    assert result.tasks[1].message == 'x'
+
+    stop_process(qcp)
+
+
+def test_broken_batch_handler():
+    [in_q, out_q, qcp] = setup(
+        simple_converter,
+        batch_size=2,
+        max_linger=1,
+        batch_handler=broken_batch_converter
+    )
+
+    put_all(in_q, ['1', '2'])
+
+    result = out_q.get()
+    assert [t.data for t in result.tasks] == [1, 2]
+
+    stop_process(qcp)
+
+
+def test_recycle_after_max_tasks():
+    [in_q, out_q, qcp] = setup(simple_converter, max_tasks=2)
+
+    for i in range(3):
+        in_q.put(str(i))
+
+    assert out_q.get().data == 0
+    assert out_q.get().data == 1
+    qcp.join(timeout=5)
+    assert qcp.exitcode == 0
+    assert in_q.get() == '2'
+
+
+def test_recycle_at_current_rss():
+    # forked workers start with about the memory of this process
+    [in_q, out_q, qcp] = setup(
+        allocating_converter,
+        max_rss_mb=current_rss_mb() + 100
+    )
+
+    # the peak RSS goes over the limit, the current one doesn't
+    in_q.put('free:200')
+    assert out_q.get(timeout=5).data == 200
+    in_q.put('hold:200')
+    assert out_q.get(timeout=5).data == 200
+    in_q.put('hold:1')
+    qcp.join(timeout=5)
+    assert qcp.exitcode == 0
+    assert in_q.get() == 'hold:1'
@@ -0,0 +1,34 @@
+from multiprocessing import JoinableQueue
+
+from common_types.task_types import TaskState, TaskBatch
+from my_concurrent.queue_reader import StreamingQueueReader, StreamEnd
+
+
+def test_streaming_reader_end_overtakes_results():
+    queue: JoinableQueue = JoinableQueue()
+    queue.put(TaskState.ok(1))
+    queue.put(StreamEnd(3))
+    queue.put(TaskState.ok(2))
+    queue.put(TaskState.ok(3))
+    queue.put(TaskState.ok(4))
+
+    reader = StreamingQueueReader[int](queue)
+    assert [t.data for t in reader.read_tasks()] == [1, 2, 3]
+    assert queue.get(timeout=1).data == 4
+
+
+def test_streaming_reader_empty_stream():
+    queue: JoinableQueue = JoinableQueue()
+    queue.put(StreamEnd(0))
+
+    assert list(StreamingQueueReader[int](queue).read_tasks()) == []
+
+
+def test_streaming_reader_unpacks_batches():
+    queue: JoinableQueue = JoinableQueue()
+    queue.put(StreamEnd(3))
+    queue.put(TaskBatch([TaskState.ok(1), TaskState.ok(2)]))
+    queue.put(TaskState.ok(3))
+
+    reader = StreamingQueueReader[int](queue)
+    assert [t.data for t in reader.read_tasks()] == [1, 2, 3]
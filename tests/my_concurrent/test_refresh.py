@@ -0,0 +1,42 @@
+import threading
+from time import monotonic
+
+from my_concurrent.refresh import StaggeredRefresher
+
+
+def test_refreshes_everything_then_staggered_slots():
+    batches: list[tuple[float, list[int]]] = []
+    done = threading.Event()
+
+    def refresh(batch: list[int]):
+        batches.append((monotonic(), batch))
+        if len(batches) == 5:
+            done.set()
+
+    refresher = StaggeredRefresher[int](range(6), refresh, 0.2, slots=3)
+    refresher.start()
+    assert done.wait(5)
+    refresher.stop()
+
+    assert refresher.slots == 3
+    assert [batch for _, batch in batches[:5]] == [
+        [0, 1, 2, 3, 4, 5], [0, 3], [1, 4], [2, 5], [0, 3],
+    ]
+    gaps = [b - a for (a, _), (b, _) in zip(batches[1:], batches[2:5])]
+    assert all(gap >= 0.05 for gap in gaps)
+
+
+def test_failed_refresh_keeps_running():
+    calls = threading.Semaphore(0)
+
+    def refresh(batch: list[int]):
+        calls.release()
+        raise RuntimeError('upstream down')
+
+    refresher = StaggeredRefresher[int]([1], refresh, 0.01, slots=5)
+    refresher.start()
+    assert calls.acquire(timeout=5) and calls.acquire(timeout=5)
+    refresher.stop()
+
+    assert refresher.slots == 1
+    assert refresher.stats().failures >= 2
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import signal
+from time import sleep
+
+import pytest
+
+from my_concurrent.sharding import (
+    ShardBoard,
+    ShardCoordinator,
+    connect_board,
+    is_loopback,
+    make_shards,
+    work_on_shards,
+)
+
+AUTHKEY = b'test'
+
+
+def test_make_shards():
+    assert make_shards(range(5), 2) == [[0, 1], [2, 3], [4]]
+    assert make_shards([], 2) == []
+    with pytest.raises(ValueError):
+        make_shards(range(5), 0)
+
+
+def test_is_loopback():
+    assert is_loopback(('127.0.0.1', 1))
+    assert is_loopback(('localhost', 1))
+    assert is_loopback(('::1', 1))
+    assert not is_loopback(('0.0.0.0', 1))
+    assert not is_loopback(('', 1))
+    assert not is_loopback(('example.com', 1))
+
+
+def test_expired_lease_requeued():
+    board = ShardBoard[int, int]([[1], [2]], lease_timeout=0.05)
+    first = board.lease('a')
+    second = board.lease('b')
+    assert board.lease('c') is None
+
+    assert board.complete('b', second.id, 2)
+    sleep(0.06)
+    assert board.lease('c') == first
+    assert not board.renew('a', first.id)
+    assert board.progress().requeued == 1
+
+    # a late result of the lost lease still counts once
+    assert board.complete('a', first.id, 1)
+    assert not board.complete('c', first.id, 1)
+    assert board.finished()
+    assert sorted(board.take_results()) == [(0, 1), (1, 2)]
+
+
+def test_open_board_takes_shards_until_closed():
+    board = ShardBoard[int, int](closed=False)
+    first = board.add([1])
+    shard = board.lease('a')
+    assert board.complete('a', shard.id, 1)
+    assert not board.finished()
+
+    assert board.add([2]) == first + 1
+    assert board.backlog() == 1
+    board.close()
+    with pytest.raises(ValueError):
+        board.add([3])
+    board.complete('a', board.lease('a').id, 2)
+    assert board.finished()
+    assert board.progress().total == 2
+
+
+def test_release_gives_shard_back():
+    board = ShardBoard[int, int]([[1]])
+    shard = board.lease('a')
+    board.release('a', shard.id)
+    assert board.lease('b') == shard
+
+
+def square_sum(sources: list[int]) -> int:
+    return sum(x * x for x in sources)
+
+
+def stuck_worker(address, authkey: bytes):
+    board = connect_board(address, authkey)
+    work_on_shards(board, 'stuck', lambda _: sleep(60))
+
+
+def run_worker(address, authkey: bytes, name: str) -> int:
+    return work_on_shards(
+        connect_board(address, authkey),
+        name,
+        square_sum,
+        poll_interval=0.05
+    )
+
+
+def test_shards_of_dead_worker_requeued():
+    coordinator = ShardCoordinator[int, int](
+        range(10),
+        3,
+        ('127.0.0.1', 0),
+        AUTHKEY,
+        lease_timeout=0.5
+    )
+    with coordinator:
+        stuck = multiprocessing.Process(
+            target=stuck_worker,
+            args=(coordinator.address, AUTHKEY)
+        )
+        stuck.start()
+        while coordinator.progress().leased == 0:
+            sleep(0.01)
+        os.kill(stuck.pid, signal.SIGKILL)
+        stuck.join()
+
+        worker = multiprocessing.Process(
+            target=run_worker,
+            args=(coordinator.address, AUTHKEY, 'worker')
+        )
+        worker.start()
+        results = dict(coordinator.results(poll_interval=0.05))
+        progress = coordinator.progress()
+        worker.join()
+
+    assert results == {0: 5, 1: 50, 2: 149, 3: 81}
+    assert progress.requeued == 1
+
+
+def test_sources_are_read_as_shards_are_taken():
+    read = []
+
+    def sources():
+        for x in range(100):
+            read.append(x)
+            yield x
+
+    coordinator = ShardCoordinator[int, int](
+        sources(),
+        5,
+        ('127.0.0.1', 0),
+        AUTHKEY,
+        backlog=2
+    )
+    with coordinator:
+        assert len(read) <= 3 * 5
+        worker = multiprocessing.Process(
+            target=run_worker,
+            args=(coordinator.address, AUTHKEY, 'worker')
+        )
+        worker.start()
+        results = dict(coordinator.results(poll_interval=0.01))
+        worker.join()
+
+    assert len(read) == 100
+    assert sum(results.values()) == square_sum(list(range(100)))
+    assert sorted(results) == list(range(20))
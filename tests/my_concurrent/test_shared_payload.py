@@ -0,0 +1,39 @@
+from multiprocessing import JoinableQueue
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from my_concurrent.queue_controlled_process import QueueControlledProcess
+from my_concurrent.shared_payload import SharedPayload
+
+
+def read_payload(payload: SharedPayload) -> str:
+    with payload.open() as buffer:
+        return str(buffer, 'utf-8')
+
+
+def test_read_in_worker_releases_segment():
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    qcp = QueueControlledProcess[SharedPayload, str](
+        read_payload,
+        in_q,
+        out_q
+    )
+    qcp.daemon = True
+    qcp.start()
+
+    payload = SharedPayload.create('{"city": "Москва"}'.encode())
+    in_q.put(payload)
+    in_q.join()
+
+    assert out_q.get().data == '{"city": "Москва"}'
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(payload.name)
+
+    qcp.stop_queue()
+    qcp.join()
+
+
+def test_empty_payload():
+    assert read_payload(SharedPayload.create(b'')) == ''
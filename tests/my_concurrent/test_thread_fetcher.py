@@ -0,0 +1,53 @@
+import threading
+from time import sleep
+from typing import Iterator
+
+from common_types.task_types import Status
+from my_concurrent.thread_fetcher import ThreadFetcher
+
+
+class ListSink:
+    def __init__(self):
+        self.tasks = []
+
+    def put(self, task):
+        self.tasks.append(task)
+
+
+class LazyFetcher:
+    """Counts how far the sources are read ahead of finished fetches"""
+
+    def __init__(self, count: int):
+        self._count = count
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.max_ahead = 0
+
+    def get_sources(self) -> Iterator[int]:
+        for i in range(self._count):
+            with self._lock:
+                self.max_ahead = max(self.max_ahead, i - self.fetched)
+            yield i
+
+    def fetch_source(self, source: int) -> int:
+        sleep(0.001)
+        try:
+            if source == 3:
+                raise ValueError('broken')
+            return source
+        finally:
+            with self._lock:
+                self.fetched += 1
+
+
+def test_sources_read_lazily():
+    sink = ListSink()
+    data_fetcher = LazyFetcher(200)
+    fetcher = ThreadFetcher[int, int](data_fetcher, 4, sink)
+
+    assert fetcher.fetch_data() == 200
+    assert len(sink.tasks) == 200
+    # at most a window of sources is pulled ahead of the fetches
+    assert data_fetcher.max_ahead <= 4
+    assert fetcher.failed == 1
+    assert [t.status for t in sink.tasks].count(Status.ERROR) == 1
@@ -0,0 +1,89 @@
+from multiprocessing import JoinableQueue
+from typing import NamedTuple
+
+import pytest
+
+from common_types.task_types import TaskState
+from my_concurrent import tracing
+from my_concurrent.queue_controlled_process import QueueControlledProcess
+from my_concurrent.queue_reader import StreamingQueueReader, StreamEnd
+from my_concurrent.tracing import Tracer, Transfer, key_of
+
+
+class Summary(NamedTuple):
+    city: str
+
+
+@pytest.fixture
+def tracer():
+    tracer = tracing.enable((Transfer('fetch', 'calculate', 'queue'),))
+    yield tracer
+    tracing.disable()
+
+
+def simple_converter(data: str) -> int:
+    return int(data)
+
+
+def test_key_of():
+    assert key_of(('MOSCOW', 'https://...')) == 'MOSCOW'
+    assert key_of(TaskState.ok(('MOSCOW', {}))) == 'MOSCOW'
+    assert key_of(Summary('PARIS')) == 'PARIS'
+    assert key_of(None) is None
+
+
+def test_disabled_records_nothing():
+    tracing.record('fetch', 'MOSCOW', 0, 1)
+    with tracing.span('fetch', 'MOSCOW'):
+        pass
+
+    assert tracing.drain() == []
+
+
+def test_transfer_spans():
+    tracer = Tracer((Transfer('fetch', 'calculate', 'queue'),))
+    tracer.record('fetch', 'MOSCOW', 1.0, 2.0)
+    tracer.record('calculate', 'MOSCOW', 2.5, 3.0)
+    tracer.record('fetch', 'PARIS', 1.0, 2.0)
+
+    [transfer] = tracer.transfer_spans()
+    assert (transfer.stage, transfer.key) == ('queue', 'MOSCOW')
+    assert transfer.duration == pytest.approx(0.5)
+
+    stats = {s.stage: s for s in tracer.summary()}
+    assert stats['fetch'].count == 2
+    assert stats['queue'].total == pytest.approx(0.5)
+
+
+def test_chrome_trace(tracer: Tracer):
+    tracer.record('fetch', 'MOSCOW', 1.0, 2.0)
+    tracer.record('calculate', 'MOSCOW', 3.0, 3.5)
+
+    events = tracer.to_chrome_trace()['traceEvents']
+    assert [(e['name'], e['ph']) for e in events] == [
+        ('fetch', 'X'), ('calculate', 'X'), ('queue', 'b'), ('queue', 'e')
+    ]
+    assert events[1]['ts'] == 2e6
+    assert events[1]['dur'] == 5e5
+
+
+def test_worker_spans_merged(tracer: Tracer):
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    qcp = QueueControlledProcess[str, int](simple_converter, in_q, out_q)
+    qcp.daemon = True
+    qcp.start()
+
+    for data in ('1', '2'):
+        in_q.put(data)
+    in_q.join()
+    out_q.put(StreamEnd(2))
+    reader = StreamingQueueReader[int](out_q)
+    assert sorted(t.data for t in reader.read_tasks()) == [1, 2]
+    qcp.stop_queue()
+    qcp.join()
+
+    spans = [s for s in tracer.spans if s.stage == 'calculate']
+    assert sorted(s.key for s in spans) == ['1', '2']
+    assert {s.pid for s in spans} == {qcp.pid}
+    assert tracer.busy_time('calculate')[qcp.pid] > 0
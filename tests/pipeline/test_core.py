@@ -0,0 +1,132 @@
+import threading
+from queue import Full
+from time import monotonic, sleep
+from typing import Callable
+
+import pytest
+
+from benchmarks.fake_server import FakeForecastServer
+from pipeline.core import PipelineSettings, RatingOptions
+from pipeline.core import find_bet_city, make_warm_pool
+
+CITIES = 200
+
+
+class UpdateFailed(Exception):
+    pass
+
+
+def fail_on_update(_):
+    raise UpdateFailed()
+
+
+def finishes(run: Callable[[], object], timeout: float = 30) -> object:
+    """Result of `run`, which must not hang"""
+    outcome: dict[str, object] = {}
+
+    def target():
+        try:
+            outcome['result'] = run()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'the pipeline hangs'
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+@pytest.fixture(scope='module')
+def city_urls():
+    with FakeForecastServer() as server:
+        yield [(f'CITY{i}', server.url_for(f'city{i}')) for i in range(CITIES)]
+
+
+@pytest.mark.parametrize('transport', ['pickle', 'shm'])
+def test_failed_streaming_run_stops(city_urls, transport: str):
+    settings = PipelineSettings(
+        fetchers_count=4,
+        calculation_workers_count=2,
+        streaming=True,
+        # fetchers and workers block on full queues right away
+        queue_size=2,
+        transport=transport,
+    )
+    with pytest.raises(UpdateFailed):
+        finishes(lambda: find_bet_city(
+            city_urls,
+            settings,
+            on_update=fail_on_update,
+        ))
+
+
+def test_failed_run_leaves_warm_pool_clean(city_urls):
+    settings = PipelineSettings(
+        fetchers_count=4,
+        calculation_workers_count=2,
+        streaming=True,
+        batch_linger=0.0,
+    )
+    worker_pool = make_warm_pool(settings)
+    try:
+        with pytest.raises(UpdateFailed):
+            finishes(lambda: find_bet_city(
+                city_urls,
+                settings,
+                on_update=fail_on_update,
+                worker_pool=worker_pool,
+            ))
+        best = finishes(lambda: find_bet_city(
+            city_urls[:10],
+            settings,
+            RatingOptions(top=10),
+            worker_pool=worker_pool,
+        ))
+    finally:
+        worker_pool.shutdown()
+
+    assert sorted(city.city for city in best) == sorted(
+        city for city, _ in city_urls[:10]
+    )
+
+
+def test_warm_pool_recycles_workers(city_urls):
+    settings = PipelineSettings(
+        fetchers_count=4,
+        calculation_workers_count=1,
+        max_tasks=2,
+    )
+    worker_pool = make_warm_pool(settings)
+    try:
+        best = finishes(lambda: find_bet_city(
+            city_urls[:6],
+            settings,
+            RatingOptions(top=6),
+            worker_pool=worker_pool,
+        ))
+        deadline = monotonic() + 5
+        while worker_pool.recycled < 2 and monotonic() < deadline:
+            sleep(0.01)
+    finally:
+        worker_pool.shutdown()
+
+    assert len(best) == 6
+    assert worker_pool.recycled >= 2
+
+
+def test_warm_pool_queues_are_bounded_in_streaming_mode():
+    worker_pool = make_warm_pool(PipelineSettings(
+        streaming=True,
+        queue_size=2,
+    ))
+    try:
+        # no worker is started to take the cities
+        worker_pool.input_queue.put('CITY0')
+        worker_pool.input_queue.put('CITY1')
+        with pytest.raises(Full):
+            worker_pool.input_queue.put('CITY2', timeout=0.1)
+    finally:
+        worker_pool.shutdown()
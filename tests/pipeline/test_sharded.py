@@ -0,0 +1,64 @@
+import socket
+import threading
+from pathlib import Path
+from time import sleep
+
+from benchmarks.fake_server import FakeForecastServer
+from pipeline.core import PipelineSettings, RatingOptions
+from pipeline.sharded import find_bet_city_sharded, run_shard_worker
+from tasks.history_store import HistoryStore
+
+AUTHKEY = b'test'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def work_when_served(address: tuple[str, int]):
+    """Runs shards as soon as the coordinator is up"""
+    while True:
+        try:
+            run_shard_worker(
+                address,
+                AUTHKEY,
+                PipelineSettings(fetchers_count=2, executor='inline'),
+            )
+            return
+        except ConnectionRefusedError:
+            sleep(0.01)
+
+
+def test_coordinator_records_every_city(tmp_path: Path):
+    address = ('127.0.0.1', free_port())
+    worker = threading.Thread(
+        target=work_when_served,
+        args=(address,),
+        daemon=True
+    )
+    worker.start()
+    history_store = HistoryStore(tmp_path / 'history.db')
+    with FakeForecastServer() as server:
+        city_urls = [(f'CITY{i}', server.url_for(f'city{i}'))
+                     for i in range(6)]
+        best = find_bet_city_sharded(
+            city_urls,
+            address,
+            AUTHKEY,
+            shard_size=2,
+            rating=RatingOptions(top=1),
+            history_store=history_store,
+        )
+    worker.join(timeout=30)
+
+    assert not worker.is_alive()
+    # cities tied with the best one are ranked as well
+    assert len(best) >= 1
+    assert len(history_store.runs()) == 1
+    assert all(
+        history_store.city_history(city) is not None
+        for city, _ in city_urls
+    )
+    history_store.close()
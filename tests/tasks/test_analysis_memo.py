@@ -0,0 +1,61 @@
+import pickle
+from pathlib import Path
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import analysis_memo, data_calculation_task
+from tasks.analysis_memo import AnalysisMemo
+from tasks.data_calculation_task import DataCalculationTask
+from tasks.data_fetching_task import CityRawData
+
+
+def test_memo_is_shared_by_copies(tmp_path: Path):
+    memo = AnalysisMemo(tmp_path / 'memo.db')
+    summary = analyze_json(make_forecast('MOSCOW'))
+
+    assert memo.get('default', 'a') is None
+    memo.put('default', 'a', summary)
+    copy = pickle.loads(pickle.dumps(memo))
+    assert copy.get('default', 'a') == summary
+    assert copy.get('columnar', 'a') is None
+    copy.flush()
+
+    stats = memo.stats()
+    assert (stats.hits, stats.misses, stats.stored) == (1, 2, 1)
+    assert stats.hit_rate == 1 / 3
+
+
+def test_least_recently_used_are_evicted(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(analysis_memo, 'EVICT_EVERY', 1)
+    monkeypatch.setattr(analysis_memo, 'TOUCH_INTERVAL', 0.0)
+    memo = AnalysisMemo(tmp_path / 'memo.db', max_entries=2)
+    summary = analyze_json(make_forecast('MOSCOW'))
+
+    memo.put('default', 'a', summary)
+    memo.put('default', 'b', summary)
+    assert memo.get('default', 'a') == summary
+    memo.put('default', 'c', summary)
+
+    assert memo.get('default', 'b') is None
+    assert memo.get('default', 'a') == summary
+    assert memo.stats().evicted == 1
+
+
+def test_memoized_summary_skips_analysis(tmp_path: Path, monkeypatch):
+    memo = AnalysisMemo(tmp_path / 'memo.db')
+    raw = CityRawData('MOSCOW', make_forecast('MOSCOW'), digest='a')
+    first = DataCalculationTask.calculate_summary_by_days(raw, memo=memo)
+
+    def fail(data):
+        raise AssertionError('analyzed twice')
+
+    monkeypatch.setitem(data_calculation_task.ANALYZERS, 'default', fail)
+    other = CityRawData('PARIS', raw.data, digest='a')
+    assert DataCalculationTask.calculate_summary_by_days(
+        other,
+        memo=memo
+    ).days_summary == first.days_summary
+    assert DataCalculationTask.calculate_summaries_batch(
+        [other],
+        memo=memo
+    )[0].days_summary == first.days_summary
@@ -0,0 +1,121 @@
+import json
+import pickle
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import DataAggregationTask, DataAnalyzingTask
+from tasks.analysis_rules import CompiledRules, RuleRanking, RuleSet
+from tasks.analysis_rules import load_rule_sets
+from tasks.data_aggregation_task import aggregate_calculated
+from tasks.data_aggregation_task import aggregate_calculated_batch
+from tasks.data_calculation_task import CitySummary, DataCalculationTask
+from tasks.data_fetching_task import CityRawData
+
+
+def make_forecast_hours(hours: list[tuple[int, int, str]]) -> dict:
+    return {'forecasts': [{
+        'date': '2022-05-26',
+        'date_ts': 1,
+        'hours': [
+            {'hour': str(hour), 'temp': temp, 'condition': condition}
+            for hour, temp, condition in hours
+        ],
+    }]}
+
+
+def test_default_rules_rate_as_analyzer():
+    rules = CompiledRules([RuleSet('default'), RuleSet('night', 0, 6)])
+    for i in range(200):
+        data = make_forecast(f'CITY{i}', days=5, full_days=i % 5)
+        total = DataAggregationTask.aggregate_city_summary(
+            CitySummary('city', analyze_json(data))
+        )
+        assert rules.evaluate(data)[0] == total.rating
+
+
+def test_rule_sets_weigh_hours_in_band():
+    rules = CompiledRules([
+        RuleSet('default'),
+        RuleSet('warm', 10, 12, (('clear', 1), ('cloudy', 0.5)), 15, 25),
+    ])
+    data = make_forecast_hours([
+        (8, 30, 'clear'),
+        (10, 20, 'clear'),
+        (11, 18, 'cloudy'),
+        (12, 10, 'clear'),
+        (13, 20, 'rain'),
+    ])
+
+    default, warm = pickle.loads(pickle.dumps(rules)).evaluate(data)
+    assert default == (3, 17.0)
+    assert warm == (1.5, 16.0)
+
+
+def test_rule_sets_are_loaded_from_spec(tmp_path: Path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({
+        'default': {},
+        'beach': {'hours': [11, 17], 'conditions': {'clear': 1},
+                  'temp': [22, None]},
+    }))
+
+    default, beach = load_rule_sets(path)
+    assert default == RuleSet('default')
+    assert beach == RuleSet('beach', 11, 17, (('clear', 1),), 22, None)
+
+    for spec in ({'hours': [20, 10]}, {'days': 1}, {'conditions': {'a': 'b'}}):
+        path.write_text(json.dumps({'wrong': spec}))
+        with pytest.raises(ValueError):
+            load_rule_sets(path)
+
+
+@pytest.mark.parametrize('spec', [
+    {'hours': [20, 10]},
+    {'hours': [9, 24]},
+    {'hours': ['9', 19]},
+    {'hours': [9, 19, 20]},
+    {'hours': 9},
+    {'conditions': ['clear']},
+    {'conditions': {'clear': '1'}},
+    {'conditions': {'clear': True}},
+    {'conditions': {'clear': -1}},
+    {'conditions': {'clear': float('nan')}},
+    {'temp': [25, 15]},
+    {'temp': ['15', None]},
+    {'temp': [None, float('inf')]},
+    {'temp': 15},
+])
+def test_invalid_spec_names_rule_set(spec: dict):
+    with pytest.raises(ValueError, match='Rule set beach'):
+        RuleSet.from_spec('beach', spec)
+
+
+def test_workers_rate_cities_by_rule_sets():
+    rules = CompiledRules([RuleSet('default'), RuleSet('clear', 9, 19, (
+        ('clear', 1),
+    ))])
+    ranking = RuleRanking(rules)
+    raws = [
+        CityRawData(f'CITY{i}', make_forecast(f'CITY{i}')) for i in range(20)
+    ]
+    calculate = DataCalculationTask.calculate_summary_by_days
+    totals = [aggregate_calculated(calculate, raw, rules) for raw in raws]
+    batch = aggregate_calculated_batch(
+        DataCalculationTask.calculate_summaries_batch,
+        raws,
+        rules
+    )
+    assert [t.rule_ratings for t in batch] == [t.rule_ratings for t in totals]
+    assert list(ranking.record(totals)) == totals
+
+    rankings = ranking.rank()
+    assert list(rankings) == ['default', 'clear']
+    for i, name in enumerate(rankings):
+        ranked = sorted(totals, key=lambda t: t.rule_ratings[i], reverse=True)
+        assert [c.city for c in rankings[name]] == [t.city for t in ranked]
+    assert [
+        c.city for c in rankings['default']
+    ] == [c.city for c in DataAnalyzingTask.rank_cities(totals)[0]]
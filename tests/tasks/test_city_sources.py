@@ -0,0 +1,98 @@
+import csv
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from tasks.city_sources import CityFilter, CityRecord, CitySource
+from tasks.city_sources import read_sqlite
+
+CITIES = [
+    CityRecord('MOSCOW', 'http://m', 'europe', frozenset({'capital'})),
+    CityRecord('KAZAN', 'http://k', 'europe'),
+    CityRecord('CAIRO', 'http://c', 'africa', frozenset({'capital', 'hot'})),
+]
+
+
+def write_catalog(path: Path):
+    if path.suffix == '.jsonl':
+        path.write_text(''.join(
+            json.dumps({
+                'name': c.name,
+                'url': c.url,
+                'region': c.region,
+                'tags': sorted(c.tags),
+            }) + '\n'
+            for c in CITIES
+        ))
+    elif path.suffix == '.csv':
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['name', 'url', 'region', 'tags'])
+            for c in CITIES:
+                writer.writerow([c.name, c.url, c.region, ';'.join(c.tags)])
+    else:
+        db = sqlite3.connect(path)
+        db.execute('CREATE TABLE cities (name, url, region, tags)')
+        db.executemany('INSERT INTO cities VALUES (?, ?, ?, ?)', [
+            (c.name, c.url, c.region, ';'.join(c.tags)) for c in CITIES
+        ])
+        db.commit()
+        db.close()
+
+
+@pytest.fixture(params=['cities.jsonl', 'cities.csv', 'cities.db'])
+def catalog(request, tmp_path: Path) -> Path:
+    path = tmp_path / request.param
+    write_catalog(path)
+    return path
+
+
+def test_read_catalog(catalog: Path):
+    source = CitySource(catalog)
+    assert list(source.records()) == CITIES
+    # every iteration reads the catalog again
+    assert list(source) == list(source) == [
+        (c.name, c.url) for c in CITIES
+    ]
+
+
+@pytest.mark.parametrize('city_filter, expected', [
+    (CityFilter(regions=frozenset({'europe'})), ['MOSCOW', 'KAZAN']),
+    (CityFilter(tags=frozenset({'capital'})), ['MOSCOW', 'CAIRO']),
+    (
+        CityFilter(frozenset({'europe', 'asia'}), frozenset({'capital'})),
+        ['MOSCOW']
+    ),
+])
+def test_filter(catalog: Path, city_filter: CityFilter, expected: list):
+    assert [name for name, _ in CitySource(catalog, city_filter)] == expected
+
+
+def test_json_mapping(tmp_path: Path):
+    path = tmp_path / 'cities.json'
+    path.write_text(json.dumps({'MOSCOW': 'http://m'}))
+    assert list(CitySource(path)) == [('MOSCOW', 'http://m')]
+    with pytest.raises(ValueError):
+        CitySource(path, CityFilter(regions=frozenset({'europe'})))
+
+
+def test_unknown_format(tmp_path: Path):
+    with pytest.raises(ValueError):
+        CitySource(tmp_path / 'cities.xml')
+
+
+@pytest.mark.parametrize('table', [
+    'cities; DROP TABLE cities',
+    'cities" WHERE 0 --',
+    '1cities',
+    '',
+])
+def test_invalid_table_name(catalog: Path, table: str):
+    with pytest.raises(ValueError, match='table name'):
+        CitySource(catalog, table=table)
+    if catalog.suffix == '.db':
+        with pytest.raises(ValueError, match='table name'):
+            list(read_sqlite(catalog, table))
+        assert list(CitySource(catalog, table='cities'))
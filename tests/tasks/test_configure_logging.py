@@ -0,0 +1,40 @@
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+import tasks
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_import_has_no_side_effects(tmp_path: Path):
+    # a clean interpreter, the test session may have configured logging
+    subprocess.run(
+        [
+            sys.executable,
+            '-c',
+            f'import sys; sys.path.insert(0, {str(ROOT)!r});'
+            'import logging, tasks, utils;'
+            'assert not logging.getLogger("forecasting").handlers',
+        ],
+        cwd=tmp_path,
+        check=True,
+    )
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_configure_logging_once(tmp_path: Path, monkeypatch):
+    logger = logging.getLogger('forecasting')
+    monkeypatch.setattr(logger, 'handlers', [])
+    monkeypatch.setattr(logger, 'level', logger.level)
+    log_file = tmp_path / 'forecasting.log'
+
+    tasks.configure_logging(str(log_file))
+    tasks.configure_logging(str(log_file))
+    logger.info('configured')
+    for handler in logger.handlers:
+        handler.close()
+
+    assert len(logger.handlers) == 2
+    assert log_file.read_text() == 'configured\n'
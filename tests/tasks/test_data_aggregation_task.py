@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import DataAggregationTask
+from tasks.data_aggregation_task import IncorrectSummaryError
+from tasks.data_aggregation_task import aggregate_calculated
+from tasks.data_aggregation_task import aggregate_calculated_batch
+from tasks.data_calculation_task import CitySummary, PackedDays
+
+
+def make_city_summary(city: str, full_days: int) -> CitySummary:
+    return CitySummary(
+        city,
+        analyze_json(make_forecast(city, days=5, full_days=full_days))
+    )
+
+
+def test_packed_days_round_trip():
+    for full_days in range(6):
+        days = make_city_summary('city', full_days).days_summary['days']
+        assert PackedDays.pack(days).unpack() == days
+
+
+def test_total_summary_keeps_city_summary():
+    city_summary = make_city_summary('MOSCOW', 3)
+    total = DataAggregationTask.aggregate_city_summary(city_summary)
+
+    assert total.city == 'MOSCOW'
+    assert total.city_summary == city_summary
+    assert total.analyzing_days == 3
+    assert total.rating == (total.shiny_hours, total.temp_avg)
+    assert not hasattr(total, '__dict__')
+    restored = pickle.loads(pickle.dumps(total))
+    assert restored.city_summary == city_summary
+    assert restored.rating == total.rating
+
+
+def test_incorrect_city_summary():
+
+    assert DataAggregationTask.aggregate_city_summary(
+        CitySummary('MOSCOW', {})
+    ) is None
+    assert DataAggregationTask.aggregate_city_summary(
+        CitySummary('MOSCOW', {'days': [{'date': '2022-05-26'}]})
+    ) is None
+
+
+def test_aggregated_in_worker_as_in_parent():
+    city_summaries = [make_city_summary(f'CITY{i}', i) for i in range(6)]
+    expected = [
+        DataAggregationTask.aggregate_city_summary(cs) for cs in city_summaries
+    ]
+    error = ValueError('broken forecast')
+
+    single = [aggregate_calculated(lambda cs: cs, cs) for cs in city_summaries]
+    batch = aggregate_calculated_batch(
+        lambda items: items,
+        [*city_summaries, error, CitySummary('MOSCOW', {})]
+    )
+
+    for totals in (single, batch[:-2]):
+        restored = pickle.loads(pickle.dumps(totals))
+        assert [t.city_summary for t in restored] == [
+            t.city_summary for t in expected
+        ]
+        assert [t.temp_sum for t in restored] == [t.temp_sum for t in expected]
+        assert [t.rating for t in restored] == [t.rating for t in expected]
+    assert batch[-2] is error
+    assert isinstance(batch[-1], IncorrectSummaryError)
+    with pytest.raises(IncorrectSummaryError):
+        aggregate_calculated(lambda cs: cs, CitySummary('MOSCOW', {}))
@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+from multiprocessing import JoinableQueue
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from external.client import YandexWeatherAPI
+from common_types.task_types import Status, TaskBatch, TaskState
+from external.decoder import Decoder
+from pipeline.core import _calculation_handlers
+from my_concurrent.queue_controlled_process import QueueControlledProcess
+from my_concurrent.shared_payload import SharedPayload
+from tasks.data_fetching_task import CityRawPayload
+
+FORECAST = make_forecast('MOSCOW')
+
+
+class ReplacingDecoder(Decoder):
+    """Decodes every body as `FORECAST`, unlike the default decoder"""
+
+    def __call__(self, body):
+        return FORECAST
+
+
+class FailingMemo:
+    """Memoizes nothing and fails to remember the `BROKEN` digest"""
+
+    def get(self, analyzer, digest):
+        return None
+
+    def put(self, analyzer, digest, summary):
+        if digest == 'BROKEN':
+            raise OSError('memo is read-only')
+
+
+def client_decoder(_) -> tuple[str, bool]:
+    decoder = YandexWeatherAPI.decoder
+    return type(decoder).__name__, decoder.projection
+
+
+def test_configured_decoder_reaches_forkserver_workers(monkeypatch):
+    context = multiprocessing.get_context('forkserver')
+    monkeypatch.setattr(
+        YandexWeatherAPI,
+        'decoder',
+        ReplacingDecoder('stdlib', projection=True)
+    )
+    calculate, calculate_batch = _calculation_handlers('default')
+    body = json.dumps(make_forecast('PARIS')).encode()
+
+    with context.Pool(1) as pool:
+        # the class attribute alone doesn't travel to these workers
+        assert pool.apply(client_decoder, (None,)) == ('Decoder', False)
+        total = pool.apply(
+            calculate,
+            (CityRawPayload('PARIS', SharedPayload.create(body)),)
+        )
+        [batch_total] = pool.apply(
+            calculate_batch,
+            ([CityRawPayload('PARIS', SharedPayload.create(body))],)
+        )
+
+    expected = analyze_json(FORECAST)['days']
+    assert total.city_summary.days_summary['days'] == expected
+    assert batch_total.city_summary.days_summary['days'] == expected
+
+
+def test_batch_failure_after_reading_payloads_fails_one_city():
+    calculate, calculate_batch = _calculation_handlers(
+        'default',
+        FailingMemo()
+    )
+    in_q: JoinableQueue = JoinableQueue()
+    out_q: JoinableQueue = JoinableQueue()
+    worker = QueueControlledProcess(
+        calculate,
+        in_q,
+        out_q,
+        batch_size=3,
+        max_linger=1,
+        batch_handler=calculate_batch,
+    )
+    worker.start()
+    body = json.dumps(FORECAST).encode()
+    for digest in ('OK1', 'BROKEN', 'OK2'):
+        in_q.put(TaskState.ok(CityRawPayload(
+            digest,
+            SharedPayload.create(body),
+            digest
+        )))
+    worker.stop_queue()
+    batch = out_q.get(timeout=10)
+    worker.join()
+
+    assert isinstance(batch, TaskBatch)
+    ok, broken, ok_too = batch.tasks
+    assert ok.status == ok_too.status == Status.OK
+    assert ok.data.city_summary.days_summary == analyze_json(FORECAST)
+    assert broken.status == Status.ERROR
+    assert 'read-only' in broken.message
@@ -0,0 +1,97 @@
+from pathlib import Path
+
+from benchmarks.synthetic import make_forecast
+from external.analyzer import analyze_json
+from tasks import DataAggregationTask, DataAnalyzingTask
+from tasks.data_calculation_task import CitySummary
+from tasks.history_store import HistoryStore, WINDOW_DAYS
+
+
+def make_totals(cities: list[str], full_days: int, seed: int = 0):
+    return [
+        DataAggregationTask.aggregate_city_summary(CitySummary(
+            city,
+            analyze_json(make_forecast(
+                f'{city}{seed}',
+                days=5,
+                full_days=full_days
+            ))
+        ))
+        for city in cities
+    ]
+
+
+def test_record_passes_cities_through(tmp_path: Path):
+    store = HistoryStore(tmp_path / 'history.db')
+    totals = make_totals(['MOSCOW', 'PARIS'], 3)
+
+    assert list(store.record(totals, fetched_at=100.0)) == totals
+    assert store.runs() == [(1, 100.0)]
+    store.close()
+
+    history = HistoryStore(tmp_path / 'history.db').city_history('MOSCOW')
+    assert history.fetches == 1
+    assert history.days == totals[0].analyzing_days
+    assert history.temp_avg == totals[0].temp_avg
+    assert history.shiny_hours_avg == totals[0].shiny_hours_avg
+
+
+def test_window_of_run_ranks_as_run(tmp_path: Path):
+    store = HistoryStore(tmp_path / 'history.db')
+    cities = [f'CITY{i}' for i in range(20)]
+    first = make_totals(cities, 3, seed=1)
+    last = make_totals(cities, 4, seed=2)
+    list(store.record(first, fetched_at=100.0))
+    list(store.record(last, fetched_at=200.0))
+
+    windows = (
+        (first, store.window_totals(until=150.0)),
+        (last, store.window_totals(last_runs=1)),
+    )
+    for totals, window in windows:
+        ranked, ranks = DataAnalyzingTask.rank_cities(totals)
+        stored, stored_ranks = DataAnalyzingTask.rank_cities(window)
+        assert stored_ranks == ranks
+        assert [c.rating for c in stored] == [c.rating for c in ranked]
+
+
+def test_window_takes_latest_forecast_of_date(tmp_path: Path):
+    store = HistoryStore(tmp_path / 'history.db')
+    (old,) = make_totals(['MOSCOW'], 2, seed=1)
+    (new,) = make_totals(['MOSCOW'], 5, seed=2)
+    list(store.record([old]))
+    list(store.record([new]))
+
+    (total,) = store.window_totals()
+    assert total.rating == new.rating
+    assert list(store.window_totals(since=1e12)) == []
+
+
+def test_city_trend_over_last_fetches(tmp_path: Path):
+    store = HistoryStore(tmp_path / 'history.db')
+    for seed in range(3):
+        list(store.record(make_totals(['MOSCOW'], 3, seed), seed))
+    list(store.record(make_totals(['PARIS'], 3), 3))
+
+    trend = store.city_trend('MOSCOW', last_fetches=2)
+    assert [fetch.run for fetch in trend] == [2, 3]
+    assert store.city_history('MOSCOW', 2).fetches == 2
+    assert store.city_history('MOSCOW').fetches == 3
+    assert store.city_history('LONDON') is None
+
+
+def test_window_searches_runs_by_index(tmp_path: Path):
+    store = HistoryStore(tmp_path / 'history.db')
+    for run in range(3):
+        list(store.record(make_totals(['MOSCOW', 'PARIS'], 3, seed=run)))
+    # history written before the index existed gets it on opening
+    store._db.execute('DROP INDEX days_by_run')
+    store.close()
+
+    store = HistoryStore(tmp_path / 'history.db')
+    plan = [
+        row[-1] for row in
+        store._db.execute(f'EXPLAIN QUERY PLAN {WINDOW_DAYS}', (2, 3))
+    ]
+    assert not any(step.startswith('SCAN days') for step in plan)
+    assert any('INDEX days_by_run (run>? AND run<?)' in s for s in plan)
@@ -0,0 +1,95 @@
+import http.client
+import json
+import socket
+import threading
+from pathlib import Path
+
+from tasks.data_aggregation_task import TotalSummary
+from tasks.data_calculation_task import PackedDays
+from tasks.rating_service import RatingBoard, make_server
+
+
+def make_total(city: str, shiny_hours: int, temp: float) -> TotalSummary:
+    return TotalSummary(city, PackedDays.pack([]), temp * 10, shiny_hours,
+                        10, 1)
+
+
+def test_update_keeps_missing_cities():
+    board = RatingBoard()
+    board.update([make_total('MOSCOW', 5, 1), make_total('PARIS', 7, 2)],
+                 fetched_at=100.0)
+    snapshot = board.update([make_total('MOSCOW', 9, 1)], fetched_at=200.0)
+
+    assert [(c.rank, c.city) for c in snapshot.cities] == [
+        (1, 'MOSCOW'), (2, 'PARIS'),
+    ]
+    assert snapshot.by_city['PARIS'].fetched_at == 100.0
+    assert snapshot.oldest_fetched_at == 100.0
+    assert snapshot.ages(300.0)['oldest_age'] == 200.0
+
+
+class UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.connect(self.path)
+
+
+def serve(endpoint, board: RatingBoard):
+    server = make_server(endpoint, board)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get(connection: http.client.HTTPConnection, path: str):
+    connection.request('GET', path)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_queries_over_tcp_carry_age():
+    board = RatingBoard()
+    server = serve(('127.0.0.1', 0), board)
+    connection = http.client.HTTPConnection(*server.server_address)
+    try:
+        assert get(connection, '/health')[1]['ready'] is False
+        board.update([
+            make_total('MOSCOW', 5, 1),
+            make_total('PARIS', 5, 1),
+            make_total('LONDON', 3, 1),
+        ])
+
+        status, best = get(connection, '/best')
+        assert status == 200
+        assert [c['city'] for c in best['cities']] == ['MOSCOW', 'PARIS']
+        assert 0 <= best['age'] < 5
+        _, rating = get(connection, '/rating?top=1')
+        assert [c['city'] for c in rating['cities']] == ['MOSCOW']
+        _, city = get(connection, '/city/LONDON')
+        assert city['city']['rank'] == 3 and 'city_age' in city
+        assert get(connection, '/city/ROME')[0] == 404
+        assert get(connection, '/rating?top=x')[0] == 400
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_queries_over_unix_socket(tmp_path: Path):
+    board = RatingBoard()
+    board.update([make_total('MOSCOW', 5, 1)])
+    path = str(tmp_path / 'ratings.sock')
+    server = serve(path, board)
+    connection = UnixConnection(path)
+    try:
+        status, best = get(connection, '/best')
+        assert status == 200
+        assert best['cities'][0]['city'] == 'MOSCOW'
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+    assert not Path(path).exists()
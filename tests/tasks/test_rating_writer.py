@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tasks import TotalSummary
+from tasks.data_calculation_task import PackedDays
+from tasks.rating_writer import write_ratings, resolve_format
+
+
+def make_total(city: str, days: list[tuple[str, float, int]]):
+    return TotalSummary(
+        city,
+        PackedDays.pack([
+            {
+                'date': date,
+                'hours_start': 9,
+                'hours_end': 19,
+                'hours_count': 11,
+                'temp_avg': temp,
+                'relevant_cond_hours': hours,
+            }
+            for date, temp, hours in days
+        ]),
+        temp_sum=sum(t for _, t, _ in days) * 11,
+        shiny_hours=sum(h for _, _, h in days),
+        analyzing_hours=len(days) * 11,
+        analyzing_days=len(days),
+    )
+
+
+CITIES = [
+    make_total('MOSCOW', [('05-26', 20.5, 5), ('05-27', 18.0, 4)]),
+    make_total('PARIS', [('05-27', 15.0, 3)]),
+]
+
+
+def test_csv(tmp_path: Path):
+    write_ratings(tmp_path / 'rating.csv', CITIES, (1, 2))
+
+    assert (tmp_path / 'rating.csv').read_text() == '\n'.join([
+        'City,Measurement/days,05-26,05-27,Average,Rating',
+        'MOSCOW,temperature,20.5,18.0,19.2,1',
+        ',shiny hours,5,4,4.5,',
+        'PARIS,temperature,,15.0,15.0,2',
+        ',shiny hours,,3,3.0,',
+    ])
+
+
+def test_csv_chunks(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr('tasks.rating_writer.CSV_CHUNK_ROWS', 3)
+    write_ratings(tmp_path / 'chunked.csv', CITIES * 3, (1,) * 6)
+    monkeypatch.setattr('tasks.rating_writer.CSV_CHUNK_ROWS', 100)
+    write_ratings(tmp_path / 'whole.csv', CITIES * 3, (1,) * 6)
+
+    assert ((tmp_path / 'chunked.csv').read_text()
+            == (tmp_path / 'whole.csv').read_text())
+
+
+def test_npz(tmp_path: Path):
+    write_ratings(tmp_path / 'rating.npz', CITIES, (1, 2), 'npz')
+
+    ratings = np.load(tmp_path / 'rating.npz')
+    assert list(ratings['dates']) == ['05-26', '05-27']
+    assert list(ratings['city']) == ['MOSCOW', 'PARIS']
+    assert list(ratings['rank']) == [1, 2]
+    assert np.isnan(ratings['day_temp_avg'][1, 0])
+    assert ratings['day_shiny_hours'][0].tolist() == [5, 4]
+
+
+@pytest.mark.parametrize('rating_format', ['parquet', 'arrow'])
+def test_arrow(tmp_path: Path, rating_format: str):
+    feather = pytest.importorskip('pyarrow.feather')
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / f'rating.{rating_format}'
+    write_ratings(path, CITIES, (1, 2), rating_format)
+
+    if rating_format == 'parquet':
+        table = parquet.read_table(path)
+    else:
+        table = feather.read_table(path)
+    assert table.column('city').to_pylist() == ['MOSCOW', 'PARIS']
+    assert table.column('day_temp_avg').to_pylist()[1] == [None, 15.0]
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        resolve_format('xlsx')
@@ -0,0 +1,73 @@
+import sqlite3
+from multiprocessing import JoinableQueue
+from pathlib import Path
+
+from common_types.task_types import TaskState
+from tasks import DataAggregationTask, TotalSummary
+from tasks.data_calculation_task import CitySummary, PackedDays
+from tasks.data_fetching_task import CityRawData
+from tasks.result_store import ResultStore, ResultRouter
+
+
+def make_total(city: str) -> TotalSummary:
+    return TotalSummary(city, PackedDays.pack([]), 10.0, 3, 2, 1)
+
+
+def test_store_survives_reopen(tmp_path: Path):
+    store = ResultStore(tmp_path / 'results.db')
+    store.put('MOSCOW', 'abc', make_total('MOSCOW'))
+    store.close()
+
+    store = ResultStore(tmp_path / 'results.db')
+    assert store.get('MOSCOW', 'abc') == make_total('MOSCOW')
+    assert store.get('MOSCOW', 'changed') is None
+    assert store.get('PARIS', 'abc') is None
+    assert store.stats() == (1, 2, 0)
+
+
+def test_store_dropped_on_version_change(tmp_path: Path):
+    store = ResultStore(tmp_path / 'results.db')
+    store.put('MOSCOW', 'abc', make_total('MOSCOW'))
+    store.close()
+    with sqlite3.connect(tmp_path / 'results.db') as db:
+        db.execute('PRAGMA user_version = 0')
+
+    assert ResultStore(tmp_path / 'results.db').get('MOSCOW', 'abc') is None
+
+
+def test_router_bypasses_stored_results(tmp_path: Path):
+    store = ResultStore(tmp_path / 'results.db')
+    cities_q: JoinableQueue = JoinableQueue()
+    calculation_q: JoinableQueue = JoinableQueue()
+    router = ResultRouter(store, cities_q, calculation_q)
+
+    router.put(TaskState.ok(make_total('MOSCOW')))
+    router.put(TaskState.ok(CityRawData('PARIS', {}, 'abc')))
+    router.put(TaskState.error('fetch failed'))
+
+    assert calculation_q.get(timeout=1).data.city == 'MOSCOW'
+    assert cities_q.get(timeout=1).data.city == 'PARIS'
+    assert cities_q.get(timeout=1).message == 'fetch failed'
+
+    totals = [make_total('MOSCOW'), make_total('PARIS')]
+    assert list(router.remember(totals)) == totals
+    assert store.get('PARIS', 'abc') == make_total('PARIS')
+    assert store.stats().stored == 1
+
+
+class ListReader:
+    def __init__(self, tasks: list[TaskState]):
+        self._tasks = tasks
+
+    def read_tasks(self):
+        return self._tasks
+
+
+def test_aggregation_passes_stored_results():
+    stored = make_total('MOSCOW')
+    aggregated = DataAggregationTask(ListReader([
+        TaskState.ok(stored),
+        TaskState.ok(CitySummary('PARIS', {'days': []})),
+    ])).aggregate_tasks()
+
+    assert [t.city for t in aggregated] == ['MOSCOW', 'PARIS']
@@ -0,0 +1,80 @@
+import json
+import subprocess
+import sys
+from importlib.util import find_spec
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fake_server import FakeForecastServer
+
+CITIES = 1
+SCRIPT = Path(__file__).resolve().parents[1] / 'forecasting.py'
+
+
+@pytest.fixture(scope='module')
+def city_urls():
+    with FakeForecastServer() as server:
+        yield [(f'CITY{i}', server.url_for(f'city{i}')) for i in range(CITIES)]
+
+
+@pytest.mark.parametrize('options', [
+    ['-w', '8'],
+    # nothing changed the second time, workers have no cities to take
+    ['--results-db', 'results.db', '-s'],
+])
+def test_one_city_run_has_clean_stderr(
+        city_urls,
+        tmp_path: Path,
+        options: list[str]
+):
+    cities = tmp_path / 'cities.json'
+    cities.write_text(json.dumps(dict(city_urls[:1])))
+    for _ in range(2):
+        run = subprocess.run(
+            [sys.executable, str(SCRIPT), '--cities', str(cities), *options],
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert run.returncode == 0
+        assert run.stderr == ''
+
+
+@pytest.mark.skipif(find_spec('pyarrow') is not None, reason='has pyarrow')
+def test_missing_rating_format_dependency_is_reported(tmp_path: Path):
+    run = subprocess.run(
+        [sys.executable, str(SCRIPT), '-r', '--rating-format', 'parquet'],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert run.returncode == 2
+    assert 'error: parquet rating format requires pyarrow' in run.stderr
+    assert 'Traceback' not in run.stderr
+
+
+@pytest.mark.parametrize('options, error', [
+    (['--serve', '127.0.0.1:0', '--top', '3'],
+     '--top not supported with --serve'),
+    (['--shard-worker', '127.0.0.1:1', '-r', '--history-db', 'history.db'],
+     '-r, --history-db not supported with --shard-worker'),
+    (['--shard-coordinator', '127.0.0.1:0', '--results-db', 'results.db'],
+     '--results-db not supported with --shard-coordinator'),
+])
+def test_mode_rejects_unsupported_options(
+        tmp_path: Path,
+        options: list[str],
+        error: str
+):
+    run = subprocess.run(
+        [sys.executable, str(SCRIPT), *options],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert run.returncode == 2
+    assert f'error: {error}' in run.stderr
@@ -1,12 +1,28 @@
 import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
 
-
-CITIES = json.load(open('cities.json'))
+CITIES_FILE = 'cities.json'
 
 MIN_MAJOR_PYTHON_VER = 3
 MIN_MINOR_PYTHON_VER = 9
 
 
+@lru_cache
+def load_cities(path: str | Path = CITIES_FILE) -> dict[str, str]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def __getattr__(name: str) -> Any:
+    # the city list is read on first use rather than on import, so that
+    # importing the module in worker processes costs nothing
+    if name == 'CITIES':
+        return load_cities()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
 def check_python_version():
     import sys
 
@@ -23,6 +39,6 @@ def check_python_version():
 
 def get_url_by_city_name(city_name):
     try:
-        return CITIES[city_name]
+        return load_cities()[city_name]
     except KeyError:
         raise Exception("Please check that city {} exists".format(city_name))